@@ -0,0 +1,110 @@
+"""
+Compares encoding batch market instructions into a wallet JSON-RPC request
+body with `InstructionSerializer` against building dicts with
+`instruction_to_json` and encoding the request with the standard library, as
+`requests` does when given `json=`.
+
+Run with `python -m benchmarks.instruction_serializer_benchmark`.
+"""
+
+import argparse
+import json
+import time
+
+from market_maker.submission import (
+    BatchMarketInstruction,
+    InstructionSerializer,
+    OrderAmendment,
+    OrderCancellation,
+    OrderSubmission,
+    instruction_to_json,
+)
+from market_maker.wallet import VegaWallet
+
+MARKET_ID = "1" * 64
+PUB_KEY = "2" * 64
+
+
+def build_batch(size: int) -> BatchMarketInstruction:
+    # Half submissions, a quarter each amendments and cancellations
+    submissions = [
+        OrderSubmission(
+            MARKET_ID,
+            1_000 + i,
+            123_450_000 + 500 * i,
+            "TIME_IN_FORCE_GTC",
+            "TYPE_LIMIT",
+            "SIDE_BUY" if i % 2 else "SIDE_SELL",
+        )
+        for i in range(size // 2)
+    ]
+    amendments = [
+        OrderAmendment(f"{i:064x}", MARKET_ID, size_delta=-10, price=123_000_000 + i)
+        for i in range(size // 4)
+    ]
+    cancellations = [
+        OrderCancellation(f"{i + size:064x}", MARKET_ID)
+        for i in range(size - len(submissions) - len(amendments))
+    ]
+    return BatchMarketInstruction(submissions, cancellations, amendments)
+
+
+def encode_dicts(batch: BatchMarketInstruction) -> bytes:
+    return json.dumps(
+        {
+            "jsonrpc": "2.0",
+            "method": "client.send_transaction",
+            "params": {
+                "publicKey": PUB_KEY,
+                "sendingMode": "TYPE_SYNC",
+                "transaction": instruction_to_json(batch),
+            },
+            "id": "request",
+        },
+        allow_nan=False,
+    ).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--iterations", type=int, default=2_000)
+    args = parser.parse_args()
+
+    wallet = VegaWallet(token="", wallet_url="", pub_key=PUB_KEY)
+    serializers = {
+        "serializer": InstructionSerializer(),
+        "serializer stdlib": InstructionSerializer(
+            dumps=lambda value: json.dumps(value).encode()
+        ),
+    }
+
+    def encode_bytes(serializer, batch):
+        return wallet.encode_request(serializer.encode(batch))
+
+    print(
+        f"{'batch':>6} {'dicts (us)':>12} "
+        + " ".join(f"{name + ' (us)':>22}" for name in serializers)
+    )
+    for size in args.sizes:
+        batch = build_batch(size)
+        expected = json.loads(encode_dicts(batch))
+        for serializer in serializers.values():
+            assert json.loads(encode_bytes(serializer, batch)) == expected
+
+        timings = []
+        for encode in [lambda: encode_dicts(batch)] + [
+            lambda s=s: encode_bytes(s, batch) for s in serializers.values()
+        ]:
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                encode()
+            timings.append((time.perf_counter() - start) / args.iterations * 1e6)
+        print(
+            f"{size:>6} {timings[0]:>12.1f} "
+            + " ".join(f"{t:>22.1f}" for t in timings[1:])
+        )
+
+
+if __name__ == "__main__":
+    main()
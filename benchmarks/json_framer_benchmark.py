@@ -0,0 +1,95 @@
+"""
+Compares the incremental `JsonStreamFramer` against the previous approach of
+concatenating every websocket fragment and re-running `json.loads` on the
+whole buffer, using synthetic multi-megabyte order snapshots.
+
+Run with `python -m benchmarks.json_framer_benchmark`.
+"""
+
+import argparse
+import json
+import time
+
+from market_maker.client.ws.json_framer import JsonStreamFramer
+
+
+def build_snapshot(target_bytes: int) -> str:
+    order = {
+        "id": "0" * 64,
+        "marketId": "1" * 64,
+        "partyId": "2" * 64,
+        "side": "SIDE_BUY",
+        "price": "123456789",
+        "size": "1000",
+        "remaining": "1000",
+        "timeInForce": "TIME_IN_FORCE_GTC",
+        "type": "TYPE_LIMIT",
+        "createdAt": "1675000000000000000",
+        "status": "STATUS_ACTIVE",
+        "reference": 'ref with "quotes" and {braces}',
+        "version": "1",
+    }
+    order_size = len(json.dumps(order))
+    orders = [dict(order, id=f"{i:064x}") for i in range(target_bytes // order_size)]
+    return json.dumps({"result": {"snapshot": {"orders": orders}}})
+
+
+def split(message: str, fragment_size: int) -> list[str]:
+    return [
+        message[i : i + fragment_size] for i in range(0, len(message), fragment_size)
+    ]
+
+
+def run_legacy(fragments: list[str]) -> int:
+    buffer = ""
+    received = 0
+    for fragment in fragments:
+        buffer += fragment
+        try:
+            json.loads(buffer)["result"]
+        except json.decoder.JSONDecodeError:
+            pass
+        else:
+            buffer = ""
+            received += 1
+    return received
+
+
+def run_framer(fragments: list[str], framer: JsonStreamFramer) -> int:
+    received = 0
+    for fragment in fragments:
+        received += len(framer.feed(fragment))
+    return received
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    assert fn(*args) == 1
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--fragment-kb", type=float, default=64)
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>8} {'fragments':>10} {'legacy (s)':>12} "
+        f"{'framer (s)':>12} {'framer stdlib (s)':>18}"
+    )
+    for size_mb in args.sizes_mb:
+        message = build_snapshot(int(size_mb * 1024 * 1024))
+        fragments = split(message, int(args.fragment_kb * 1024))
+
+        legacy = timed(run_legacy, fragments)
+        framer = timed(run_framer, fragments, JsonStreamFramer())
+        stdlib = timed(run_framer, fragments, JsonStreamFramer(loads=json.loads))
+        print(
+            f"{len(message) / 1024 / 1024:>6.1f}MB {len(fragments):>10} "
+            f"{legacy:>12.3f} {framer:>12.3f} {stdlib:>18.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
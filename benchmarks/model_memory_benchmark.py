@@ -0,0 +1,142 @@
+"""
+Measures the memory held per order and per account by the store's models,
+comparing the slotted models with interned IDs against the plain dataclasses,
+float values and per-update string keys they replaced.
+
+Each node is decoded from its own JSON document, as stream updates are, so
+strings are not shared between nodes unless the parser shares them.
+
+Run with `python -m benchmarks.model_memory_benchmark`.
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import market_maker.client.api.parsers as parsers
+
+
+@dataclass
+class LegacyOrder:
+    order_id: str
+    market_id: str
+    size: float
+    remaining_size: float
+    price: float
+    order_type: str
+    time_in_force: str
+    status: str
+    party_id: str
+    side: str
+
+
+@dataclass
+class LegacyAccount:
+    owner: str
+    account_type: str
+    balance: float
+    asset_id: str
+    market_id: str
+
+    def get_id(self):
+        return f"{self.owner}-{self.market_id}-{self.account_type}-{self.asset_id}"
+
+
+def legacy_parse_order(node: dict) -> LegacyOrder:
+    return LegacyOrder(
+        node["id"],
+        node["marketId"],
+        float(node["size"]) / 10**2,
+        float(node["remaining"]) / 10**2,
+        float(node["price"]) / 10**5,
+        node["type"],
+        node["timeInForce"],
+        node["status"],
+        node["partyId"],
+        node["side"],
+    )
+
+
+def legacy_parse_account(node: dict) -> LegacyAccount:
+    return LegacyAccount(
+        node["owner"],
+        node["type"],
+        float(node["balance"]) / 10**18,
+        node["asset"],
+        node["marketId"],
+    )
+
+
+def order_documents(count: int, markets: int) -> list[str]:
+    return [
+        json.dumps(
+            {
+                "id": f"{i:064x}",
+                "marketId": f"{i % markets:064x}",
+                "partyId": "2" * 64,
+                "side": "SIDE_BUY" if i % 2 else "SIDE_SELL",
+                "price": str(1_234_567 + i),
+                "size": "1000",
+                "remaining": "750",
+                "timeInForce": "TIME_IN_FORCE_GTC",
+                "type": "TYPE_LIMIT",
+                "status": "STATUS_ACTIVE",
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def account_documents(count: int, markets: int) -> list[str]:
+    return [
+        json.dumps(
+            {
+                "owner": f"{i // markets:064x}",
+                "type": "ACCOUNT_TYPE_MARGIN",
+                "balance": str(123_456_789_000_000_000 + i),
+                "asset": "a" * 64,
+                "marketId": f"{i % markets:064x}",
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def bytes_per_item(
+    documents: list[str], parse: Callable[[dict], Any], key: Callable[[Any], Any]
+) -> float:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = {}
+    for document in documents:
+        item = parse(json.loads(document))
+        store[key(item)] = item
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return used / len(documents)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=50_000)
+    parser.add_argument("--markets", type=int, default=20)
+    args = parser.parse_args()
+
+    orders = order_documents(args.count, args.markets)
+    accounts = account_documents(args.count, args.markets)
+
+    print(f"{'':>10} {'before (B)':>12} {'after (B)':>12}")
+    before = bytes_per_item(orders, legacy_parse_order, lambda o: o.order_id)
+    after = bytes_per_item(orders, parsers.parse_order, lambda o: o.order_id)
+    print(f"{'order':>10} {before:>12.0f} {after:>12.0f}")
+    before = bytes_per_item(accounts, legacy_parse_account, LegacyAccount.get_id)
+    after = bytes_per_item(accounts, parsers.parse_account, lambda a: a.get_id())
+    print(f"{'account':>10} {before:>12.0f} {after:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
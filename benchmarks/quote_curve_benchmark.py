@@ -0,0 +1,80 @@
+"""
+Measures building quote ladders with `QuoteCurveGenerator`, one market at a
+time against all markets in one batch, for a range of market counts.
+
+Run with `python -m benchmarks.quote_curve_benchmark`.
+"""
+
+import argparse
+import random
+import time
+
+from market_maker.models import Market
+from market_maker.strategy.quote_curves import QuoteCurveGenerator, QuoteCurveProfile
+
+
+def make_markets(count: int) -> list[Market]:
+    return [
+        Market(
+            market_id=f"{i:064x}",
+            state="STATE_ACTIVE",
+            trading_mode="TRADING_MODE_CONTINUOUS",
+            decimal_places=random.choice((2, 3, 4)),
+            position_decimal_places=random.choice((0, 1, 2)),
+            code=f"M{i}",
+            name=f"Market {i}",
+            settlement_asset_id="a" * 64,
+            tick_size=random.choice((1, 5, 10)),
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--markets", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--levels", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--inventory-skew-bps", type=float, default=10)
+    args = parser.parse_args()
+
+    generator = QuoteCurveGenerator(
+        QuoteCurveProfile(
+            levels=args.levels, inventory_skew_bps=args.inventory_skew_bps
+        )
+    )
+    for count in args.markets:
+        markets = make_markets(count)
+        bids = [random.uniform(5, 50_000) for _ in markets]
+        asks = [bid * 1.0005 for bid in bids]
+        volumes = [random.uniform(500, 5_000) for _ in markets]
+        inventory = [random.uniform(-1, 1) for _ in markets]
+
+        begin = time.perf_counter()
+        for _ in range(args.iterations):
+            for i, market in enumerate(markets):
+                generator.build_for_markets(
+                    [market],
+                    bids[i : i + 1],
+                    asks[i : i + 1],
+                    volumes[i : i + 1],
+                    volumes[i : i + 1],
+                    inventory[i : i + 1],
+                )
+        separate = (time.perf_counter() - begin) / args.iterations
+
+        begin = time.perf_counter()
+        for _ in range(args.iterations):
+            generator.build_for_markets(
+                markets, bids, asks, volumes, volumes, inventory
+            )
+        batched = (time.perf_counter() - begin) / args.iterations
+
+        print(
+            f"{count} markets: {separate * 1e6:,.1f}us one at a time, "
+            f"{batched * 1e6:,.1f}us batched, {separate / batched:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Replays a stream journal through VegaStore and BinanceStore as fast as
+possible, optionally running the strategy after every Binance tick, to give a
+network-free measure of the store and strategy pipeline.
+
+Run with `python -m benchmarks.replay_benchmark --journal-dir <dir>
+--snapshot <path>` against a journal recorded with RECORD_DIR and a store
+snapshot from SNAPSHOT_PATH, or without arguments to replay a synthetic
+journal.
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import market_maker.store.indexes as indexes
+from market_maker.config import Config
+from market_maker.models import Account, Asset, Market
+from market_maker.replay.recorder import StreamRecorder
+from market_maker.replay.replayer import ReplayDriver, read_journal
+from market_maker.store.binance_store import BinanceStore
+from market_maker.store.vega_store import StoreState, VegaStore
+from market_maker.strategy.simple_market_maker import SimpleMarketMaker
+
+MARKET_ID = "m" * 64
+ASSET_ID = "a" * 64
+PARTY_ID = "p" * 64
+SYMBOL = "UNIUSDT"
+
+
+class NullWallet:
+    pub_key = PARTY_ID
+
+    def __init__(self):
+        self.transactions = 0
+
+    def submit_transaction(self, transaction: bytes, origin_ns: int = 0) -> None:
+        self.transactions += 1
+
+
+def write_synthetic_journal(directory: str, ticks: int) -> None:
+    recorder = StreamRecorder(directory)
+    recorder.start()
+    for i in range(ticks):
+        mid = 5 + (i % 200) * 0.001
+        recorder.record(
+            "binance",
+            "bookTicker",
+            {"data": {"s": SYMBOL, "b": f"{mid - 0.001:.4f}", "a": f"{mid:.4f}"}},
+        )
+        if i % 10 == 0:
+            order = {
+                "id": f"{(i // 10) % 20:064x}",
+                "marketId": MARKET_ID,
+                "partyId": PARTY_ID,
+                "side": "SIDE_BUY",
+                "price": str(int(mid * 1e4)),
+                "size": "10",
+                "remaining": "10",
+                "timeInForce": "TIME_IN_FORCE_GTC",
+                "type": "TYPE_LIMIT",
+                "status": "STATUS_ACTIVE",
+            }
+            recorder.record(
+                "vega",
+                "orders",
+                json.dumps({"result": {"updates": {"orders": [order]}}}),
+            )
+    recorder.stop()
+
+
+def synthetic_store(config: Config) -> VegaStore:
+    store = VegaStore(config)
+    accounts = [Account(PARTY_ID, "ACCOUNT_TYPE_GENERAL", 10_000_000_000, ASSET_ID, "")]
+    store._state = StoreState(
+        assets={ASSET_ID: Asset(ASSET_ID, "STATUS_ENABLED", "USDT", "USDT", 6)},
+        markets={
+            MARKET_ID: Market(
+                MARKET_ID,
+                "STATE_ACTIVE",
+                "TRADING_MODE_CONTINUOUS",
+                4,
+                1,
+                "UNI",
+                "UNI",
+                ASSET_ID,
+            )
+        },
+        accounts={a.get_id(): a for a in accounts},
+        balances=indexes.index_balances(accounts),
+    )
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--journal-dir")
+    parser.add_argument("--snapshot")
+    parser.add_argument("--symbol", default=SYMBOL)
+    parser.add_argument("--market-id", default=MARKET_ID)
+    parser.add_argument("--synthetic-ticks", type=int, default=20_000)
+    parser.add_argument("--speed", type=float, default=None)
+    parser.add_argument("--no-strategy", action="store_true")
+    args = parser.parse_args()
+
+    config = Config(
+        node_url="",
+        tendermint_url="",
+        ws_url="",
+        wallet_url="",
+        wallet_token="",
+        market_id=args.market_id,
+        party_id=PARTY_ID,
+        binance_market=args.symbol,
+        binance_ws_url="",
+    )
+
+    journal_dir = args.journal_dir
+    if journal_dir is None:
+        journal_dir = tempfile.mkdtemp()
+        write_synthetic_journal(journal_dir, args.synthetic_ticks)
+        vega_store = synthetic_store(config)
+    else:
+        vega_store = VegaStore(config)
+        if args.snapshot is not None:
+            vega_store.restore_snapshot(args.snapshot)
+
+    binance_store = BinanceStore(symbols_to_subscribe=[args.symbol])
+    wallet = NullWallet()
+    strategy = SimpleMarketMaker(
+        binance_store=binance_store,
+        vega_store=vega_store,
+        config=config,
+        wallet=wallet,
+    )
+
+    def after_frame(source: str, channel: str) -> None:
+        if source == "binance":
+            strategy.execute()
+
+    driver = ReplayDriver(
+        vega_store=vega_store,
+        binance_store=binance_store,
+        speed=args.speed,
+        after_frame=None if args.no_strategy else after_frame,
+    )
+    frames = list(read_journal(journal_dir))
+
+    start = time.perf_counter()
+    stats = driver.run(iter(frames))
+    elapsed = time.perf_counter() - start
+    print(
+        f"Replayed {stats.frames} frames in {elapsed:.3f}s "
+        f"({stats.frames / elapsed:,.0f} frames/s), "
+        f"{wallet.transactions} transactions, max lag {stats.max_lag_seconds:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Measures reference price records passed through a `SharedRing` from a writer
+process to one or more reader processes, as between the feed processes and
+strategy workers of the multiprocess runtime. Reports the writer's rate, each
+reader's decode rate and records missed, and the latency from a record being
+written to it being decoded.
+
+Run with `python -m benchmarks.shared_ring_benchmark`.
+"""
+
+import argparse
+import multiprocessing
+import statistics
+import time
+
+from market_maker.models import ReferencePrice
+from market_maker.shm.records import (
+    REFERENCE_PRICE,
+    decode_reference_price,
+    encode_reference_price,
+)
+from market_maker.shm.ring_buffer import SharedRing
+
+
+def write(name: str, records: int, capacity: int, ready, start, results) -> None:
+    ring = SharedRing(name, REFERENCE_PRICE, capacity)
+    ready.wait()
+    start.set()
+    begin = time.perf_counter()
+    for i in range(records):
+        ring.write(
+            encode_reference_price(
+                ReferencePrice(
+                    symbol="BTCUSDT",
+                    bid_price=60_000 + i % 100,
+                    ask_price=60_001 + i % 100,
+                    received_at=time.perf_counter_ns(),
+                )
+            )
+        )
+    results.put(time.perf_counter() - begin)
+    ring.close()
+
+
+def read(name: str, records: int, capacity: int, ready, start, results) -> None:
+    ring = SharedRing(name, REFERENCE_PRICE, capacity)
+    ready.wait()
+    start.wait()
+    begin = time.perf_counter()
+    read_count = 0
+    latencies = []
+    while read_count + ring.overruns < records:
+        batch = ring.read()
+        now = time.perf_counter_ns()
+        for record in batch:
+            latencies.append(now - decode_reference_price(record).received_at)
+        read_count += len(batch)
+    results.put(
+        (
+            read_count,
+            ring.overruns,
+            time.perf_counter() - begin,
+            statistics.median(latencies) if latencies else 0,
+        )
+    )
+    ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--capacity", type=int, default=4096)
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    name = f"shared_ring_benchmark_{time.monotonic_ns()}"
+    for readers in args.readers:
+        ring = SharedRing(name, REFERENCE_PRICE, args.capacity, create=True)
+        ready = context.Barrier(readers + 1)
+        start = context.Event()
+        results = context.Queue()
+        write_results = context.Queue()
+        processes = [
+            context.Process(
+                target=read,
+                args=(name, args.records, args.capacity, ready, start, results),
+            )
+            for _ in range(readers)
+        ]
+        for process in processes:
+            process.start()
+
+        writer = context.Process(
+            target=write,
+            args=(name, args.records, args.capacity, ready, start, write_results),
+        )
+        writer.start()
+        write_seconds = write_results.get()
+        writer.join()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        ring.close()
+        ring.unlink()
+
+        print(
+            f"{readers} readers: written {args.records / write_seconds:,.0f}/s, "
+            f"read {sum(o[0] for o in outcomes) / max(o[2] for o in outcomes):,.0f}/s "
+            f"in total, missed {sum(o[1] for o in outcomes):,}, "
+            f"p50 latency {statistics.median(o[3] for o in outcomes) / 1e3:.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
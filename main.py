@@ -1,8 +1,13 @@
 from market_maker.store.binance_store import BinanceStore
 from market_maker.store.vega_store import VegaStore
 from market_maker.config import Config
+from market_maker.metrics import MetricsServer, latency_metrics
+from market_maker.replay.recorder import StreamRecorder
+from market_maker.strategy.multi_market_runner import MultiMarketRunner
 from market_maker.strategy.simple_market_maker import SimpleMarketMaker
-from market_maker.wallet import VegaWallet
+from market_maker.submission_scheduler import BlockClock, SubmissionScheduler
+from market_maker.transaction_tracker import TransactionTracker
+from market_maker.wallet import PipelinedVegaWallet, VegaWallet
 
 import rel
 import dotenv
@@ -14,28 +19,119 @@ def main():
     dotenv.load_dotenv()
     config = Config.from_env()
 
-    store = VegaStore(config)
-    binance_store = BinanceStore(symbols_to_subscribe=[config.binance_market])
+    if config.runtime == "asyncio":
+        from market_maker.aio.runtime import run
+
+        run(config)
+        return
+    if config.runtime == "multiprocess":
+        from market_maker.shm.runtime import run
+
+        run(config)
+        return
+
+    markets = config.markets or [(config.market_id, config.binance_market)]
+
+    if config.metrics_port is not None:
+        latency_metrics.enable()
+        MetricsServer(port=config.metrics_port).start()
+
+    recorder = None
+    if config.record_dir is not None:
+        recorder = StreamRecorder(config.record_dir)
+        recorder.start()
+
+    store = VegaStore(config, recorder=recorder)
+    binance_store = BinanceStore(
+        symbols_to_subscribe=list(
+            dict.fromkeys(
+                symbol for _, symbol in markets if symbol not in config.composite_prices
+            )
+        ),
+        recorder=recorder,
+        depth=config.reference_price_type != "touch",
+        depth_levels=config.reference_depth_levels,
+        vwap_notional=config.reference_vwap_notional,
+        composites=config.composite_prices,
+    )
 
     store.start(
-        market_id=config.market_id,
+        market_ids=[market_id for market_id, _ in markets],
         party_id=config.party_id,
     )
     binance_store.start()
 
-    wallet = VegaWallet(
-        token=config.wallet_token, wallet_url=config.wallet_url, pub_key=config.party_id
-    )
+    tracker = None
+    if config.track_transactions and config.tendermint_url:
+        tracker = TransactionTracker(
+            config.tendermint_url, window_seconds=config.rejection_window_seconds
+        )
+        tracker.start()
 
-    smm = SimpleMarketMaker(
-        binance_store=binance_store, vega_store=store, config=config, wallet=wallet
+    wallet = PipelinedVegaWallet(
+        VegaWallet(
+            token=config.wallet_token,
+            wallet_url=config.wallet_url,
+            pub_key=config.party_id,
+        ),
+        max_in_flight=config.wallet_max_in_flight,
+        on_complete=tracker.on_submission if tracker is not None else None,
     )
-    smm.run()
+    wallet.start()
+
+    block_clock = None
+    scheduler = None
+    if config.submission_rate_per_second is not None:
+        if config.tendermint_url:
+            block_clock = BlockClock(config.tendermint_url)
+            block_clock.start()
+        scheduler = SubmissionScheduler(
+            wallet,
+            rate_per_second=config.submission_rate_per_second,
+            burst=config.submission_burst,
+            max_batch_size=config.max_batch_size,
+            window_seconds=config.submission_window_seconds,
+            block_clock=block_clock,
+        )
+        scheduler.start()
+
+    strategies = [
+        SimpleMarketMaker(
+            binance_store=binance_store,
+            vega_store=store,
+            config=config,
+            wallet=scheduler if scheduler is not None else wallet,
+            update_freq_seconds=config.update_freq_seconds,
+            requote_threshold_bps=config.requote_threshold_bps,
+            min_requote_interval_seconds=config.min_requote_interval_seconds,
+            market_id=market_id,
+            binance_market=binance_market,
+            reference_price_type=config.reference_price_type,
+            max_reference_age_seconds=config.reference_max_age_seconds,
+            transaction_tracker=tracker,
+            max_rejection_rate=config.max_rejection_rate,
+        )
+        for market_id, binance_market in markets
+    ]
+    if len(strategies) == 1:
+        strategies[0].run()
+    else:
+        runner = MultiMarketRunner(strategies, max_workers=config.strategy_workers)
+        runner.run()
 
     # Now run event loop (Send SIGINT (Ctrl+C) to close)
     rel.dispatch()
     store.stop()
     binance_store.stop()
+    if scheduler is not None:
+        scheduler.stop()
+    if block_clock is not None:
+        block_clock.stop()
+    wallet.stop()
+    if tracker is not None:
+        tracker.stop()
+    if recorder is not None:
+        recorder.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from binance import AsyncClient, BinanceSocketManager
+
+from market_maker.models import ReferencePrice
+from market_maker.store.binance_depth_book import BinanceDepthBook
+from market_maker.store.binance_store import BinanceStore, resync_delay
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBinanceFeed:
+    def __init__(self, store: BinanceStore):
+        """Feeds a `BinanceStore` from python-binance's asyncio client on the
+        running event loop, in place of the store's `ThreadedWebsocketManager`
+        and snapshot threads.
+
+        Ticks reach the store and its listeners on the loop's thread, with no
+        handoff between threads.
+
+        Start the feed by awaiting `start`.
+        """
+        self._store = store
+        self._client: Optional[AsyncClient] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        store = self._store
+        self._client = await AsyncClient.create()
+        tickers = await asyncio.gather(
+            *(
+                self._client.get_orderbook_ticker(symbol=symbol)
+                for symbol in store.symbols
+            )
+        )
+        for ticker in tickers:
+            store.publish(
+                ReferencePrice(
+                    symbol=ticker["symbol"],
+                    bid_price=float(ticker["bidPrice"]),
+                    ask_price=float(ticker["askPrice"]),
+                    received_at=time.perf_counter_ns(),
+                )
+            )
+
+        if not store.depth:
+            self._spawn(
+                self._stream(
+                    [f"{symbol.lower()}@bookTicker" for symbol in store.symbols],
+                    store.on_tick,
+                )
+            )
+            return
+
+        store.set_resync_handler(lambda book: self._spawn(self._fetch_snapshot(book)))
+        # As with the threaded client, diffs are streamed before the
+        # snapshots are fetched so that none are missed in between
+        self._spawn(
+            self._stream(
+                [f"{symbol.lower()}@depth@100ms" for symbol in store.symbols],
+                store.on_depth,
+            )
+        )
+        store.resync_depth_books()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._client is not None:
+            await self._client.close_connection()
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _stream(self, streams: list[str], handler) -> None:
+        # The socket manager reconnects by itself and reports failures as
+        # error events in place of messages
+        async with BinanceSocketManager(self._client).multiplex_socket(
+            streams
+        ) as socket:
+            while True:
+                message = await socket.recv()
+                if "data" not in message:
+                    logger.error(f"Error on Binance stream: {message}")
+                    continue
+                try:
+                    handler(message)
+                except Exception:
+                    logger.exception("Failed to handle Binance message")
+
+    async def _fetch_snapshot(self, book: BinanceDepthBook) -> None:
+        # Retried until the book syncs, or the task is cancelled on stop
+        attempt = 0
+        try:
+            while True:
+                try:
+                    snapshot = await self._client.get_order_book(
+                        symbol=book.symbol, limit=1000
+                    )
+                    if self._store.apply_depth_snapshot(
+                        {"s": book.symbol, "snapshot": snapshot}
+                    ):
+                        return
+                    logger.warning(f"Snapshot of {book.symbol} depth book is stale")
+                except Exception:
+                    logger.exception(f"Failed to fetch {book.symbol} depth snapshot")
+                await asyncio.sleep(resync_delay(attempt))
+                attempt += 1
+        finally:
+            self._store.resync_finished(book.symbol)
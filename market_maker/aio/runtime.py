@@ -0,0 +1,154 @@
+"""
+Runs the market maker on a single asyncio event loop.
+
+Selected with `RUNTIME=asyncio`. The Vega and Binance streams, strategy
+scheduling and wallet requests all run as tasks on one loop, optionally
+uvloop's, so a tick reaches the strategy and its transaction reaches the
+wallet without crossing threads. Work off that path keeps its own threads:
+the initial REST load, resyncs after reconnects, transaction tracking,
+submission rate limiting, snapshots, recording and the metrics server.
+"""
+
+import asyncio
+import logging
+
+from market_maker.aio.binance_feed import AsyncBinanceFeed
+from market_maker.aio.strategy_runner import AsyncStrategyRunner
+from market_maker.aio.vega_web_socket_client import AsyncVegaWebSocketClient
+from market_maker.aio.wallet import AsyncVegaWallet
+from market_maker.config import Config
+from market_maker.metrics import MetricsServer, latency_metrics
+from market_maker.replay.recorder import StreamRecorder
+from market_maker.store.binance_store import BinanceStore
+from market_maker.store.vega_store import VegaStore
+from market_maker.strategy.simple_market_maker import SimpleMarketMaker
+from market_maker.submission_scheduler import BlockClock, SubmissionScheduler
+from market_maker.transaction_tracker import TransactionTracker
+from market_maker.wallet import VegaWallet
+
+logger = logging.getLogger(__name__)
+
+
+def run(config: Config) -> None:
+    if config.use_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            logger.info("uvloop is not installed, using the default event loop")
+        else:
+            uvloop.install()
+    asyncio.run(_run(config))
+
+
+async def _run(config: Config) -> None:
+    markets = config.markets or [(config.market_id, config.binance_market)]
+
+    if config.metrics_port is not None:
+        latency_metrics.enable()
+        MetricsServer(port=config.metrics_port).start()
+
+    recorder = None
+    if config.record_dir is not None:
+        recorder = StreamRecorder(config.record_dir)
+        recorder.start()
+
+    store = VegaStore(
+        config, recorder=recorder, ws_client_class=AsyncVegaWebSocketClient
+    )
+    binance_store = BinanceStore(
+        symbols_to_subscribe=list(
+            dict.fromkeys(
+                symbol for _, symbol in markets if symbol not in config.composite_prices
+            )
+        ),
+        recorder=recorder,
+        depth=config.reference_price_type != "touch",
+        depth_levels=config.reference_depth_levels,
+        vwap_notional=config.reference_vwap_notional,
+        composites=config.composite_prices,
+    )
+    binance_feed = AsyncBinanceFeed(binance_store)
+
+    # The initial load is blocking REST, run before anything else needs the
+    # loop. The store's streams start as tasks once it is done
+    await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: store.start(
+            market_ids=[market_id for market_id, _ in markets],
+            party_id=config.party_id,
+        ),
+    )
+    await binance_feed.start()
+
+    tracker = None
+    if config.track_transactions and config.tendermint_url:
+        tracker = TransactionTracker(
+            config.tendermint_url, window_seconds=config.rejection_window_seconds
+        )
+        tracker.start()
+
+    wallet = AsyncVegaWallet(
+        VegaWallet(
+            token=config.wallet_token,
+            wallet_url=config.wallet_url,
+            pub_key=config.party_id,
+        ),
+        max_in_flight=config.wallet_max_in_flight,
+        on_complete=tracker.on_submission if tracker is not None else None,
+    )
+    wallet.start()
+
+    block_clock = None
+    scheduler = None
+    if config.submission_rate_per_second is not None:
+        if config.tendermint_url:
+            block_clock = BlockClock(config.tendermint_url)
+            block_clock.start()
+        scheduler = SubmissionScheduler(
+            wallet,
+            rate_per_second=config.submission_rate_per_second,
+            burst=config.submission_burst,
+            max_batch_size=config.max_batch_size,
+            window_seconds=config.submission_window_seconds,
+            block_clock=block_clock,
+        )
+        scheduler.start()
+
+    runner = AsyncStrategyRunner(
+        [
+            SimpleMarketMaker(
+                binance_store=binance_store,
+                vega_store=store,
+                config=config,
+                wallet=scheduler if scheduler is not None else wallet,
+                update_freq_seconds=config.update_freq_seconds,
+                requote_threshold_bps=config.requote_threshold_bps,
+                min_requote_interval_seconds=config.min_requote_interval_seconds,
+                market_id=market_id,
+                binance_market=binance_market,
+                reference_price_type=config.reference_price_type,
+                max_reference_age_seconds=config.reference_max_age_seconds,
+                transaction_tracker=tracker,
+                max_rejection_rate=config.max_rejection_rate,
+            )
+            for market_id, binance_market in markets
+        ]
+    )
+    runner.run()
+
+    try:
+        # Runs until cancelled, by Ctrl+C through `asyncio.run`
+        await asyncio.Event().wait()
+    finally:
+        runner.stop()
+        store.stop()
+        await binance_feed.stop()
+        if scheduler is not None:
+            scheduler.stop()
+        if block_clock is not None:
+            block_clock.stop()
+        await wallet.stop()
+        if tracker is not None:
+            tracker.stop()
+        if recorder is not None:
+            recorder.stop()
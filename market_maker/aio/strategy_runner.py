@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import threading
+import time
+
+from market_maker.strategy.simple_market_maker import SimpleMarketMaker
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStrategyRunner:
+    def __init__(self, strategies: list[SimpleMarketMaker]):
+        """Schedules each strategy as a task on the running event loop, in
+        place of a thread per strategy or a `MultiMarketRunner` pool.
+
+        A strategy's task sleeps until its heartbeat is due or a reference
+        move wakes it, then requotes inline. Requotes never block, as the
+        wallet only queues transactions, so the strategies share the loop
+        with the feeds without a thread handoff between tick and quote.
+
+        Must be created on the loop's thread. Start the tasks by calling `run`.
+        """
+        self._strategies = strategies
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._tasks: list[asyncio.Task] = []
+
+    def run(self) -> None:
+        for strategy in self._strategies:
+            wake = asyncio.Event()
+            strategy.set_requote_callback(lambda wake=wake: self._wake(wake))
+            self._tasks.append(self._loop.create_task(self._run(strategy, wake)))
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def _wake(self, wake: asyncio.Event) -> None:
+        if threading.get_ident() == self._loop_thread_id:
+            wake.set()
+        else:
+            self._loop.call_soon_threadsafe(wake.set)
+
+    async def _run(self, strategy: SimpleMarketMaker, wake: asyncio.Event) -> None:
+        while True:
+            # Cleared before checking, so a wake up from here on is not lost
+            wake.clear()
+            delay = strategy.seconds_until_due(time.monotonic())
+            if delay == 0:
+                strategy.requote()
+                # Let the feeds run between back to back requotes
+                await asyncio.sleep(0)
+                continue
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
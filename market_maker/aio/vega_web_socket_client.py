@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+import aiohttp
+
+from market_maker.client.ws.vega_web_socket_client import (
+    RECONNECT_DELAY_SECONDS,
+    StreamStatus,
+    VegaWebSocketClient,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncVegaWebSocketClient(VegaWebSocketClient):
+    def __init__(self, *args: Any, **kwargs: Any):
+        """Streams from the data node as tasks on the running event loop
+        instead of sockets driven by `rel`.
+
+        Must be created on the loop's thread, subscriptions may then be made
+        from any thread. Messages are framed and handed to callbacks exactly
+        as by `VegaWebSocketClient`, on the loop's thread.
+        """
+        super().__init__(*args, **kwargs)
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def stop(self):
+        self._stopped = True
+        self._loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._session is not None:
+            self._loop.create_task(self._session.close())
+
+    def subscribe_endpoint(
+        self, url: str, msg_type: str, callback: Callable[[dict], Any]
+    ) -> None:
+        self.streams[msg_type] = StreamStatus()
+        if threading.get_ident() == self._loop_thread_id:
+            self._start_stream(url, msg_type, callback)
+        else:
+            self._loop.call_soon_threadsafe(self._start_stream, url, msg_type, callback)
+
+    def _start_stream(
+        self, url: str, msg_type: str, callback: Callable[[dict], Any]
+    ) -> None:
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        task = self._loop.create_task(self._stream(url, msg_type, callback))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _stream(
+        self, url: str, msg_type: str, callback: Callable[[dict], Any]
+    ) -> None:
+        while not self._stopped:
+            try:
+                async with self._session.ws_connect(url, heartbeat=30) as ws:
+                    self._on_open(msg_type)
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            try:
+                                self._on_message(
+                                    message=message.data,
+                                    msg_type=msg_type,
+                                    callback=callback,
+                                )
+                            except Exception:
+                                logger.exception(f"Failed to handle {msg_type}")
+                        elif message.type == aiohttp.WSMsgType.ERROR:
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Error on {msg_type} stream")
+            self._on_disconnected(msg_type)
+            if not self._stopped:
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
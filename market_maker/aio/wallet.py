@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional, Union
+
+import aiohttp
+
+from market_maker.metrics import latency_metrics
+from market_maker.wallet import SubmissionResult, VegaWallet, transaction_key
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncVegaWallet:
+    def __init__(
+        self,
+        wallet: VegaWallet,
+        max_in_flight: int = 1,
+        on_complete: Optional[Callable[[SubmissionResult], Any]] = None,
+    ):
+        """Sends transactions to the wallet service as tasks on the running
+        event loop, with the same keying as `PipelinedVegaWallet`: at most one
+        transaction per key and `max_in_flight` in total at a time, and an
+        unsent transaction replaced by a newer one for the same key.
+
+        Must be created on the loop's thread. Transactions may be submitted
+        from any thread, and are sent without a thread handoff when submitted
+        from the loop's own.
+
+        Start sending by calling `start`.
+
+        Args:
+            wallet:
+                VegaWallet, wallet whose service URL, token and key are used
+            max_in_flight:
+                int, maximum number of transactions awaiting a wallet response
+            on_complete:
+                Optional[Callable], called on the loop's thread with the
+                latency and outcome of each transaction sent
+        """
+        self._wallet = wallet
+        self._max_in_flight = max_in_flight
+        self._on_complete = on_complete
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Only modified on the loop's thread
+        self._pending: dict[str, tuple[Union[dict, bytes], float, Optional[int]]] = {}
+        self._in_flight: set[str] = set()
+
+    @property
+    def pub_key(self) -> str:
+        return self._wallet.pub_key
+
+    def start(self) -> None:
+        self._session = aiohttp.ClientSession(
+            headers=dict(self._wallet.session.headers)
+        )
+
+    async def stop(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    def is_busy(self, key: str) -> bool:
+        return key in self._pending or key in self._in_flight
+
+    def submit_transaction(
+        self,
+        transaction: Union[dict, bytes],
+        key: Optional[str] = None,
+        origin_ns: Optional[int] = None,
+    ) -> None:
+        key = key if key is not None else transaction_key(transaction)
+        if threading.get_ident() == self._loop_thread_id:
+            self._enqueue(key, transaction, origin_ns)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, key, transaction, origin_ns)
+
+    def _enqueue(
+        self, key: str, transaction: Union[dict, bytes], origin_ns: Optional[int]
+    ) -> None:
+        if key in self._pending:
+            logger.debug(f"Replacing unsent transaction for {key}")
+        self._pending[key] = (transaction, time.monotonic(), origin_ns)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for key in list(self._pending):
+            if len(self._in_flight) >= self._max_in_flight:
+                return
+            if key in self._in_flight:
+                continue
+            transaction, submitted_at, origin_ns = self._pending.pop(key)
+            self._in_flight.add(key)
+            self._loop.create_task(
+                self._send(key, transaction, submitted_at, origin_ns)
+            )
+
+    async def _send(
+        self,
+        key: str,
+        transaction: Union[dict, bytes],
+        submitted_at: float,
+        origin_ns: Optional[int],
+    ) -> None:
+        sent_at = time.monotonic()
+        latency_metrics.record("wallet_queue", int((sent_at - submitted_at) * 1e9))
+        result = None
+        error = None
+        try:
+            result = await self._post(transaction, origin_ns)
+        except Exception as e:
+            logger.exception(f"Failed to submit transaction for {key}")
+            error = e
+        finally:
+            self._in_flight.discard(key)
+            self._dispatch()
+
+        if self._on_complete is not None:
+            try:
+                self._on_complete(
+                    SubmissionResult(
+                        key=key,
+                        latency_seconds=time.monotonic() - submitted_at,
+                        queued_seconds=sent_at - submitted_at,
+                        result=result,
+                        error=error,
+                    )
+                )
+            except Exception:
+                logger.exception("Submission completion callback failed")
+
+    async def _post(
+        self, transaction: Union[dict, bytes], origin_ns: Optional[int]
+    ) -> dict:
+        wallet = self._wallet
+        sent_at = time.perf_counter_ns()
+        if origin_ns:
+            latency_metrics.record("tick_to_send", sent_at - origin_ns)
+        async with self._session.post(
+            wallet.wallet_url + "/api/v2/requests",
+            data=wallet.encode_request(transaction),
+            headers={"Content-Type": "application/json"},
+        ) as response:
+            response.raise_for_status()
+            response_json = await response.json(content_type=None)
+        latency_metrics.record_since("wallet_round_trip", sent_at)
+        if origin_ns:
+            latency_metrics.record_since("tick_to_ack", origin_ns)
+        if response_json.get("error") is not None:
+            raise RuntimeError(f"Wallet rejected transaction: {response_json['error']}")
+        return response_json.get("result", {})
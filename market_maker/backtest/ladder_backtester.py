@@ -0,0 +1,277 @@
+"""
+Vectorised backtester for the quote ladder used by `SimpleMarketMaker`.
+
+Rather than running the per-tick strategy code, a bookTicker series is split
+into requote windows and every combination of ladder parameters is evaluated
+at once with array operations. The ladder is assumed to be requoted at the
+start of each window from the reference bid and ask at that time, and an order
+is taken as filled in full if the reference price on the other side crosses
+it before the next requote. Order sizes are fixed notional per level, so the
+inventory adjustment made by the live strategy when sizing each side is not
+modelled.
+"""
+
+import argparse
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from market_maker.replay.replayer import read_journal
+from market_maker.store.binance_depth_book import BinanceDepthBook
+
+
+@dataclass
+class BookTickerSeries:
+    # Receive times in nanoseconds, with best bid and ask prices
+    timestamps: np.ndarray
+    bid: np.ndarray
+    ask: np.ndarray
+
+    @classmethod
+    def from_journal(cls, journal_dir: str, symbol: str) -> "BookTickerSeries":
+        """Loads the bookTicker ticks for a symbol from a stream journal
+        written by `StreamRecorder`. For depth journals the book is rebuilt
+        from the recorded snapshots and diffs, and its touch is taken after
+        each one applied while synced.
+        """
+        timestamps = []
+        bids = []
+        asks = []
+        book = BinanceDepthBook(symbol)
+        for received_at, source, channel, frame in read_journal(journal_dir):
+            if source != "binance":
+                continue
+            if channel == "bookTicker":
+                if frame["data"]["s"] != symbol:
+                    continue
+                timestamps.append(received_at)
+                bids.append(frame["data"]["b"])
+                asks.append(frame["data"]["a"])
+                continue
+
+            if channel == "depth_snapshot" and frame["s"] == symbol:
+                book.apply_snapshot(frame["snapshot"])
+            elif channel == "depth" and frame["data"]["s"] == symbol:
+                book.apply_diff(frame["data"])
+            else:
+                continue
+            if book.synced and book.best_bid and book.best_ask:
+                timestamps.append(received_at)
+                bids.append(book.best_bid[0])
+                asks.append(book.best_ask[0])
+        if not timestamps:
+            raise ValueError(f"No ticks for {symbol} in {journal_dir}")
+        return cls(
+            timestamps=np.asarray(timestamps, dtype=np.int64),
+            bid=np.asarray(bids, dtype=np.float64),
+            ask=np.asarray(asks, dtype=np.float64),
+        )
+
+    @classmethod
+    def synthetic(
+        cls,
+        num_ticks: int,
+        tick_interval_ms: float = 100,
+        start_price: float = 100,
+        volatility: float = 0.0002,
+        half_spread: float = 0.0002,
+        seed: int = 0,
+    ) -> "BookTickerSeries":
+        rng = np.random.default_rng(seed)
+        mid = start_price * np.exp(np.cumsum(rng.normal(0, volatility, num_ticks)))
+        return cls(
+            timestamps=(np.arange(num_ticks) * tick_interval_ms * 1e6).astype(np.int64),
+            bid=mid * (1 - half_spread),
+            ask=mid * (1 + half_spread),
+        )
+
+
+@dataclass
+class BacktestResult:
+    # One entry per parameter combination
+    level_spacing: np.ndarray
+    levels: np.ndarray
+    balance_fraction: np.ndarray
+
+    buy_fills: np.ndarray
+    sell_fills: np.ndarray
+    # Traded notional, in quote currency
+    volume: np.ndarray
+    # Final and largest absolute inventory, in base currency
+    inventory: np.ndarray
+    max_abs_inventory: np.ndarray
+    # Cash plus inventory marked at the final mid price
+    pnl: np.ndarray
+
+    def summary(self, top: Optional[int] = None) -> str:
+        order = np.argsort(-self.pnl)
+        if top is not None:
+            order = order[:top]
+        lines = [
+            f"{'spacing':>8} {'levels':>6} {'fraction':>8} {'buys':>7} {'sells':>7} "
+            f"{'volume':>12} {'inventory':>10} {'max inv':>10} {'pnl':>10}"
+        ]
+        for i in order:
+            lines.append(
+                f"{self.level_spacing[i]:>8.4f} {self.levels[i]:>6d} "
+                f"{self.balance_fraction[i]:>8.2f} {self.buy_fills[i]:>7d} "
+                f"{self.sell_fills[i]:>7d} {self.volume[i]:>12.2f} "
+                f"{self.inventory[i]:>10.4f} {self.max_abs_inventory[i]:>10.4f} "
+                f"{self.pnl[i]:>10.2f}"
+            )
+        return "\n".join(lines)
+
+
+def run_grid(
+    series: BookTickerSeries,
+    level_spacings: list[float],
+    levels: list[int],
+    balance_fractions: list[float],
+    balance: float,
+    requote_seconds: float = 30,
+    max_chunk_elements: int = 4_000_000,
+) -> BacktestResult:
+    """Evaluates every combination of ladder parameters over a tick series.
+
+    Args:
+        series:
+            BookTickerSeries, reference prices to quote around
+        level_spacings:
+            list[float], distance between ladder levels as a fraction of the
+            reference price, 0.002 in the live strategy
+        levels:
+            list[int], number of levels per side, 5 in the live strategy
+        balance_fractions:
+            list[float], fraction of the balance quoted on each side, 0.5 in
+            the live strategy
+        balance:
+            float, settlement asset balance
+        requote_seconds:
+            float, time between requotes
+        max_chunk_elements:
+            int, bound on the size of intermediate arrays, windows are
+            processed in chunks to stay under it
+    """
+    if not len(series.timestamps):
+        raise ValueError("No ticks to backtest")
+    grid = np.array(
+        list(itertools.product(level_spacings, levels, balance_fractions)),
+        dtype=np.float64,
+    )
+    spacing = grid[:, 0]
+    num_levels = grid[:, 1].astype(np.int64)
+    fraction = grid[:, 2]
+    num_params = len(grid)
+    max_levels = int(num_levels.max())
+
+    # (params, levels) price offsets and per-level notional, zero beyond each
+    # combination's own number of levels
+    level_idx = np.arange(max_levels)
+    active = level_idx[None, :] < num_levels[:, None]
+    offsets = (level_idx[None, :] + 1) * spacing[:, None]
+    notional = np.where(active, (balance * fraction / num_levels)[:, None], 0.0)
+
+    # Requote windows, each quoted from the first tick within it
+    window_id = (series.timestamps - series.timestamps[0]) // int(requote_seconds * 1e9)
+    starts = np.flatnonzero(np.r_[True, np.diff(window_id) != 0])
+    quote_bid = series.bid[starts]
+    quote_ask = series.ask[starts]
+    window_min_ask = np.minimum.reduceat(series.ask, starts)
+    window_max_bid = np.maximum.reduceat(series.bid, starts)
+    num_windows = len(starts)
+
+    buy_fills = np.zeros(num_params, dtype=np.int64)
+    sell_fills = np.zeros(num_params, dtype=np.int64)
+    volume = np.zeros(num_params)
+    cash = np.zeros(num_params)
+    inventory = np.zeros(num_params)
+    max_abs_inventory = np.zeros(num_params)
+
+    chunk = max(max_chunk_elements // (num_params * max_levels), 1)
+    for begin in range(0, num_windows, chunk):
+        end = min(begin + chunk, num_windows)
+
+        # (params, windows, levels)
+        buy_price = quote_bid[None, begin:end, None] * (1 - offsets[:, None, :])
+        sell_price = quote_ask[None, begin:end, None] * (1 + offsets[:, None, :])
+        buy_filled = (window_min_ask[None, begin:end, None] <= buy_price) & active[
+            :, None, :
+        ]
+        sell_filled = (window_max_bid[None, begin:end, None] >= sell_price) & active[
+            :, None, :
+        ]
+
+        # Each level quotes a fixed notional, so size is notional / price
+        level_notional = notional[:, None, :]
+        bought = np.where(buy_filled, level_notional / buy_price, 0).sum(axis=2)
+        sold = np.where(sell_filled, level_notional / sell_price, 0).sum(axis=2)
+        spent = np.where(buy_filled, level_notional, 0).sum(axis=2)
+        received = np.where(sell_filled, level_notional, 0).sum(axis=2)
+
+        path = inventory[:, None] + np.cumsum(bought - sold, axis=1)
+        max_abs_inventory = np.maximum(max_abs_inventory, np.abs(path).max(axis=1))
+        inventory = path[:, -1]
+
+        buy_fills += buy_filled.sum(axis=(1, 2))
+        sell_fills += sell_filled.sum(axis=(1, 2))
+        volume += (spent + received).sum(axis=1)
+        cash += (received - spent).sum(axis=1)
+
+    final_mid = (series.bid[-1] + series.ask[-1]) / 2
+    return BacktestResult(
+        level_spacing=spacing,
+        levels=num_levels,
+        balance_fraction=fraction,
+        buy_fills=buy_fills,
+        sell_fills=sell_fills,
+        volume=volume,
+        inventory=inventory,
+        max_abs_inventory=max_abs_inventory,
+        pnl=cash + inventory * final_mid,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--journal-dir", help="Stream journal, synthetic if unset")
+    parser.add_argument("--symbol", default="UNIUSDT")
+    parser.add_argument("--synthetic-ticks", type=int, default=10_000_000)
+    parser.add_argument("--balance", type=float, default=10_000)
+    parser.add_argument("--requote-seconds", type=float, default=30)
+    parser.add_argument(
+        "--spacings", type=float, nargs="+", default=[0.0005, 0.001, 0.002, 0.004]
+    )
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--fractions", type=float, nargs="+", default=[0.25, 0.5])
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.journal_dir is not None:
+        series = BookTickerSeries.from_journal(args.journal_dir, args.symbol)
+    else:
+        series = BookTickerSeries.synthetic(args.synthetic_ticks)
+    loaded = time.perf_counter()
+
+    result = run_grid(
+        series,
+        level_spacings=args.spacings,
+        levels=args.levels,
+        balance_fractions=args.fractions,
+        balance=args.balance,
+        requote_seconds=args.requote_seconds,
+    )
+    finished = time.perf_counter()
+
+    print(result.summary(top=args.top))
+    print(
+        f"{len(series.timestamps):,} ticks, {len(result.pnl)} parameter sets: "
+        f"loaded in {loaded - start:.2f}s, evaluated in {finished - loaded:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
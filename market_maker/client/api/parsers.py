@@ -1,10 +1,11 @@
 import logging
+import sys
 import time
 from typing import Optional
 
 import requests
 
-from market_maker.models import Account, Asset, Market, Order, Position
+from market_maker.models import Account, Asset, Market, MarketData, Order, Position
 from market_maker.submission import (
     BatchMarketInstruction,
     OrderAmendment,
@@ -12,7 +13,10 @@ from market_maker.submission import (
     OrderSubmission,
 )
 from market_maker.config import Config
-from market_maker.utils.decimal_utils import convert_to_decimals
+
+# IDs and enum values repeat across thousands of orders and accounts, so are
+# interned to share one string each. Order IDs are unique and left alone
+_intern = sys.intern
 
 
 def parse_asset(node: dict) -> Asset:
@@ -26,45 +30,39 @@ def parse_asset(node: dict) -> Asset:
     )
 
 
-def parse_account(node: dict, asset_decimal_places: int) -> Account:
+def parse_account(node: dict) -> Account:
     return Account(
-        node["owner"],
-        node["type"],
-        convert_to_decimals(asset_decimal_places, float(node["balance"])),
-        node["asset"],
-        node["marketId"],
+        _intern(node["owner"]),
+        _intern(node["type"]),
+        int(node["balance"]),
+        _intern(node["asset"]),
+        _intern(node["marketId"]),
     )
 
 
-def parse_order(
-    node: dict, position_decimal_places: int, price_decimal_places: int
-) -> Order:
+def parse_order(node: dict) -> Order:
     return Order(
         node["id"],
-        node["marketId"],
-        convert_to_decimals(position_decimal_places, float(node["size"])),
-        convert_to_decimals(position_decimal_places, float(node["remaining"])),
-        convert_to_decimals(price_decimal_places, float(node["price"])),
-        node["type"],
-        node["timeInForce"],
-        node["status"],
-        node["partyId"],
+        _intern(node["marketId"]),
+        int(node["size"]),
+        int(node["remaining"]),
+        int(node["price"]),
+        _intern(node["type"]),
+        _intern(node["timeInForce"]),
+        _intern(node["status"]),
+        _intern(node["partyId"]),
+        _intern(node["side"]),
     )
 
 
-def parse_position(
-    node: dict,
-    position_decimal_places: int,
-    price_decimal_places: int,
-    asset_decimal_places: int,
-) -> Position:
+def parse_position(node: dict) -> Position:
     return Position(
-        node["partyId"],
-        node["marketId"],
-        convert_to_decimals(position_decimal_places, float(node["openVolume"])),
-        convert_to_decimals(price_decimal_places, float(node["averageEntryPrice"])),
-        convert_to_decimals(asset_decimal_places, float(node["unrealisedPnl"])),
-        convert_to_decimals(asset_decimal_places, float(node["realisedPnl"])),
+        _intern(node["partyId"]),
+        _intern(node["marketId"]),
+        int(node["openVolume"]),
+        int(node["averageEntryPrice"]),
+        int(node["unrealisedPnl"]),
+        int(node["realisedPnl"]),
     )
 
 
@@ -79,6 +77,22 @@ def parse_market(node: dict) -> Market:
         instrument["code"],
         instrument["name"],
         instrument["future"]["settlementAsset"],
+        # Only sent by data nodes recent enough to enforce it
+        tick_size=int(node.get("tickSize") or 1),
+    )
+
+
+def parse_market_data(node: dict) -> MarketData:
+    return MarketData(
+        _intern(node["market"]),
+        int(node["markPrice"]),
+        int(node["bestBidPrice"]),
+        int(node["bestOfferPrice"]),
+        int(node["bestBidVolume"]),
+        int(node["bestOfferVolume"]),
+        int(node["openInterest"]),
+        _intern(node["marketTradingMode"]),
+        _intern(node["marketState"]),
     )
 
 
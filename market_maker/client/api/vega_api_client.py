@@ -3,6 +3,7 @@ import time
 from typing import Optional
 
 import requests
+import requests.adapters
 
 from market_maker.config import Config
 from market_maker.submission import (
@@ -12,11 +13,26 @@ from market_maker.submission import (
     OrderSubmission,
 )
 
+# Shared between all REST calls so that connections to the data node are kept
+# alive and reused, with enough of them pooled for concurrent fetches
+_session = requests.Session()
+_session.mount(
+    "https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+)
+_session.mount(
+    "http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+)
 
-def execute_get_request(path: str, key: str, config: Config):
+
+def execute_get_request(
+    path: str, key: str, config: Config, params: Optional[dict] = None
+):
     query_url = f"{config.node_url}/{path}"
+    params = dict(params or {})
+    if config.page_size is not None:
+        params["pagination.first"] = config.page_size
 
-    response = requests.get(query_url)
+    response = _session.get(query_url, params=params)
     response.raise_for_status()
 
     results = []
@@ -29,10 +45,8 @@ def execute_get_request(path: str, key: str, config: Config):
     # Each query will have a 'pageInfo' component which gives details about pagination.
     # Use the `endCursor` field to start the next query's results
     while response_json[key]["pageInfo"]["hasNextPage"]:
-        response = requests.get(
-            query_url
-            + f"&pagination.after={response_json[key]['pageInfo']['endCursor']}"
-        )
+        params["pagination.after"] = response_json[key]["pageInfo"]["endCursor"]
+        response = _session.get(query_url, params=params)
         response.raise_for_status()
         response_json = response.json()
         edges = response_json[key]["edges"]
@@ -52,22 +66,31 @@ def get_assets(config: Config) -> list[dict]:
 
 def get_accounts(party_id: str, config: Config) -> list[dict]:
     return execute_get_request(
-        f"accounts?filter.partyIds={party_id}", "accounts", config=config
+        "accounts", "accounts", config=config, params={"filter.partyIds": party_id}
     )
 
 
 def get_open_orders(party_id: str, config: Config) -> list[dict]:
     return execute_get_request(
-        f"orders?partyId={party_id}&liveOnly=true", "orders", config=config
+        "orders",
+        "orders",
+        config=config,
+        params={"partyId": party_id, "liveOnly": "true"},
     )
 
 
 def get_positions(party_id: str, config: Config) -> list[dict]:
     return execute_get_request(
-        f"positions?partyId={party_id}", "positions", config=config
+        "positions", "positions", config=config, params={"partyId": party_id}
     )
 
 
+def get_market_depth(market_id: str, config: Config) -> dict:
+    response = _session.get(f"{config.node_url}/market/depth/{market_id}/latest")
+    response.raise_for_status()
+    return response.json()
+
+
 def get_token(config: Config) -> Optional[str]:
     response = requests.post(
         f"{config.wallet_url}/api/v1/auth/token",
@@ -109,18 +132,23 @@ def print_error_if_exists(tx_hash: str, config: Config):
     print_error_if_exists_retry(tx_hash, 0, config=config)
 
 
-def print_error_if_exists_retry(tx_hash: str, attempt: int, config: Config):
-    response = requests.get(f"{config.tendermint_url}/tx?hash=0x{tx_hash}")
-    if response.status_code != 200:
-        logging.error(response.json())
-    elif response.json().get("result") is not None:
-        tx_result = response.json()["result"]["tx_result"]
-        code = tx_result["code"]
-        if code > 0:
-            logging.error(tx_result["info"])
-    elif response.json().get("error") is not None:
-        if attempt < 10:
+def print_error_if_exists_retry(
+    tx_hash: str, attempt: int, config: Config, max_attempts: int = 10
+):
+    # Blocks while polling, long running callers should hand transactions to
+    # a `market_maker.transaction_tracker.TransactionTracker` instead
+    for attempt in range(attempt, max_attempts + 1):
+        response = requests.get(f"{config.tendermint_url}/tx?hash=0x{tx_hash}")
+        if response.status_code != 200:
+            logging.error(response.json())
+            return
+        elif response.json().get("result") is not None:
+            tx_result = response.json()["result"]["tx_result"]
+            if tx_result["code"] > 0:
+                logging.error(tx_result["info"])
+            return
+        elif response.json().get("error") is None:
+            return
+        if attempt < max_attempts:
             time.sleep(0.25)
-            print_error_if_exists_retry(tx_hash, attempt + 1)
-        else:
-            logging.error(f"Transaction not found: {tx_hash}")
+    logging.error(f"Transaction not found: {tx_hash}")
@@ -0,0 +1,138 @@
+import json
+import logging
+import re
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+
+    _default_loads = orjson.loads
+except ImportError:  # pragma: no cover - optional dependency
+    _default_loads = json.loads
+
+
+logger = logging.getLogger(__name__)
+
+# 64MiB is comfortably above the largest snapshots seen from a data node
+DEFAULT_MAX_BUFFER_SIZE = 64 * 1024 * 1024
+
+# Outside of a string only braces change the framing state, so each match
+# skips over plain text and whole string literals straight to the next brace.
+# The patterns are unrolled loops to keep matching linear on malformed input
+_STRING_BODY = r'[^"\\]*(?:\\.[^"\\]*)*'
+_NEXT_BRACE = re.compile(r'[^"{}]*(?:"' + _STRING_BODY + r'"[^"{}]*)*([{}])', re.S)
+_NEXT_OPEN_STRING = re.compile(r'[^"]*(?:"' + _STRING_BODY + r'"[^"]*)*', re.S)
+# A string cut off by the end of a fragment leaves the closing-quote group
+# empty, possibly followed by a lone backslash
+_STRING_TAIL = re.compile(_STRING_BODY + r'(")?', re.S)
+
+
+class JsonStreamFramer:
+    def __init__(
+        self,
+        max_buffer_size: int = DEFAULT_MAX_BUFFER_SIZE,
+        loads: Optional[Callable[[str], Any]] = None,
+    ):
+        """Incrementally frames a stream of JSON objects arriving in arbitrary
+        fragments.
+
+        Each fragment is scanned exactly once, tracking brace depth and string
+        state, and each object is decoded exactly once when its closing brace
+        arrives.
+
+        Args:
+            max_buffer_size:
+                int, maximum number of characters held for a single incomplete
+                object before it is discarded as malformed
+            loads:
+                Optional[Callable], JSON decoder to use. Defaults to `orjson`
+                where installed, falling back to the standard library
+        """
+        self._max_buffer_size = max_buffer_size
+        self._loads = loads if loads is not None else _default_loads
+
+        self._pieces: list[str] = []
+        self._buffered = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def reset(self) -> None:
+        self._pieces = []
+        self._buffered = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, fragment: str) -> list[Any]:
+        """Consume a fragment and return every object it completes."""
+        results = []
+        pos = 0
+        start = 0
+        end = len(fragment)
+
+        if self._escaped and end:
+            self._escaped = False
+            pos = 1
+        if self._in_string:
+            pos = self._scan_string(fragment, pos)
+
+        while pos < end and not self._in_string:
+            match = _NEXT_BRACE.match(fragment, pos)
+            if match is None:
+                # No further braces, but a string may have been left open
+                pos = _NEXT_OPEN_STRING.match(fragment, pos).end()
+                if pos < end:
+                    self._scan_string(fragment, pos + 1)
+                break
+
+            pos = match.end()
+            if match.group(1) == "{":
+                if self._depth == 0:
+                    start = pos - 1
+                self._depth += 1
+            elif self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(fragment[start:pos], results)
+
+        if self._depth > 0:
+            self._pieces.append(fragment[start:])
+            self._buffered += end - start
+            if self._buffered > self._max_buffer_size:
+                logger.error(
+                    f"Discarding incomplete JSON object of {self._buffered} chars, "
+                    f"exceeds limit of {self._max_buffer_size}"
+                )
+                self.reset()
+        else:
+            # Anything outside an object (whitespace, stray quotes) is dropped
+            self._in_string = False
+            self._escaped = False
+
+        return results
+
+    def _scan_string(self, fragment: str, pos: int) -> int:
+        match = _STRING_TAIL.match(fragment, pos)
+        if match.group(1) is not None:
+            self._in_string = False
+            return match.end()
+        # The string runs past this fragment, and if the fragment ends on an
+        # escape the first character of the next fragment must be skipped
+        self._in_string = True
+        self._escaped = match.end() < len(fragment)
+        return len(fragment)
+
+    def _emit(self, tail: str, results: list[Any]) -> None:
+        if self._pieces:
+            self._pieces.append(tail)
+            text = "".join(self._pieces)
+            self._pieces = []
+            self._buffered = 0
+        else:
+            text = tail
+
+        try:
+            results.append(self._loads(text))
+        except ValueError:
+            logger.exception(f"Failed to decode JSON object of {len(text)} chars")
@@ -1,18 +1,93 @@
 import websocket
 import rel
 import logging
-import json
-from typing import Callable, Any
+import time
+from dataclasses import dataclass
+from typing import Callable, Any, Optional
+from urllib.parse import urlencode
 
+from market_maker.client.ws.json_framer import (
+    DEFAULT_MAX_BUFFER_SIZE,
+    JsonStreamFramer,
+)
+from market_maker.metrics import latency_metrics
+from market_maker.replay.recorder import StreamRecorder
 
 logger = logging.getLogger(__name__)
 
+RECONNECT_DELAY_SECONDS = 5
+
+
+@dataclass
+class StreamStatus:
+    # Incremented on every (re)connection, so updates can be told apart by
+    # which connection delivered them
+    epoch: int = 0
+    connected: bool = False
+    # `time.monotonic` times of the last message and of losing the connection
+    last_update_at: Optional[float] = None
+    disconnected_at: Optional[float] = None
+
 
 class VegaWebSocketClient:
-    def __init__(self, data_node_url: str):
+    def __init__(
+        self,
+        data_node_url: str,
+        max_buffer_size: int = DEFAULT_MAX_BUFFER_SIZE,
+        recorder: Optional[StreamRecorder] = None,
+        on_disconnect: Optional[Callable[[str], Any]] = None,
+        on_reconnect: Optional[Callable[[str, float], Any]] = None,
+    ):
+        """Streams from the data node, one websocket per subscription.
+
+        Sockets reconnect by themselves after being dropped. `on_disconnect`
+        is called with the stream's message type when a connection is lost,
+        and `on_reconnect` with the message type and outage length in seconds
+        once it is back, so that callers can resync whatever they missed.
+        """
         self._data_node_url = data_node_url
+        self._max_buffer_size = max_buffer_size
+        self._recorder = recorder
+        self._on_disconnect_callback = on_disconnect
+        self._on_reconnect_callback = on_reconnect
+
+        self._framers: dict[str, JsonStreamFramer] = {}
+        self.streams: dict[str, StreamStatus] = {}
+        self._stopped = False
+
+    def _on_open(self, msg_type: str) -> None:
+        status = self.streams[msg_type]
+        status.epoch += 1
+        status.connected = True
+        if status.disconnected_at is None:
+            return
 
-        self._messages = {}
+        outage_seconds = time.monotonic() - status.disconnected_at
+        status.disconnected_at = None
+        latency_metrics.record("stream_outage", int(outage_seconds * 1e9))
+        logger.info(f"Reconnected {msg_type} stream after {outage_seconds:.3f}s")
+        if self._on_reconnect_callback is not None:
+            self._on_reconnect_callback(msg_type, outage_seconds)
+
+    def _on_disconnected(self, msg_type: str) -> None:
+        status = self.streams[msg_type]
+        if not status.connected:
+            return
+        status.connected = False
+        status.disconnected_at = time.monotonic()
+        # Any partial message from the old connection will never complete
+        self._framers.pop(msg_type, None)
+        logger.warning(f"Lost {msg_type} stream")
+        if self._on_disconnect_callback is not None:
+            self._on_disconnect_callback(msg_type)
+
+    def _on_close(self, url: str, msg_type: str, callback: Callable[[dict], Any]):
+        # Called once per connection attempt, whether it was dropped or never
+        # connected at all
+        if self._stopped:
+            return
+        self._on_disconnected(msg_type)
+        rel.timeout(RECONNECT_DELAY_SECONDS, self._connect, url, msg_type, callback)
 
     def _on_error(self, ws, err):
         logger.exception(err)
@@ -23,57 +98,95 @@ class VegaWebSocketClient:
         msg_type: str,
         callback: Callable[[dict], Any],
     ) -> None:
-        self._messages[msg_type] = self._messages.get(msg_type, "") + message
-
-        # Websocket results are received line by line, so must check whether
-        # we've now received a full JSON object and return to the callback if so
-        try:
-            obj = json.loads(self._messages[msg_type])["result"]
-        except json.decoder.JSONDecodeError:
-            pass
-        else:
-            self._messages[msg_type] = ""
-            callback(obj)
+        if self._recorder is not None:
+            self._recorder.record("vega", msg_type, message)
+        self.streams[msg_type].last_update_at = time.monotonic()
+
+        framer = self._framers.get(msg_type)
+        if framer is None:
+            framer = self._framers[msg_type] = JsonStreamFramer(
+                max_buffer_size=self._max_buffer_size
+            )
+
+        # Websocket results are received line by line, so the framer buffers
+        # fragments per stream and only hands back fully received JSON objects
+        for obj in framer.feed(message):
+            if "result" in obj:
+                callback(obj["result"])
+            else:
+                logger.error(f"Error received on {msg_type} stream: {obj}")
 
     def stop(self):
+        self._stopped = True
         rel.abort()
 
     # https://docs.vega.xyz/testnet/api/rest/data-v2/trading-data-service-observe-markets-data
     def subscribe_market_data(
         self, market_id: str, callback: Callable[[dict], Any]
+    ) -> None:
+        self.subscribe_markets_data(market_ids=[market_id], callback=callback)
+
+    def subscribe_markets_data(
+        self, market_ids: list[str], callback: Callable[[dict], Any]
     ) -> None:
         self.subscribe_endpoint(
-            f"{self._data_node_url}/stream/markets/data?marketIds={market_id}",
+            f"{self._data_node_url}/stream/markets/data?"
+            + urlencode({"marketIds": market_ids}, doseq=True),
             "market_data",
             callback=callback,
         )
 
+    # https://docs.vega.xyz/testnet/api/rest/data-v2/trading-data-service-observe-markets-depth
+    def subscribe_markets_depth(
+        self, market_ids: list[str], callback: Callable[[dict], Any]
+    ) -> None:
+        self.subscribe_endpoint(
+            f"{self._data_node_url}/stream/markets/depth?"
+            + urlencode({"marketIds": market_ids}, doseq=True),
+            "market_depth",
+            callback=callback,
+        )
+
+    # https://docs.vega.xyz/testnet/api/rest/data-v2/trading-data-service-observe-markets-depth-updates
+    def subscribe_markets_depth_updates(
+        self, market_ids: list[str], callback: Callable[[dict], Any]
+    ) -> None:
+        self.subscribe_endpoint(
+            f"{self._data_node_url}/stream/markets/depth/updates?"
+            + urlencode({"marketIds": market_ids}, doseq=True),
+            "market_depth_updates",
+            callback=callback,
+        )
+
     # https://docs.vega.xyz/testnet/api/rest/data-v2/trading-data-service-observe-orders
     def subscribe_orders(
-        self, market_id: str, party_id: str, callback: Callable[[dict], Any]
+        self, market_id: Optional[str], party_id: str, callback: Callable[[dict], Any]
     ) -> None:
         self.subscribe_endpoint(
-            f"{self._data_node_url}/stream/orders?marketId={market_id}&partyId={party_id}",
+            f"{self._data_node_url}/stream/orders?"
+            + _party_query(market_id=market_id, party_id=party_id),
             "orders",
             callback=callback,
         )
 
     # https://docs.vega.xyz/testnet/api/rest/data-v2/trading-data-service-observe-positions
     def subscribe_positions(
-        self, market_id: str, party_id: str, callback: Callable[[dict], Any]
+        self, market_id: Optional[str], party_id: str, callback: Callable[[dict], Any]
     ) -> None:
         self.subscribe_endpoint(
-            f"{self._data_node_url}/stream/positions?marketId={market_id}&partyId={party_id}",
+            f"{self._data_node_url}/stream/positions?"
+            + _party_query(market_id=market_id, party_id=party_id),
             "positions",
             callback=callback,
         )
 
     # https://docs.vega.xyz/testnet/api/rest/data-v2/trading-data-service-observe-accounts
     def subscribe_accounts(
-        self, market_id: str, party_id: str, callback: Callable[[dict], Any]
+        self, market_id: Optional[str], party_id: str, callback: Callable[[dict], Any]
     ) -> None:
         self.subscribe_endpoint(
-            f"{self._data_node_url}/stream/accounts?marketId={market_id}&partyId={party_id}",
+            f"{self._data_node_url}/stream/accounts?"
+            + _party_query(market_id=market_id, party_id=party_id),
             "accounts",
             callback=callback,
         )
@@ -81,11 +194,27 @@ class VegaWebSocketClient:
     def subscribe_endpoint(
         self, url: str, msg_type: str, callback: Callable[[dict], Any]
     ) -> None:
+        self.streams[msg_type] = StreamStatus()
+        self._connect(url, msg_type, callback)
+
+    def _connect(self, url: str, msg_type: str, callback: Callable[[dict], Any]):
+        # Reconnection is driven from `_on_close` rather than by `run_forever`,
+        # which reconnects without calling back, so nothing would know that
+        # updates were missed
         ws = websocket.WebSocketApp(
             url,
+            on_open=lambda _: self._on_open(msg_type),
             on_message=lambda _, msg: self._on_message(
                 message=msg, msg_type=msg_type, callback=callback
             ),
             on_error=self._on_error,
+            on_close=lambda *_: self._on_close(url, msg_type, callback),
         )
-        ws.run_forever(dispatcher=rel, reconnect=5)
+        ws.run_forever(dispatcher=rel)
+
+
+def _party_query(market_id: Optional[str], party_id: str) -> str:
+    # Leaving out the market subscribes to the party's updates across all markets
+    if market_id is None:
+        return urlencode({"partyId": party_id})
+    return urlencode({"marketId": market_id, "partyId": party_id})
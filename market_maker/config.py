@@ -1,5 +1,50 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
+
+from market_maker.models import REFERENCE_PRICE_TYPES
+
+
+def _get_markets() -> list[tuple[str, str]]:
+    # Comma separated `<vega market id>:<binance symbol>` pairs, falling back
+    # to the single MARKET_ID/BINANCE_MARKET pair
+    markets = os.environ.get("MARKETS")
+    if not markets:
+        return [(os.environ.get("MARKET_ID"), os.environ.get("BINANCE_MARKET"))]
+    return [
+        tuple(pair.strip().split(":", 1)) for pair in markets.split(",") if pair.strip()
+    ]
+
+
+def _get_composites() -> dict[str, str]:
+    # Comma separated `<name>=<expression>` definitions of derived reference
+    # prices, see `market_maker.store.composite_prices`
+    composites = os.environ.get("COMPOSITE_PRICES")
+    if not composites:
+        return {}
+    return dict(
+        (name.strip(), expression.strip())
+        for name, expression in (
+            definition.split("=", 1)
+            for definition in composites.split(",")
+            if definition.strip()
+        )
+    )
+
+
+def _get_float(name: str, default: Optional[float] = None) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _get_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _get_bool(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    return value.strip().lower() in ("1", "true", "yes") if value else default
 
 
 @dataclass
@@ -14,6 +59,103 @@ class Config:
     binance_market: str
     binance_ws_url: str
 
+    # Requoting is event driven when a threshold is set, with the update
+    # frequency acting as a heartbeat, otherwise quotes refresh on a timer
+    update_freq_seconds: float = 30
+    requote_threshold_bps: Optional[float] = None
+    min_requote_interval_seconds: float = 1
+
+    # Number of transactions which may await a wallet response at once
+    wallet_max_in_flight: int = 1
+
+    # (Vega market ID, Binance symbol) pairs to quote in this process, along
+    # with the number of threads shared between their strategies
+    markets: list[tuple[str, str]] = field(default_factory=list)
+    strategy_workers: int = 4
+
+    # Results per page when loading state over REST, the data node default
+    # is used if unset
+    page_size: Optional[int] = None
+
+    # Where to periodically persist store state for warm restarts, disabled
+    # if unset
+    snapshot_path: Optional[str] = None
+    snapshot_interval_seconds: float = 10
+
+    # Directory to journal every raw Binance and Vega stream frame to for
+    # later replay, disabled if unset
+    record_dir: Optional[str] = None
+
+    # Local port to serve tick-to-trade latency histograms on, latency is
+    # only recorded when set
+    metrics_port: Optional[int] = None
+
+    # Maintain a full price level book for each quoted market from the
+    # market depth streams
+    track_order_book: bool = False
+
+    # Price the quotes are centred on, one of `touch` (Binance best bid/ask),
+    # `microprice`, `weighted_mid` or `vwap_mid`. Anything but the touch
+    # follows each symbol's full Binance book, with the weighted mid taken
+    # over `reference_depth_levels` levels and the VWAP mid over
+    # `reference_vwap_notional` of quote currency each side
+    reference_price_type: str = "touch"
+    reference_depth_levels: int = 10
+    reference_vwap_notional: float = 10_000
+
+    # Derived reference prices by name, usable in place of a Binance symbol
+    composite_prices: dict[str, str] = field(default_factory=dict)
+    # Quoting is paused while any Binance price behind a market's reference
+    # is older than this, never if unset
+    reference_max_age_seconds: Optional[float] = None
+
+    # Transaction results are polled from Tendermint in the background when
+    # enabled, with quoting paused on a market while the fraction of its
+    # transactions rejected in the last `rejection_window_seconds` is above
+    # `max_rejection_rate`, if set
+    track_transactions: bool = True
+    max_rejection_rate: Optional[float] = None
+    rejection_window_seconds: float = 60
+
+    # Transactions per second allowed by the submission scheduler, which is
+    # bypassed if unset, along with the burst allowed after a quiet spell and
+    # the most instructions sent in one batch. Sends are aligned to the block
+    # cadence seen on Tendermint, or `submission_window_seconds` apart
+    submission_rate_per_second: Optional[float] = None
+    submission_burst: int = 1
+    max_batch_size: int = 30
+    submission_window_seconds: float = 1
+
+    # `threads` runs the streams, strategies and wallet on their own threads,
+    # `asyncio` runs them as tasks on one event loop, see `market_maker.aio`,
+    # on uvloop if installed and enabled, and `multiprocess` runs feed
+    # processes and `strategy_processes` strategy workers passing updates
+    # through shared memory rings of `ring_capacity` records, see
+    # `market_maker.shm`
+    runtime: str = "threads"
+    use_uvloop: bool = True
+    strategy_processes: int = 2
+    ring_capacity: int = 4096
+
+    # Shape of the ladder quoted each side, see
+    # `market_maker.strategy.quote_curves`. The defaults quote five equal
+    # levels 0.2% apart, starting 0.2% from the reference, with no skew
+    quote_levels: int = 5
+    quote_first_offset_bps: float = 20
+    quote_spacing_bps: float = 20
+    quote_spacing_profile: str = "linear"
+    quote_spacing_factor: float = 1.5
+    quote_size_profile: str = "equal"
+    quote_size_factor: float = 1
+    inventory_skew_bps: float = 0
+
+    def __post_init__(self):
+        if self.reference_price_type not in REFERENCE_PRICE_TYPES:
+            raise ValueError(
+                f"Unknown reference price {self.reference_price_type}, expected "
+                f"one of {', '.join(REFERENCE_PRICE_TYPES)}"
+            )
+
     @classmethod
     def from_env(cls):
         return cls(
@@ -26,4 +168,40 @@ class Config:
             party_id=os.environ.get("PARTY_ID"),
             binance_market=os.environ.get("BINANCE_MARKET"),
             binance_ws_url=os.environ.get("BINANCE_WS_URL"),
+            update_freq_seconds=_get_float("UPDATE_FREQ_SECONDS", 30),
+            requote_threshold_bps=_get_float("REQUOTE_THRESHOLD_BPS"),
+            min_requote_interval_seconds=_get_float("MIN_REQUOTE_INTERVAL_SECONDS", 1),
+            wallet_max_in_flight=_get_int("WALLET_MAX_IN_FLIGHT", 1),
+            markets=_get_markets(),
+            strategy_workers=_get_int("STRATEGY_WORKERS", 4),
+            page_size=_get_int("PAGE_SIZE"),
+            snapshot_path=os.environ.get("SNAPSHOT_PATH") or None,
+            snapshot_interval_seconds=_get_float("SNAPSHOT_INTERVAL_SECONDS", 10),
+            record_dir=os.environ.get("RECORD_DIR") or None,
+            metrics_port=_get_int("METRICS_PORT"),
+            track_order_book=_get_bool("TRACK_ORDER_BOOK"),
+            reference_price_type=os.environ.get("REFERENCE_PRICE") or "touch",
+            reference_depth_levels=_get_int("REFERENCE_DEPTH_LEVELS", 10),
+            reference_vwap_notional=_get_float("REFERENCE_VWAP_NOTIONAL", 10_000),
+            composite_prices=_get_composites(),
+            reference_max_age_seconds=_get_float("REFERENCE_MAX_AGE_SECONDS"),
+            track_transactions=_get_bool("TRACK_TRANSACTIONS", True),
+            max_rejection_rate=_get_float("MAX_REJECTION_RATE"),
+            rejection_window_seconds=_get_float("REJECTION_WINDOW_SECONDS", 60),
+            submission_rate_per_second=_get_float("SUBMISSION_RATE_PER_SECOND"),
+            submission_burst=_get_int("SUBMISSION_BURST", 1),
+            max_batch_size=_get_int("MAX_BATCH_SIZE", 30),
+            submission_window_seconds=_get_float("SUBMISSION_WINDOW_SECONDS", 1),
+            runtime=os.environ.get("RUNTIME") or "threads",
+            use_uvloop=_get_bool("UVLOOP", True),
+            strategy_processes=_get_int("STRATEGY_PROCESSES", 2),
+            ring_capacity=_get_int("RING_CAPACITY", 4096),
+            quote_levels=_get_int("QUOTE_LEVELS", 5),
+            quote_first_offset_bps=_get_float("QUOTE_FIRST_OFFSET_BPS", 20),
+            quote_spacing_bps=_get_float("QUOTE_SPACING_BPS", 20),
+            quote_spacing_profile=os.environ.get("QUOTE_SPACING_PROFILE") or "linear",
+            quote_spacing_factor=_get_float("QUOTE_SPACING_FACTOR", 1.5),
+            quote_size_profile=os.environ.get("QUOTE_SIZE_PROFILE") or "equal",
+            quote_size_factor=_get_float("QUOTE_SIZE_FACTOR", 1),
+            inventory_skew_bps=_get_float("INVENTORY_SKEW_BPS", 0),
         )
@@ -0,0 +1,185 @@
+"""
+Low overhead latency histograms for the tick-to-trade path.
+
+Stage timings are recorded into log-linear histograms in the style of
+HdrHistogram: values below 2**PRECISION_BITS nanoseconds get a bucket each,
+and above that every power of two is split into 2**(PRECISION_BITS - 1)
+buckets, bounding the relative error of any reported value at about 3%.
+Recording is a bit length, a shift and an increment, costing around a
+microsecond including taking the timestamp.
+
+Recording is disabled by default and is switched on with `enable`. The
+histograms can be served as plain text for scraping with `MetricsServer`.
+"""
+
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+PRECISION_BITS = 6
+# Covers values up to 2**40ns, around 18 minutes, larger values are clamped
+MAX_VALUE_BITS = 40
+
+_SUB_BUCKETS = 1 << PRECISION_BITS
+_HALF_SUB_BUCKETS = _SUB_BUCKETS >> 1
+_NUM_BUCKETS = _SUB_BUCKETS + (MAX_VALUE_BITS - PRECISION_BITS) * _HALF_SUB_BUCKETS
+_MAX_VALUE = (1 << MAX_VALUE_BITS) - 1
+
+QUANTILES = (0.5, 0.99, 0.999)
+
+
+def _bucket_index(value: int) -> int:
+    if value < _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - PRECISION_BITS
+    # The top PRECISION_BITS of the value select the sub-bucket, whose
+    # leading bit is always set, so only the lower half of them is used
+    return _SUB_BUCKETS + (shift - 2) * _HALF_SUB_BUCKETS + (value >> shift)
+
+
+def _bucket_upper_bound(index: int) -> int:
+    if index < _SUB_BUCKETS:
+        return index
+    shift, offset = divmod(index - _SUB_BUCKETS, _HALF_SUB_BUCKETS)
+    shift += 1
+    return ((_HALF_SUB_BUCKETS + offset + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self):
+        # Increments are not locked, under heavy contention an occasional
+        # count may be lost, which is an acceptable trade for the overhead
+        self._counts = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.max = 0
+
+    def record(self, value_ns: int) -> None:
+        if value_ns < 0:
+            value_ns = 0
+        elif value_ns > _MAX_VALUE:
+            value_ns = _MAX_VALUE
+        self._counts[_bucket_index(value_ns)] += 1
+        self.count += 1
+        if value_ns > self.max:
+            self.max = value_ns
+
+    def quantile(self, q: float) -> int:
+        """Returns the highest value in the bucket holding the given quantile,
+        in nanoseconds.
+        """
+        counts = list(self._counts)
+        total = sum(counts)
+        if total == 0:
+            return 0
+        target = max(int(q * total + 0.5), 1)
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= target:
+                return min(_bucket_upper_bound(index), self.max)
+        return self.max
+
+    def reset(self) -> None:
+        self._counts = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.max = 0
+
+
+class LatencyMetrics:
+    def __init__(self):
+        """Named latency histograms, one per stage of the tick-to-trade path."""
+        self.enabled = False
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def record(self, stage: str, duration_ns: int) -> None:
+        if not self.enabled:
+            return
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram())
+        histogram.record(duration_ns)
+
+    def record_since(self, stage: str, start_ns: int) -> None:
+        """Records the time elapsed since a `time.perf_counter_ns` timestamp."""
+        if self.enabled and start_ns:
+            self.record(stage, time.perf_counter_ns() - start_ns)
+
+    def histograms(self) -> dict[str, LatencyHistogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def render_text(self) -> str:
+        """Renders every histogram in the Prometheus text exposition format."""
+        lines = [
+            "# HELP market_maker_latency_seconds Latency of each tick-to-trade stage",
+            "# TYPE market_maker_latency_seconds summary",
+        ]
+        for stage, histogram in sorted(self.histograms().items()):
+            for q in QUANTILES:
+                lines.append(
+                    f'market_maker_latency_seconds{{stage="{stage}",quantile="{q}"}} '
+                    f"{histogram.quantile(q) / 1e9:.9f}"
+                )
+            lines.append(
+                f'market_maker_latency_seconds_count{{stage="{stage}"}} '
+                f"{histogram.count}"
+            )
+            lines.append(
+                f'market_maker_latency_seconds_max{{stage="{stage}"}} '
+                f"{histogram.max / 1e9:.9f}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every component, so stages from the stores, strategy and wallet
+# all land in the same registry
+latency_metrics = LatencyMetrics()
+
+
+class MetricsServer:
+    def __init__(
+        self,
+        port: int,
+        host: str = "127.0.0.1",
+        metrics: Optional[LatencyMetrics] = None,
+    ):
+        """Serves latency histograms as plain text on `/metrics`.
+
+        Start serving by calling `start`.
+        """
+        metrics = metrics if metrics is not None else latency_metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format % args)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+
+    def start(self) -> None:
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics on port {self._httpd.server_address[1]}")
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -1,4 +1,16 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from operator import attrgetter
+from typing import Optional
+
+from market_maker.utils.decimal_utils import scale_factor
+
+# Fair prices a `ReferencePrice` can be centred on other than the touch
+_FAIR_PRICES = {
+    "microprice": attrgetter("microprice"),
+    "weighted_mid": attrgetter("weighted_mid"),
+    "vwap_mid": attrgetter("vwap_mid"),
+}
+REFERENCE_PRICE_TYPES = ("touch", *_FAIR_PRICES)
 
 
 @dataclass
@@ -6,32 +18,71 @@ class ReferencePrice:
     symbol: str
     bid_price: float
     ask_price: float
-
-
-@dataclass
+    # `time.perf_counter_ns` when the tick was received, for latency tracking
+    received_at: int = 0
+
+    # Fair prices from the full book, only set when following Binance depth
+    microprice: Optional[float] = None
+    weighted_mid: Optional[float] = None
+    vwap_mid: Optional[float] = None
+
+    # For composite prices, when each input symbol last ticked
+    inputs_received_at: Optional[dict[str, int]] = None
+
+    @property
+    def oldest_input_at(self) -> int:
+        """`time.perf_counter_ns` of the stalest price this one is built from."""
+        if self.inputs_received_at:
+            return min(self.inputs_received_at.values())
+        return self.received_at
+
+    def fair_price(self, reference_type: str = "touch") -> float:
+        """The chosen fair price, falling back to the mid of the touch when
+        it is not available.
+        """
+        getter = _FAIR_PRICES.get(reference_type)
+        if getter is not None:
+            value = getter(self)
+            if value is not None:
+                return value
+        return (self.bid_price + self.ask_price) / 2
+
+
+# Vega models hold prices, sizes and balances as integers in the native units
+# of the market or asset, as sent by the node. Convert to floats with the
+# owning `Market` or `Asset` only where needed.
+
+
+@dataclass(slots=True)
 class Position:
     party_id: str
     market_id: str
-    open_volume: float
-    average_entry_price: float
-    unrealised_pnl: float
-    realised_pnl: float
+    # Market position decimal units
+    open_volume: int
+    # Market price decimal units
+    average_entry_price: int
+    # Settlement asset decimal units
+    unrealised_pnl: int
+    realised_pnl: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     order_id: str
     market_id: str
-    size: float
-    remaining_size: float
-    price: float
+    # Market position decimal units
+    size: int
+    remaining_size: int
+    # Market price decimal units
+    price: int
     order_type: str
     time_in_force: str
     status: str
     party_id: str
+    side: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Market:
     market_id: str
     state: str
@@ -42,15 +93,55 @@ class Market:
     name: str
     settlement_asset_id: str
 
-    mark_price: float = 0
-    best_bid_price: float = 0
-    best_offer_price: float = 0
-    best_bid_volume: float = 0
-    best_offer_volume: float = 0
-    open_interest: float = 0
+    # Market price decimal units
+    mark_price: int = 0
+    best_bid_price: int = 0
+    best_offer_price: int = 0
+    # Market position decimal units
+    best_bid_volume: int = 0
+    best_offer_volume: int = 0
+    open_interest: int = 0
+    # Prices must be a multiple of this, in market price decimal units
+    tick_size: int = 1
 
+    price_factor: int = field(init=False, repr=False)
+    position_factor: int = field(init=False, repr=False)
 
-@dataclass
+    def __post_init__(self):
+        self.price_factor = scale_factor(self.decimal_places)
+        self.position_factor = scale_factor(self.position_decimal_places)
+
+    def price_to_float(self, price: int) -> float:
+        return price / self.price_factor
+
+    def price_to_units(self, price: float) -> int:
+        return round(price * self.price_factor)
+
+    def size_to_float(self, size: int) -> float:
+        return size / self.position_factor
+
+    def size_to_units(self, size: float) -> int:
+        return round(size * self.position_factor)
+
+
+@dataclass(slots=True)
+class MarketData:
+    """The part of a `Market` streamed every block."""
+
+    market_id: str
+    # Market price decimal units
+    mark_price: int
+    best_bid_price: int
+    best_offer_price: int
+    # Market position decimal units
+    best_bid_volume: int
+    best_offer_volume: int
+    open_interest: int
+    trading_mode: str
+    state: str
+
+
+@dataclass(slots=True)
 class Asset:
     asset_id: str
     status: str
@@ -58,17 +149,36 @@ class Asset:
     symbol: str
     decimal_places: int
 
+    factor: int = field(init=False, repr=False)
 
-@dataclass
+    def __post_init__(self):
+        self.factor = scale_factor(self.decimal_places)
+
+    def to_float(self, amount: int) -> float:
+        return amount / self.factor
+
+    def to_units(self, amount: float) -> int:
+        return round(amount * self.factor)
+
+
+@dataclass(slots=True)
 class Account:
     owner: str
     account_type: str
-    balance: float
+    # Asset decimal units
+    balance: int
     asset_id: str
     market_id: str
 
-    def get_id(self):
-        return f"{self.owner}-{self.market_id}-{self.account_type}-{self.asset_id}"
+    # Built once rather than on every update. A tuple of the (interned) ID
+    # strings is far smaller than the equivalent joined string
+    key: tuple[str, str, str, str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.key = (self.owner, self.market_id, self.account_type, self.asset_id)
+
+    def get_id(self) -> tuple[str, str, str, str]:
+        return self.key
 
 
 @dataclass
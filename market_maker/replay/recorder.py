@@ -0,0 +1,106 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".jsonl.gz"
+
+
+class StreamRecorder:
+    def __init__(
+        self,
+        directory: str,
+        max_file_bytes: int = 256 * 1024 * 1024,
+        max_file_seconds: float = 3600,
+        compresslevel: int = 6,
+    ):
+        """Appends raw stream frames to rotating gzip compressed journal files.
+
+        Each line of a journal is a JSON array of
+        `[receive time ns, source, channel, frame]`. Callers only pay for
+        putting the frame on a queue, encoding, compression and file IO happen
+        on a background writer thread.
+
+        Start the writer by calling `start`.
+
+        Args:
+            directory:
+                str, directory to write journal files to, created if missing
+            max_file_bytes:
+                int, uncompressed bytes written before rotating to a new file
+            max_file_seconds:
+                float, maximum age of a file before rotating to a new one
+            compresslevel:
+                int, gzip compression level
+        """
+        self._directory = directory
+        self._max_file_bytes = max_file_bytes
+        self._max_file_seconds = max_file_seconds
+        self._compresslevel = compresslevel
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened_at = 0.0
+        self._file_seq = 0
+
+    def start(self) -> None:
+        os.makedirs(self._directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flushes any queued frames and closes the current journal file."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def record(self, source: str, channel: str, frame: Any) -> None:
+        """Queues a frame, either a raw string or a decoded JSON object."""
+        self._queue.put((time.time_ns(), source, channel, frame))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(json.dumps(item, separators=(",", ":")) + "\n")
+            except Exception:
+                logger.exception("Failed to write to stream journal")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, line: str) -> None:
+        if self._file is None or (
+            self._file_bytes >= self._max_file_bytes
+            or time.monotonic() - self._file_opened_at >= self._max_file_seconds
+        ):
+            self._rotate()
+        self._file.write(line)
+        self._file_bytes += len(line)
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file_seq += 1
+        path = os.path.join(
+            self._directory,
+            f"journal-{time.strftime('%Y%m%d-%H%M%S')}-{self._file_seq:06d}"
+            + JOURNAL_SUFFIX,
+        )
+        self._file = gzip.open(
+            path, "wt", compresslevel=self._compresslevel, encoding="utf-8"
+        )
+        self._file_bytes = 0
+        self._file_opened_at = time.monotonic()
+        logger.info(f"Recording stream frames to {path}")
@@ -0,0 +1,144 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+from market_maker.client.ws.json_framer import JsonStreamFramer
+from market_maker.replay.recorder import JOURNAL_SUFFIX
+from market_maker.store.binance_store import BinanceStore
+from market_maker.store.vega_store import VegaStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplayStats:
+    frames: int
+    duration_seconds: float
+    # Largest amount by which dispatch fell behind the requested schedule
+    max_lag_seconds: float
+
+
+def read_journal(directory: str) -> Iterator[tuple[int, str, str, Any]]:
+    """Yields `(receive time ns, source, channel, frame)` from every journal
+    file in a directory, in recording order.
+    """
+    for path in sorted(glob.glob(os.path.join(directory, f"*{JOURNAL_SUFFIX}"))):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    received_at, source, channel, frame = json.loads(line)
+                except ValueError:
+                    # The last line of a journal may be cut short by a crash
+                    logger.warning(f"Skipping unreadable journal line in {path}")
+                    continue
+                yield received_at, source, channel, frame
+
+
+class ReplayDriver:
+    def __init__(
+        self,
+        vega_store: Optional[VegaStore] = None,
+        binance_store: Optional[BinanceStore] = None,
+        speed: Optional[float] = None,
+        after_frame: Optional[Callable[[str, str], Any]] = None,
+    ):
+        """Feeds recorded stream frames back into the stores, in place of the
+        Vega and Binance websockets.
+
+        Vega frames are re-framed exactly as `VegaWebSocketClient` does before
+        being applied with the store's update functions, and Binance frames
+        go through `BinanceStore.on_tick`, or its depth handlers for depth
+        journals, so tick listeners fire as they would live.
+
+        Args:
+            vega_store:
+                Optional[VegaStore], store to apply Vega frames to. It should
+                already hold the markets and assets the frames refer to, for
+                instance restored from a snapshot
+            binance_store:
+                Optional[BinanceStore], store to apply Binance frames to. It
+                does not need to be started
+            speed:
+                Optional[float], 1 replays in real time, 10 ten times faster
+                and so on. None replays as fast as possible
+            after_frame:
+                Optional[Callable], called with the source and channel after
+                each frame is applied, for instance to drive a strategy
+        """
+        self._vega_store = vega_store
+        self._binance_store = binance_store
+        if binance_store is not None:
+            # Depth books resync from the snapshots recorded in the journal
+            # rather than over REST
+            binance_store.set_resync_handler(
+                lambda book: binance_store.resync_finished(book.symbol)
+            )
+        self._speed = speed
+        self._after_frame = after_frame
+
+        self._framers: dict[str, JsonStreamFramer] = {}
+        self._vega_handlers: dict[str, Callable[[dict], Any]] = {}
+        if vega_store is not None:
+            self._vega_handlers = {
+                "market_data": vega_store._update_market_data,
+                "orders": vega_store._update_order,
+                "positions": vega_store._update_position,
+                "accounts": vega_store._update_accounts,
+                "market_depth": vega_store._update_market_depth,
+                "market_depth_updates": vega_store._update_market_depth_updates,
+            }
+
+    def run(self, frames: Iterator[tuple[int, str, str, Any]]) -> ReplayStats:
+        count = 0
+        max_lag = 0.0
+        first_received_at = None
+        start = time.monotonic()
+
+        for received_at, source, channel, frame in frames:
+            if self._speed:
+                if first_received_at is None:
+                    first_received_at = received_at
+                due = start + (received_at - first_received_at) / 1e9 / self._speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+
+            self._dispatch(source, channel, frame)
+            count += 1
+            if self._after_frame is not None:
+                self._after_frame(source, channel)
+
+        return ReplayStats(
+            frames=count,
+            duration_seconds=time.monotonic() - start,
+            max_lag_seconds=max_lag,
+        )
+
+    def _dispatch(self, source: str, channel: str, frame: Any) -> None:
+        if source == "binance":
+            if self._binance_store is None:
+                return
+            if channel == "depth":
+                self._binance_store.on_depth(frame)
+            elif channel == "depth_snapshot":
+                self._binance_store.apply_depth_snapshot(frame)
+            else:
+                self._binance_store.on_tick(frame)
+            return
+
+        handler = self._vega_handlers.get(channel)
+        if handler is None:
+            return
+        framer = self._framers.get(channel)
+        if framer is None:
+            framer = self._framers[channel] = JsonStreamFramer()
+        for obj in framer.feed(frame):
+            if "result" in obj:
+                handler(obj["result"])
@@ -0,0 +1,191 @@
+import logging
+import signal
+import threading
+from collections import defaultdict
+from typing import Any, Callable
+
+import rel
+
+import market_maker.client.api.parsers as parsers
+from market_maker.client.ws.vega_web_socket_client import VegaWebSocketClient
+from market_maker.config import Config
+from market_maker.models import ReferencePrice
+from market_maker.shm.layout import RingLayout
+from market_maker.shm.records import (
+    encode_account,
+    encode_market_data,
+    encode_order,
+    encode_position,
+    encode_reference_price,
+)
+from market_maker.store.binance_store import BinanceStore
+
+logger = logging.getLogger(__name__)
+
+
+def init_process(log_level: int) -> None:
+    """Sets up a process started by the shared memory runtime. Ctrl+C reaches
+    every process in the group, so children leave shutting down to the
+    parent, which stops them in order.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=log_level, format="%(asctime)s %(message)s")
+
+
+class ReferencePricePublisher:
+    def __init__(self, layout: RingLayout):
+        """Writes reference prices to the rings of the workers quoting off
+        them. Register `publish` as a `BinanceStore` tick listener for each
+        symbol in `symbols`.
+        """
+        rings = [
+            layout.open(shard, "reference_prices")
+            for shard in range(len(layout.shards))
+        ]
+        self._rings = {
+            symbol: [rings[shard] for shard in shards]
+            for symbol, shards in layout.shards_by_symbol().items()
+        }
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self._rings)
+
+    def publish(self, price: ReferencePrice) -> None:
+        rings = self._rings.get(price.symbol)
+        if not rings:
+            return
+        record = encode_reference_price(price)
+        for ring in rings:
+            ring.write(record)
+
+
+class VegaFeedPublisher:
+    def __init__(self, layout: RingLayout):
+        """Parses data node stream messages and writes the updates to the
+        rings of the workers quoting their markets. Accounts go to every
+        worker, as balances are totalled across markets, and so do changes in
+        stream connection.
+        """
+        shards = range(len(layout.shards))
+        self._rings = {
+            kind: [layout.open(shard, kind) for shard in shards]
+            for kind in ("market_data", "orders", "positions", "accounts", "streams")
+        }
+        self._shard_by_market_id = layout.shard_by_market_id()
+
+    def on_market_data(self, market_dict: dict) -> None:
+        self._route(
+            "market_data",
+            map(parsers.parse_market_data, market_dict["marketData"]),
+            encode_market_data,
+        )
+
+    def on_orders(self, order_dict: dict) -> None:
+        orders = order_dict.get("snapshot", order_dict.get("updates"))["orders"]
+        self._route("orders", map(parsers.parse_order, orders), encode_order)
+
+    def on_positions(self, position_dict: dict) -> None:
+        positions = position_dict.get("snapshot", position_dict.get("updates"))[
+            "positions"
+        ]
+        self._route(
+            "positions", map(parsers.parse_position, positions), encode_position
+        )
+
+    def on_accounts(self, account_dict: dict) -> None:
+        account_dict = account_dict.get("snapshot", account_dict.get("updates"))
+        records = [
+            encode_account(parsers.parse_account(account))
+            for account in account_dict.get("accounts") or []
+        ]
+        for ring in self._rings["accounts"]:
+            ring.write_many(records)
+
+    def on_disconnect(self, msg_type: str) -> None:
+        for ring in self._rings["streams"]:
+            ring.write((msg_type.encode(), False))
+
+    def on_reconnect(self, msg_type: str, outage_seconds: float) -> None:
+        for ring in self._rings["streams"]:
+            ring.write((msg_type.encode(), True))
+
+    def _route(self, kind: str, items, encode: Callable[[Any], tuple]) -> None:
+        by_shard = defaultdict(list)
+        for item in items:
+            shard = self._shard_by_market_id.get(item.market_id)
+            if shard is not None:
+                by_shard[shard].append(encode(item))
+        rings = self._rings[kind]
+        for shard, records in by_shard.items():
+            rings[shard].write_many(records)
+
+
+def run_binance_feed(
+    config: Config, layout: RingLayout, stop_event, log_level: int
+) -> None:
+    """Entry point of the Binance feed process, which follows every symbol
+    the workers quote off, builds composites and depth book fair prices, and
+    publishes the results until `stop_event` is set.
+    """
+    init_process(log_level)
+    publisher = ReferencePricePublisher(layout)
+    store = BinanceStore(
+        symbols_to_subscribe=[
+            symbol
+            for symbol in publisher.symbols
+            if symbol not in config.composite_prices
+        ],
+        depth=config.reference_price_type != "touch",
+        depth_levels=config.reference_depth_levels,
+        vwap_notional=config.reference_vwap_notional,
+        composites=config.composite_prices,
+    )
+    for symbol in publisher.symbols:
+        store.add_tick_listener(symbol, publisher.publish)
+    store.start()
+    stop_event.wait()
+    store.stop()
+
+
+def run_vega_feed(
+    config: Config, layout: RingLayout, stop_event, log_level: int
+) -> None:
+    """Entry point of the Vega feed process, which streams market data and
+    the party's orders, positions and accounts for every quoted market and
+    publishes them until `stop_event` is set.
+    """
+    init_process(log_level)
+    publisher = VegaFeedPublisher(layout)
+    client = VegaWebSocketClient(
+        data_node_url=config.ws_url,
+        on_disconnect=publisher.on_disconnect,
+        on_reconnect=publisher.on_reconnect,
+    )
+    market_ids = [market_id for market_id, _ in layout.markets]
+    # A single market keeps the tighter server-side market filter
+    stream_market_id = market_ids[0] if len(market_ids) == 1 else None
+
+    client.subscribe_markets_data(
+        market_ids=market_ids, callback=publisher.on_market_data
+    )
+    client.subscribe_accounts(
+        party_id=config.party_id,
+        market_id=stream_market_id,
+        callback=publisher.on_accounts,
+    )
+    client.subscribe_orders(
+        market_id=stream_market_id,
+        party_id=config.party_id,
+        callback=publisher.on_orders,
+    )
+    client.subscribe_positions(
+        market_id=stream_market_id,
+        party_id=config.party_id,
+        callback=publisher.on_positions,
+    )
+
+    threading.Thread(
+        target=lambda: (stop_event.wait(), client.stop()), daemon=True
+    ).start()
+    rel.dispatch()
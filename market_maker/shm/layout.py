@@ -0,0 +1,69 @@
+import os
+from dataclasses import dataclass
+
+from market_maker.shm.records import LAYOUTS
+from market_maker.shm.ring_buffer import SharedRing
+
+
+@dataclass(frozen=True)
+class RingLayout:
+    """Names and sizes of the shared memory rings between the feed processes
+    and the strategy workers, passed to each process on start.
+
+    Every worker has one ring of each kind in `records.LAYOUTS`, carrying
+    only what its own markets need, so workers never read each other's
+    updates and each ring has exactly one writing feed.
+    """
+
+    prefix: str
+    capacity: int
+    # (Vega market ID, reference symbol) pairs quoted by each worker
+    shards: tuple[tuple[tuple[str, str], ...], ...]
+
+    @classmethod
+    def for_markets(
+        cls, markets: list[tuple[str, str]], processes: int, capacity: int
+    ) -> "RingLayout":
+        """Deals markets out to at most `processes` workers in turn."""
+        processes = max(min(processes, len(markets)), 1)
+        return cls(
+            prefix=f"market_maker_{os.getpid()}",
+            capacity=capacity,
+            shards=tuple(tuple(markets[i::processes]) for i in range(processes)),
+        )
+
+    @property
+    def markets(self) -> list[tuple[str, str]]:
+        return [market for shard in self.shards for market in shard]
+
+    def shard_by_market_id(self) -> dict[str, int]:
+        return {
+            market_id: shard
+            for shard, markets in enumerate(self.shards)
+            for market_id, _ in markets
+        }
+
+    def shards_by_symbol(self) -> dict[str, list[int]]:
+        shards: dict[str, list[int]] = {}
+        for shard, markets in enumerate(self.shards):
+            for symbol in dict.fromkeys(symbol for _, symbol in markets):
+                shards.setdefault(symbol, []).append(shard)
+        return shards
+
+    def open(
+        self, shard: int, kind: str, create: bool = False, replay: bool = False
+    ) -> SharedRing:
+        return SharedRing(
+            f"{self.prefix}_{shard}_{kind}",
+            LAYOUTS[kind],
+            self.capacity,
+            create=create,
+            replay=replay,
+        )
+
+    def create_all(self) -> list[SharedRing]:
+        return [
+            self.open(shard, kind, create=True)
+            for shard in range(len(self.shards))
+            for kind in LAYOUTS
+        ]
@@ -0,0 +1,307 @@
+"""
+Fixed layouts of the records passed between processes in shared memory, and
+their conversion to and from the store models.
+
+IDs, symbols and enum values are held as fixed width ASCII. Prices and sizes
+in market units fit in 64 bits, but asset amounts with 18 decimals need not,
+so balances and PnL are split into a signed high and unsigned low word.
+"""
+
+import math
+import sys
+from typing import Optional
+
+import numpy as np
+
+from market_maker.models import Account, MarketData, Order, Position, ReferencePrice
+
+_TEXT = "S64"
+_LOW_MASK = (1 << 64) - 1
+
+REFERENCE_PRICE = np.dtype(
+    [
+        ("symbol", _TEXT),
+        ("bid_price", "<f8"),
+        ("ask_price", "<f8"),
+        # NaN when not set
+        ("microprice", "<f8"),
+        ("weighted_mid", "<f8"),
+        ("vwap_mid", "<f8"),
+        # `time.perf_counter_ns`, which shares one clock across processes
+        ("received_at", "<i8"),
+        ("oldest_input_at", "<i8"),
+    ],
+    align=True,
+)
+
+MARKET_DATA = np.dtype(
+    [
+        ("market_id", _TEXT),
+        ("mark_price", "<i8"),
+        ("best_bid_price", "<i8"),
+        ("best_offer_price", "<i8"),
+        ("best_bid_volume", "<i8"),
+        ("best_offer_volume", "<i8"),
+        ("open_interest", "<i8"),
+        ("trading_mode", _TEXT),
+        ("state", _TEXT),
+    ],
+    align=True,
+)
+
+ORDER = np.dtype(
+    [
+        ("order_id", _TEXT),
+        ("market_id", _TEXT),
+        ("size", "<i8"),
+        ("remaining_size", "<i8"),
+        ("price", "<i8"),
+        ("order_type", _TEXT),
+        ("time_in_force", _TEXT),
+        ("status", _TEXT),
+        ("party_id", _TEXT),
+        ("side", _TEXT),
+    ],
+    align=True,
+)
+
+POSITION = np.dtype(
+    [
+        ("party_id", _TEXT),
+        ("market_id", _TEXT),
+        ("open_volume", "<i8"),
+        ("average_entry_price", "<i8"),
+        ("unrealised_pnl_high", "<i8"),
+        ("unrealised_pnl_low", "<u8"),
+        ("realised_pnl_high", "<i8"),
+        ("realised_pnl_low", "<u8"),
+    ],
+    align=True,
+)
+
+ACCOUNT = np.dtype(
+    [
+        ("owner", _TEXT),
+        ("account_type", _TEXT),
+        ("balance_high", "<i8"),
+        ("balance_low", "<u8"),
+        ("asset_id", _TEXT),
+        ("market_id", _TEXT),
+    ],
+    align=True,
+)
+
+# A data node stream connecting or disconnecting in the feed process
+STREAM_STATUS = np.dtype([("stream", _TEXT), ("connected", "?")], align=True)
+
+# Ring kinds, each feeding one part of a strategy worker's stores
+LAYOUTS = {
+    "reference_prices": REFERENCE_PRICE,
+    "market_data": MARKET_DATA,
+    "orders": ORDER,
+    "positions": POSITION,
+    "accounts": ACCOUNT,
+    "streams": STREAM_STATUS,
+}
+
+# Decoded IDs and enum values repeat, so are interned and cached by their
+# bytes. Order IDs are unique and decoded afresh
+_texts: dict[bytes, str] = {}
+
+
+def _text(value: bytes) -> str:
+    text = _texts.get(value)
+    if text is None:
+        text = _texts[value] = sys.intern(value.decode())
+    return text
+
+
+def _split(value: int) -> tuple[int, int]:
+    return value >> 64, value & _LOW_MASK
+
+
+def _join(high: int, low: int) -> int:
+    return (high << 64) | low
+
+
+def _nan_if_none(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def encode_reference_price(price: ReferencePrice) -> tuple:
+    return (
+        price.symbol.encode(),
+        price.bid_price,
+        price.ask_price,
+        _nan_if_none(price.microprice),
+        _nan_if_none(price.weighted_mid),
+        _nan_if_none(price.vwap_mid),
+        price.received_at,
+        price.oldest_input_at,
+    )
+
+
+def decode_reference_price(record: tuple) -> ReferencePrice:
+    (
+        symbol,
+        bid_price,
+        ask_price,
+        microprice,
+        weighted_mid,
+        vwap_mid,
+        received_at,
+        oldest_input_at,
+    ) = record
+    symbol = _text(symbol)
+    return ReferencePrice(
+        symbol=symbol,
+        bid_price=bid_price,
+        ask_price=ask_price,
+        received_at=received_at,
+        microprice=_none_if_nan(microprice),
+        weighted_mid=_none_if_nan(weighted_mid),
+        vwap_mid=_none_if_nan(vwap_mid),
+        # Only a composite's stalest input is carried over, which is all
+        # that staleness checks look at
+        inputs_received_at=(
+            {symbol: oldest_input_at} if oldest_input_at != received_at else None
+        ),
+    )
+
+
+def encode_market_data(market_data: MarketData) -> tuple:
+    return (
+        market_data.market_id.encode(),
+        market_data.mark_price,
+        market_data.best_bid_price,
+        market_data.best_offer_price,
+        market_data.best_bid_volume,
+        market_data.best_offer_volume,
+        market_data.open_interest,
+        market_data.trading_mode.encode(),
+        market_data.state.encode(),
+    )
+
+
+def decode_market_data(record: tuple) -> MarketData:
+    (
+        market_id,
+        mark_price,
+        best_bid_price,
+        best_offer_price,
+        best_bid_volume,
+        best_offer_volume,
+        open_interest,
+        trading_mode,
+        state,
+    ) = record
+    return MarketData(
+        _text(market_id),
+        mark_price,
+        best_bid_price,
+        best_offer_price,
+        best_bid_volume,
+        best_offer_volume,
+        open_interest,
+        _text(trading_mode),
+        _text(state),
+    )
+
+
+def encode_order(order: Order) -> tuple:
+    return (
+        order.order_id.encode(),
+        order.market_id.encode(),
+        order.size,
+        order.remaining_size,
+        order.price,
+        order.order_type.encode(),
+        order.time_in_force.encode(),
+        order.status.encode(),
+        order.party_id.encode(),
+        order.side.encode(),
+    )
+
+
+def decode_order(record: tuple) -> Order:
+    (
+        order_id,
+        market_id,
+        size,
+        remaining_size,
+        price,
+        order_type,
+        time_in_force,
+        status,
+        party_id,
+        side,
+    ) = record
+    return Order(
+        order_id.decode(),
+        _text(market_id),
+        size,
+        remaining_size,
+        price,
+        _text(order_type),
+        _text(time_in_force),
+        _text(status),
+        _text(party_id),
+        _text(side),
+    )
+
+
+def encode_position(position: Position) -> tuple:
+    return (
+        position.party_id.encode(),
+        position.market_id.encode(),
+        position.open_volume,
+        position.average_entry_price,
+        *_split(position.unrealised_pnl),
+        *_split(position.realised_pnl),
+    )
+
+
+def decode_position(record: tuple) -> Position:
+    (
+        party_id,
+        market_id,
+        open_volume,
+        average_entry_price,
+        unrealised_pnl_high,
+        unrealised_pnl_low,
+        realised_pnl_high,
+        realised_pnl_low,
+    ) = record
+    return Position(
+        _text(party_id),
+        _text(market_id),
+        open_volume,
+        average_entry_price,
+        _join(unrealised_pnl_high, unrealised_pnl_low),
+        _join(realised_pnl_high, realised_pnl_low),
+    )
+
+
+def encode_account(account: Account) -> tuple:
+    return (
+        account.owner.encode(),
+        account.account_type.encode(),
+        *_split(account.balance),
+        account.asset_id.encode(),
+        account.market_id.encode(),
+    )
+
+
+def decode_account(record: tuple) -> Account:
+    owner, account_type, balance_high, balance_low, asset_id, market_id = record
+    return Account(
+        _text(owner),
+        _text(account_type),
+        _join(balance_high, balance_low),
+        _text(asset_id),
+        _text(market_id),
+    )
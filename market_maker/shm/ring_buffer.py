@@ -0,0 +1,167 @@
+import logging
+import platform
+import threading
+from multiprocessing import shared_memory
+from typing import Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The write sequence sits on a cache line of its own ahead of the slots
+_HEADER_SIZE = 64
+
+# Machines whose stores become visible to other cores in program order, which
+# the seqlock relies on in the absence of memory fences
+_ORDERED_STORE_MACHINES = ("x86_64", "amd64")
+
+
+def require_ordered_stores() -> None:
+    """Raises if this machine may reorder stores, as ARM does, in which case
+    a reader could accept a record before all of it has been written.
+    """
+    machine = platform.machine()
+    if machine.lower() not in _ORDERED_STORE_MACHINES:
+        raise RuntimeError(
+            f"Shared memory rings need x86-64, where stores are not reordered, "
+            f"not {machine}"
+        )
+
+
+class SharedRing:
+    def __init__(
+        self,
+        name: str,
+        record_dtype: np.dtype,
+        capacity: int,
+        create: bool = False,
+        replay: bool = False,
+    ):
+        """A ring of fixed layout records in shared memory, written by one
+        process and read by any number of others without locks or copies.
+
+        Every slot carries a sequence counter used as a seqlock. The writer
+        makes it odd, writes the record, sets it to `2 * n + 2` for the `n`th
+        record written, then advances the ring's write sequence. Readers
+        convert records straight from the shared block and afterwards check
+        that each slot's counter still holds the value they expected, dropping
+        any record the writer had moved on to overwriting. The writer never
+        waits for readers: a reader more than `capacity` records behind skips
+        ahead and counts what it missed in `overruns`.
+
+        Stores must become visible to other processes in the order they were
+        made, as on x86-64, as no memory fences are used. Check with
+        `require_ordered_stores` before relying on a ring.
+
+        Args:
+            name:
+                str, name of the shared memory block
+            record_dtype:
+                np.dtype, layout of each record, see `records`
+            capacity:
+                int, number of records held, a power of two
+            create:
+                bool, whether to create the block rather than attach to one
+                created by another process
+            replay:
+                bool, if set a reader starts from the oldest record still held
+                rather than the next one written
+        """
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError(f"Ring capacity must be a power of two, got {capacity}")
+        self.name = name
+        self._capacity = capacity
+        self._mask = capacity - 1
+
+        slot_dtype = np.dtype(
+            [("sequence", "<u8"), ("record", record_dtype)], align=True
+        )
+        self._shm = shared_memory.SharedMemory(
+            name=name,
+            create=create,
+            size=_HEADER_SIZE + slot_dtype.itemsize * capacity if create else 0,
+        )
+        self._header = np.ndarray((1,), dtype="<u8", buffer=self._shm.buf)
+        slots = np.ndarray(
+            (capacity,), dtype=slot_dtype, buffer=self._shm.buf, offset=_HEADER_SIZE
+        )
+        self._sequences = slots["sequence"]
+        self._records = slots["record"]
+
+        self._write_lock = threading.Lock()
+        head = int(self._header[0])
+        self._next = max(head - capacity, 0) if replay else head
+        self.overruns = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def write_sequence(self) -> int:
+        """Number of records written to the ring so far."""
+        return int(self._header[0])
+
+    def write(self, record: tuple) -> None:
+        self.write_many((record,))
+
+    def write_many(self, records: Iterable[tuple]) -> None:
+        """Appends records, given as tuples of field values in the order of
+        the ring's record layout. Only one process may write to a ring, but
+        any of its threads may.
+        """
+        with self._write_lock:
+            sequence = int(self._header[0])
+            for record in records:
+                slot = sequence & self._mask
+                self._sequences[slot] = 2 * sequence + 1
+                self._records[slot] = record
+                self._sequences[slot] = 2 * sequence + 2
+                sequence += 1
+            self._header[0] = sequence
+
+    def read(self, max_records: Optional[int] = None) -> list[tuple]:
+        """Records written since the last read, oldest first, as tuples of
+        field values.
+        """
+        head = int(self._header[0])
+        sequence = self._next
+        if head - sequence > self._capacity:
+            self.overruns += head - self._capacity - sequence
+            sequence = head - self._capacity
+        if max_records is not None:
+            head = min(head, sequence + max_records)
+
+        records = []
+        while sequence < head:
+            start = sequence & self._mask
+            end = min(start + head - sequence, self._capacity)
+            batch = self._records[start:end].tolist()
+            # Checked only after converting. A record the writer has started
+            # to overwrite since no longer has the counter expected of it
+            expected = np.arange(
+                2 * sequence + 2, 2 * (sequence + end - start) + 2, 2, dtype=np.uint64
+            )
+            stale = np.flatnonzero(self._sequences[start:end] != expected)
+            if len(stale):
+                # Slots are overwritten oldest first, so only a leading run
+                # of the batch can have been lost
+                lost = int(stale[-1]) + 1
+                self.overruns += lost
+                batch = batch[lost:]
+            records.extend(batch)
+            sequence += end - start
+
+        self._next = sequence
+        return records
+
+    def close(self) -> None:
+        # Views into the block must be released before it can be closed
+        del self._header, self._sequences, self._records
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Frees the block once every process has closed it. Called once, by
+        the process which created it.
+        """
+        self._shm.unlink()
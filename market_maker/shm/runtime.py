@@ -0,0 +1,94 @@
+"""
+Runs the market maker as separate feed and strategy processes sharing memory.
+
+Selected with `RUNTIME=multiprocess`. A Binance feed process and a Vega feed
+process parse their streams and write fixed layout records, see `records`,
+into shared memory rings, see `ring_buffer`. `STRATEGY_PROCESSES` strategy
+workers each quote a shard of the markets, reading the records for their own
+markets straight out of shared memory into their stores. Parsing and quoting
+run on separate cores rather than sharing one interpreter lock, so adding
+markets adds workers instead of contention.
+
+Each worker loads its initial state over REST and runs its own wallet
+pipeline, transaction tracker and submission scheduler, with the submission
+rate split evenly between workers. Order books, snapshots and recording are
+not available in this runtime, and it only runs on x86-64, see
+`ring_buffer.require_ordered_stores`.
+"""
+
+import logging
+import multiprocessing
+
+from market_maker.config import Config
+from market_maker.shm.feeds import run_binance_feed, run_vega_feed
+from market_maker.shm.layout import RingLayout
+from market_maker.shm.ring_buffer import require_ordered_stores
+from market_maker.shm.worker import run_strategy_worker
+
+logger = logging.getLogger(__name__)
+
+
+def run(config: Config) -> None:
+    require_ordered_stores()
+    markets = config.markets or [(config.market_id, config.binance_market)]
+    for setting in ("snapshot_path", "record_dir", "track_order_book"):
+        if getattr(config, setting):
+            logger.warning(f"{setting} is ignored by the multiprocess runtime")
+
+    layout = RingLayout.for_markets(
+        markets, processes=config.strategy_processes, capacity=config.ring_capacity
+    )
+    rings = layout.create_all()
+    # Processes are spawned rather than forked, as forking a process with
+    # threads running can deadlock the child
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    log_level = logging.getLogger().level
+
+    processes = [
+        context.Process(
+            target=run_binance_feed,
+            args=(config, layout, stop_event, log_level),
+            name="binance_feed",
+        ),
+        context.Process(
+            target=run_vega_feed,
+            args=(config, layout, stop_event, log_level),
+            name="vega_feed",
+        ),
+    ] + [
+        context.Process(
+            target=run_strategy_worker,
+            args=(config, layout, shard, stop_event, log_level),
+            name=f"strategy_worker_{shard}",
+        )
+        for shard in range(len(layout.shards))
+    ]
+    for process in processes:
+        process.start()
+    logger.info(
+        f"Started {len(layout.shards)} strategy workers for {len(markets)} markets"
+    )
+
+    try:
+        # Runs until Ctrl+C or until any process exits, which leaves its
+        # rings unfed or unread
+        while all(process.is_alive() for process in processes):
+            stop_event.wait(1)
+        for process in processes:
+            if not process.is_alive():
+                logger.error(
+                    f"{process.name} exited with code {process.exitcode}, stopping"
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop, terminating it")
+                process.terminate()
+        for ring in rings:
+            ring.close()
+            ring.unlink()
@@ -0,0 +1,286 @@
+import dataclasses
+import logging
+import time
+from typing import Any, Callable
+
+from market_maker.client.ws.vega_web_socket_client import (
+    StreamStatus,
+    VegaWebSocketClient,
+)
+from market_maker.config import Config
+from market_maker.metrics import MetricsServer, latency_metrics
+from market_maker.shm.feeds import init_process
+from market_maker.shm.layout import RingLayout
+from market_maker.shm.records import (
+    decode_account,
+    decode_market_data,
+    decode_order,
+    decode_position,
+    decode_reference_price,
+)
+from market_maker.store.binance_store import BinanceStore
+from market_maker.store.vega_store import VegaStore
+from market_maker.strategy.multi_market_runner import MultiMarketRunner
+from market_maker.strategy.simple_market_maker import SimpleMarketMaker
+from market_maker.submission_scheduler import BlockClock, SubmissionScheduler
+from market_maker.transaction_tracker import TransactionTracker
+from market_maker.wallet import PipelinedVegaWallet, VegaWallet
+
+logger = logging.getLogger(__name__)
+
+# How long a worker sleeps when none of its rings have anything new, doubling
+# while they stay empty, so an idle worker's polling thread leaves the
+# interpreter lock to its strategies
+MIN_IDLE_SLEEP_SECONDS = 0.00005
+MAX_IDLE_SLEEP_SECONDS = 0.001
+
+
+class RingStreamClient(VegaWebSocketClient):
+    """Stands in for the data node streams of a worker's `VegaStore`, which
+    are fed from shared memory by a `ShardReader` instead.
+
+    Subscribing only registers a stream as connected. Connection changes
+    seen by the Vega feed process are replayed with `set_connected`, so the
+    store marks sections stale and resyncs them exactly as it would for its
+    own sockets.
+    """
+
+    def subscribe_endpoint(
+        self, url: str, msg_type: str, callback: Callable[[dict], Any]
+    ) -> None:
+        self.streams[msg_type] = StreamStatus(epoch=1, connected=True)
+
+    def stop(self):
+        self._stopped = True
+
+    def set_connected(self, msg_type: str, connected: bool) -> None:
+        status = self.streams.get(msg_type)
+        if status is None:
+            return
+        if not connected:
+            self._on_disconnected(msg_type)
+        elif not status.connected:
+            self._on_open(msg_type)
+
+    def resync(self, msg_type: str) -> None:
+        """Treats updates lost from a ring as a dropped connection."""
+        self.set_connected(msg_type, False)
+        self.set_connected(msg_type, True)
+
+
+class ShardReader:
+    def __init__(
+        self,
+        layout: RingLayout,
+        shard: int,
+        vega_store: VegaStore,
+        binance_store: BinanceStore,
+        streams: RingStreamClient,
+    ):
+        """Applies the records written for one worker's markets to its stores.
+
+        Attaches to the rings on creation, so create it before the store's
+        initial load to not miss updates streamed meanwhile. Reference prices
+        are replayed from the oldest still held, to pick up the latest price
+        for each symbol published before the worker started.
+
+        Each poll handles everything new in a ring as one update, so the
+        Vega store publishes one state per ring and only the newest reference
+        price per symbol reaches the strategies.
+        """
+        self._vega_store = vega_store
+        self._binance_store = binance_store
+        self._streams = streams
+        self._rings = {
+            kind: layout.open(shard, kind, replay=kind == "reference_prices")
+            for kind in (
+                "streams",
+                "market_data",
+                "orders",
+                "positions",
+                "accounts",
+                "reference_prices",
+            )
+        }
+        self._overruns = dict.fromkeys(self._rings, 0)
+        self._idle_sleep = MIN_IDLE_SLEEP_SECONDS
+
+    def poll(self) -> int:
+        """Applies all new records, returning how many there were."""
+        rings = self._rings
+        # Connection changes first, so a resync they start keeps any update
+        # streamed after the reconnect
+        statuses = rings["streams"].read()
+        for stream, connected in statuses:
+            self._streams.set_connected(stream.decode(), connected)
+
+        count = len(statuses)
+        for kind, decode, apply in (
+            ("market_data", decode_market_data, self._vega_store.apply_market_data),
+            ("orders", decode_order, self._vega_store.apply_orders),
+            ("positions", decode_position, self._vega_store.apply_positions),
+            ("accounts", decode_account, self._vega_store.apply_accounts),
+        ):
+            records = rings[kind].read()
+            if records:
+                apply([decode(record) for record in records])
+                count += len(records)
+            self._check_overruns(kind)
+
+        records = rings["reference_prices"].read()
+        if records:
+            # Later records overwrite earlier ones for the same symbol
+            latest = {record[0]: record for record in records}
+            for record in latest.values():
+                self._binance_store.publish(decode_reference_price(record))
+            count += len(records)
+        self._check_overruns("reference_prices")
+        return count
+
+    def _check_overruns(self, kind: str) -> None:
+        overruns = self._rings[kind].overruns
+        if overruns == self._overruns[kind]:
+            return
+        logger.warning(
+            f"Missed {overruns - self._overruns[kind]} {kind} records, "
+            "the worker is falling behind its feed"
+        )
+        self._overruns[kind] = overruns
+        # Market data and prices are superseded by the next update, while
+        # orders, positions and accounts must be reloaded
+        if kind in ("orders", "positions", "accounts"):
+            self._streams.resync(kind)
+
+    def wait_for_reference_prices(self, symbols: list[str], stop_event) -> None:
+        missing = set(symbols)
+        logger.info(f"Waiting for reference prices for {sorted(missing)}")
+        while missing and not stop_event.is_set():
+            self._poll_or_sleep()
+            missing -= {
+                price.symbol for price in self._binance_store.get_reference_prices()
+            }
+
+    def run(self, stop_event) -> None:
+        while not stop_event.is_set():
+            self._poll_or_sleep()
+
+    def _poll_or_sleep(self) -> None:
+        if self.poll():
+            self._idle_sleep = MIN_IDLE_SLEEP_SECONDS
+            return
+        time.sleep(self._idle_sleep)
+        self._idle_sleep = min(self._idle_sleep * 2, MAX_IDLE_SLEEP_SECONDS)
+
+
+def run_strategy_worker(
+    config: Config, layout: RingLayout, shard: int, stop_event, log_level: int
+) -> None:
+    """Entry point of a strategy worker process, which quotes one shard of
+    the markets from the rings written by the feed processes, with its own
+    wallet pipeline, transaction tracker and submission scheduler, until
+    `stop_event` is set.
+    """
+    init_process(log_level)
+    markets = list(layout.shards[shard])
+    # Snapshots and order books are kept per process in the other runtimes,
+    # and are not carried over shared memory
+    config = dataclasses.replace(
+        config,
+        markets=markets,
+        market_id=markets[0][0],
+        binance_market=markets[0][1],
+        snapshot_path=None,
+        track_order_book=False,
+    )
+
+    if config.metrics_port is not None:
+        latency_metrics.enable()
+        MetricsServer(port=config.metrics_port + shard).start()
+
+    store = VegaStore(config, ws_client_class=RingStreamClient)
+    binance_store = BinanceStore(symbols_to_subscribe=[])
+    reader = ShardReader(layout, shard, store, binance_store, store.ws_client)
+    # Every market in the layout is loaded, so that strategies can see which
+    # ones share their settlement asset, though only this shard's markets
+    # are updated from the rings
+    store.start(
+        market_ids=[market_id for market_id, _ in layout.markets],
+        party_id=config.party_id,
+    )
+    reader.wait_for_reference_prices([symbol for _, symbol in markets], stop_event)
+
+    tracker = None
+    if config.track_transactions and config.tendermint_url:
+        tracker = TransactionTracker(
+            config.tendermint_url, window_seconds=config.rejection_window_seconds
+        )
+        tracker.start()
+
+    wallet = PipelinedVegaWallet(
+        VegaWallet(
+            token=config.wallet_token,
+            wallet_url=config.wallet_url,
+            pub_key=config.party_id,
+        ),
+        max_in_flight=config.wallet_max_in_flight,
+        on_complete=tracker.on_submission if tracker is not None else None,
+    )
+    wallet.start()
+
+    block_clock = None
+    scheduler = None
+    if config.submission_rate_per_second is not None:
+        if config.tendermint_url:
+            block_clock = BlockClock(config.tendermint_url)
+            block_clock.start()
+        # Workers share the key's allowance
+        scheduler = SubmissionScheduler(
+            wallet,
+            rate_per_second=config.submission_rate_per_second / len(layout.shards),
+            burst=config.submission_burst,
+            max_batch_size=config.max_batch_size,
+            window_seconds=config.submission_window_seconds,
+            block_clock=block_clock,
+        )
+        scheduler.start()
+
+    strategies = [
+        SimpleMarketMaker(
+            binance_store=binance_store,
+            vega_store=store,
+            config=config,
+            wallet=scheduler if scheduler is not None else wallet,
+            update_freq_seconds=config.update_freq_seconds,
+            requote_threshold_bps=config.requote_threshold_bps,
+            min_requote_interval_seconds=config.min_requote_interval_seconds,
+            market_id=market_id,
+            binance_market=binance_market,
+            reference_price_type=config.reference_price_type,
+            max_reference_age_seconds=config.reference_max_age_seconds,
+            transaction_tracker=tracker,
+            max_rejection_rate=config.max_rejection_rate,
+            # Shared with the markets quoted by the other workers
+            balance_market_ids=[market_id for market_id, _ in layout.markets],
+        )
+        for market_id, binance_market in markets
+    ]
+    runner = None
+    if len(strategies) == 1:
+        strategies[0].run()
+    else:
+        runner = MultiMarketRunner(strategies, max_workers=config.strategy_workers)
+        runner.run()
+
+    logger.info(f"Worker {shard} quoting {[market_id for market_id, _ in markets]}")
+    reader.run(stop_event)
+
+    if runner is not None:
+        runner.stop()
+    store.stop()
+    if scheduler is not None:
+        scheduler.stop()
+    if block_clock is not None:
+        block_clock.stop()
+    wallet.stop()
+    if tracker is not None:
+        tracker.stop()
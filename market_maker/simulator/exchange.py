@@ -0,0 +1,325 @@
+import random
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+@dataclass
+class SimulatedMarket:
+    market_id: str
+    code: str
+    settlement_asset_id: str
+    mid_price: float
+    decimal_places: int = 4
+    position_decimal_places: int = 2
+    # Half of the synthetic spread, as a fraction of the mid price
+    half_spread: float = 0.0005
+    volatility: float = 0.0002
+
+    @property
+    def best_bid(self) -> float:
+        return self.mid_price * (1 - self.half_spread)
+
+    @property
+    def best_offer(self) -> float:
+        return self.mid_price * (1 + self.half_spread)
+
+
+@dataclass
+class SimulatedParty:
+    party_id: str
+    # Asset ID to general account balance, in asset decimal units
+    balances: dict[str, int] = field(default_factory=dict)
+    # Market ID to (open volume, average entry price), in market units
+    positions: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+
+class SimulatedExchange:
+    def __init__(self, seed: int = 0):
+        """In-memory stand-in for a Vega network, holding assets, markets and
+        resting orders, applying batch market instructions and publishing
+        the resulting updates to subscribers in data node stream format.
+
+        Prices follow a random walk per market, and a resting order is filled
+        in full once the synthetic best price on the other side crosses it.
+        """
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+
+        self.assets: dict[str, dict] = {}
+        self.markets: dict[str, SimulatedMarket] = {}
+        self.parties: dict[str, SimulatedParty] = {}
+        self.orders: dict[str, dict] = {}
+
+        self._subscribers: list[tuple[str, dict, Callable[[dict], Any]]] = []
+
+    ###########################################################
+    #                        Setup                            #
+    ###########################################################
+
+    def add_asset(self, asset_id: str, symbol: str, decimals: int = 6) -> None:
+        self.assets[asset_id] = {
+            "id": asset_id,
+            "status": "STATUS_ENABLED",
+            "details": {"name": symbol, "symbol": symbol, "decimals": str(decimals)},
+        }
+
+    def add_market(self, market: SimulatedMarket) -> None:
+        self.markets[market.market_id] = market
+
+    def add_party(self, party_id: str, balances: dict[str, float]) -> None:
+        self.parties[party_id] = SimulatedParty(
+            party_id,
+            balances={
+                asset_id: int(balance * 10 ** self._asset_decimals(asset_id))
+                for asset_id, balance in balances.items()
+            },
+        )
+
+    ###########################################################
+    #                     Subscriptions                       #
+    ###########################################################
+
+    def subscribe(
+        self, channel: str, filters: dict, callback: Callable[[dict], Any]
+    ) -> Callable[[], None]:
+        """Registers a callback for updates on one of the `market_data`,
+        `orders`, `positions` or `accounts` channels, returning a function
+        which removes it again. Order, position and account subscriptions
+        immediately receive a snapshot of current state.
+        """
+        subscriber = (channel, filters, callback)
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if channel == "orders":
+                orders = [o for o in self.orders.values() if _matches(o, filters)]
+                callback({"snapshot": {"orders": orders}})
+            elif channel == "positions":
+                positions = [p for p in self.position_nodes() if _matches(p, filters)]
+                callback({"snapshot": {"positions": positions}})
+            elif channel == "accounts":
+                accounts = [a for a in self.account_nodes() if _matches(a, filters)]
+                callback({"snapshot": {"accounts": accounts}})
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+
+        return unsubscribe
+
+    def _publish(self, channel: str, key: str, nodes: list[dict]) -> None:
+        for sub_channel, filters, callback in list(self._subscribers):
+            if sub_channel != channel:
+                continue
+            matching = [n for n in nodes if _matches(n, filters)]
+            if not matching:
+                continue
+            # Market data is sent bare, other streams distinguish updates
+            # from the initial snapshot
+            if channel == "market_data":
+                callback({key: matching})
+            else:
+                callback({"updates": {key: matching}})
+
+    ###########################################################
+    #                       REST views                        #
+    ###########################################################
+
+    def asset_nodes(self) -> list[dict]:
+        return list(self.assets.values())
+
+    def market_nodes(self) -> list[dict]:
+        return [
+            {
+                "id": m.market_id,
+                "state": "STATE_ACTIVE",
+                "tradingMode": "TRADING_MODE_CONTINUOUS",
+                "decimalPlaces": str(m.decimal_places),
+                "positionDecimalPlaces": str(m.position_decimal_places),
+                "tradableInstrument": {
+                    "instrument": {
+                        "code": m.code,
+                        "name": m.code,
+                        "future": {"settlementAsset": m.settlement_asset_id},
+                    }
+                },
+            }
+            for m in self.markets.values()
+        ]
+
+    def account_nodes(self) -> list[dict]:
+        return [
+            {
+                "owner": party.party_id,
+                "type": "ACCOUNT_TYPE_GENERAL",
+                "balance": str(balance),
+                "asset": asset_id,
+                "marketId": "",
+            }
+            for party in self.parties.values()
+            for asset_id, balance in party.balances.items()
+        ]
+
+    def position_nodes(self) -> list[dict]:
+        return [
+            self._position_node(party, market_id)
+            for party in self.parties.values()
+            for market_id in party.positions
+        ]
+
+    def market_data_nodes(self) -> list[dict]:
+        return [self._market_data_node(m) for m in self.markets.values()]
+
+    ###########################################################
+    #                       Simulation                        #
+    ###########################################################
+
+    def step(self) -> None:
+        """Moves every market's price one step, fills any crossed orders and
+        publishes new market data.
+        """
+        with self._lock:
+            for market in self.markets.values():
+                market.mid_price *= 1 + self._random.gauss(0, market.volatility)
+                self._fill_crossed(market)
+            self._publish("market_data", "marketData", self.market_data_nodes())
+
+    def apply_batch(self, party_id: str, batch: dict) -> str:
+        """Applies a `batchMarketInstructions` payload for a party, returning
+        a transaction hash.
+        """
+        with self._lock:
+            updated = []
+            for cancellation in batch.get("cancellations", []):
+                order = self.orders.pop(cancellation["orderId"], None)
+                if order is not None and order["partyId"] == party_id:
+                    updated.append(dict(order, status="STATUS_CANCELLED"))
+
+            for amendment in batch.get("amendments", []):
+                order = self.orders.get(amendment["orderId"])
+                if order is None or order["partyId"] != party_id:
+                    continue
+                if "price" in amendment:
+                    order["price"] = amendment["price"]
+                size_delta = int(amendment.get("sizeDelta", 0))
+                order["size"] = str(int(order["size"]) + size_delta)
+                order["remaining"] = str(int(order["remaining"]) + size_delta)
+                if int(order["remaining"]) <= 0:
+                    self.orders.pop(order["id"])
+                    order["status"] = "STATUS_CANCELLED"
+                updated.append(dict(order))
+
+            for submission in batch.get("submissions", []):
+                order = {
+                    "id": uuid.uuid4().hex + uuid.uuid4().hex,
+                    "marketId": submission["marketId"],
+                    "partyId": party_id,
+                    "side": submission["side"],
+                    "price": submission["price"],
+                    "size": submission["size"],
+                    "remaining": submission["size"],
+                    "timeInForce": submission["timeInForce"],
+                    "type": submission["type"],
+                    "status": "STATUS_ACTIVE",
+                }
+                self.orders[order["id"]] = order
+                updated.append(dict(order))
+
+            if updated:
+                self._publish("orders", "orders", updated)
+            self._fill_all_crossed()
+        return uuid.uuid4().hex.upper()
+
+    def _fill_all_crossed(self) -> None:
+        for market in self.markets.values():
+            self._fill_crossed(market)
+
+    def _fill_crossed(self, market: SimulatedMarket) -> None:
+        price_scale = 10**market.decimal_places
+        best_bid = int(market.best_bid * price_scale)
+        best_offer = int(market.best_offer * price_scale)
+
+        filled = []
+        for order in list(self.orders.values()):
+            if order["marketId"] != market.market_id:
+                continue
+            price = int(order["price"])
+            if (order["side"] == "SIDE_BUY" and price >= best_offer) or (
+                order["side"] == "SIDE_SELL" and price <= best_bid
+            ):
+                self.orders.pop(order["id"])
+                filled.append(dict(order, remaining="0", status="STATUS_FILLED"))
+                self._apply_fill(order)
+
+        if filled:
+            self._publish("orders", "orders", filled)
+            parties = {order["partyId"] for order in filled}
+            self._publish(
+                "positions",
+                "positions",
+                [
+                    self._position_node(self.parties[p], market.market_id)
+                    for p in parties
+                ],
+            )
+
+    def _apply_fill(self, order: dict) -> None:
+        party = self.parties.get(order["partyId"])
+        if party is None:
+            return
+        size = int(order["remaining"])
+        if order["side"] == "SIDE_SELL":
+            size = -size
+        price = int(order["price"])
+        volume, entry = party.positions.get(order["marketId"], (0, 0))
+        new_volume = volume + size
+        if new_volume == 0:
+            entry = 0
+        elif volume == 0 or (volume > 0) != (new_volume > 0):
+            entry = price
+        elif abs(new_volume) > abs(volume):
+            entry = (entry * abs(volume) + price * abs(size)) // abs(new_volume)
+        party.positions[order["marketId"]] = (new_volume, entry)
+
+    def _position_node(self, party: SimulatedParty, market_id: str) -> dict:
+        volume, entry = party.positions.get(market_id, (0, 0))
+        return {
+            "partyId": party.party_id,
+            "marketId": market_id,
+            "openVolume": str(volume),
+            "averageEntryPrice": str(entry),
+            "unrealisedPnl": "0",
+            "realisedPnl": "0",
+        }
+
+    def _market_data_node(self, market: SimulatedMarket) -> dict:
+        price_scale = 10**market.decimal_places
+        return {
+            "market": market.market_id,
+            "markPrice": str(int(market.mid_price * price_scale)),
+            "bestBidPrice": str(int(market.best_bid * price_scale)),
+            "bestOfferPrice": str(int(market.best_offer * price_scale)),
+            "bestBidVolume": "0",
+            "bestOfferVolume": "0",
+            "openInterest": "0",
+            "marketTradingMode": "TRADING_MODE_CONTINUOUS",
+            "marketState": "STATE_ACTIVE",
+        }
+
+    def _asset_decimals(self, asset_id: str) -> int:
+        return int(self.assets[asset_id]["details"]["decimals"])
+
+
+def _matches(node: dict, filters: dict) -> bool:
+    market_ids = filters.get("marketIds")
+    if market_ids and node.get("marketId", node.get("market")) not in market_ids:
+        return False
+    market_id = filters.get("marketId")
+    if market_id and node.get("marketId") not in (market_id, ""):
+        return False
+    party_id = filters.get("partyId")
+    if party_id and node.get("partyId", node.get("owner")) != party_id:
+        return False
+    return True
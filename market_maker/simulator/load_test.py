@@ -0,0 +1,445 @@
+"""
+End-to-end load test of the market maker against a local simulator.
+
+Starts a `SimulatorServer`, points a `VegaStore`, wallet and one strategy per
+simulated market at it, and drives synthetic Binance ticks into the
+`BinanceStore` at a configurable rate. Reports transaction throughput and
+tick-to-order latency, measured from the first tick after a market's previous
+transaction to the simulator receiving that market's next transaction.
+
+Run with `python -m market_maker.simulator.load_test --help` for options.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import logging
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+import rel
+
+from market_maker.aio.strategy_runner import AsyncStrategyRunner
+from market_maker.aio.vega_web_socket_client import AsyncVegaWebSocketClient
+from market_maker.aio.wallet import AsyncVegaWallet
+from market_maker.config import Config
+from market_maker.metrics import latency_metrics
+from market_maker.shm.feeds import ReferencePricePublisher, run_vega_feed
+from market_maker.shm.layout import RingLayout
+from market_maker.shm.ring_buffer import require_ordered_stores
+from market_maker.shm.worker import run_strategy_worker
+from market_maker.simulator.exchange import SimulatedExchange, SimulatedMarket
+from market_maker.simulator.server import SimulatorConfig, SimulatorServer
+from market_maker.store.binance_store import BinanceStore
+from market_maker.store.vega_store import VegaStore
+from market_maker.strategy.multi_market_runner import MultiMarketRunner
+from market_maker.strategy.simple_market_maker import SimpleMarketMaker
+from market_maker.submission_scheduler import BlockClock, SubmissionScheduler
+from market_maker.transaction_tracker import TransactionTracker
+from market_maker.wallet import PipelinedVegaWallet, VegaWallet
+
+PARTY_ID = "f" * 64
+ASSET_ID = "a" * 64
+
+
+class LatencyTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._first_unserved_tick: dict[str, Optional[float]] = {}
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+
+    def on_tick(self, market_id: str) -> None:
+        with self._lock:
+            if self._first_unserved_tick.get(market_id) is None:
+                self._first_unserved_tick[market_id] = time.monotonic()
+
+    def on_transaction(self, party_id: str, transaction: dict) -> None:
+        now = time.monotonic()
+        market_id = None
+        for instructions in transaction.get("batchMarketInstructions", {}).values():
+            if instructions:
+                market_id = instructions[0]["marketId"]
+                break
+        with self._lock:
+            tick_time = self._first_unserved_tick.pop(market_id, None)
+        if tick_time is not None:
+            self.latencies[market_id].append(now - tick_time)
+
+
+def build_exchange(num_markets: int, seed: int) -> SimulatedExchange:
+    exchange = SimulatedExchange(seed=seed)
+    exchange.add_asset(ASSET_ID, "USDT")
+    for i in range(num_markets):
+        exchange.add_market(
+            SimulatedMarket(
+                market_id=f"{i:064x}",
+                code=f"SIM{i}",
+                settlement_asset_id=ASSET_ID,
+                mid_price=10 + i,
+            )
+        )
+    exchange.add_party(PARTY_ID, {ASSET_ID: 1_000_000})
+    return exchange
+
+
+def run_ticks(
+    exchange: SimulatedExchange,
+    binance_store: BinanceStore,
+    tracker: LatencyTracker,
+    rate_hz: float,
+    stopped: threading.Event,
+) -> None:
+    interval = 1 / rate_hz
+    next_tick = time.monotonic()
+    while not stopped.is_set():
+        for market in exchange.markets.values():
+            tracker.on_tick(market.market_id)
+            binance_store.on_tick(
+                {
+                    "data": {
+                        "s": market.code,
+                        "b": str(market.best_bid),
+                        "a": str(market.best_offer),
+                    }
+                }
+            )
+        next_tick += interval
+        stopped.wait(max(next_tick - time.monotonic(), 0))
+
+
+def _scheduler(
+    args: argparse.Namespace, server: SimulatorServer, wallet
+) -> tuple[Optional[SubmissionScheduler], Optional[BlockClock]]:
+    if args.submission_rate is None:
+        return None, None
+    block_clock = BlockClock(server.http_url)
+    block_clock.start()
+    scheduler = SubmissionScheduler(
+        wallet,
+        rate_per_second=args.submission_rate,
+        burst=args.submission_burst,
+        max_batch_size=args.max_batch_size,
+        block_clock=block_clock,
+    )
+    scheduler.start()
+    return scheduler, block_clock
+
+
+def _strategies(
+    args: argparse.Namespace,
+    config: Config,
+    store: VegaStore,
+    binance_store: BinanceStore,
+    wallet,
+    transaction_tracker: TransactionTracker,
+) -> list[SimpleMarketMaker]:
+    return [
+        SimpleMarketMaker(
+            binance_store=binance_store,
+            vega_store=store,
+            config=config,
+            wallet=wallet,
+            requote_threshold_bps=args.requote_threshold_bps,
+            min_requote_interval_seconds=args.min_requote_interval,
+            market_id=market_id,
+            binance_market=symbol,
+            transaction_tracker=transaction_tracker,
+        )
+        for market_id, symbol in config.markets
+    ]
+
+
+def _run_threads(
+    args: argparse.Namespace,
+    exchange: SimulatedExchange,
+    server: SimulatorServer,
+    config: Config,
+    tracker: LatencyTracker,
+    transaction_tracker: TransactionTracker,
+) -> None:
+    store = VegaStore(config)
+    store.start(market_ids=[m for m, _ in config.markets], party_id=PARTY_ID)
+    binance_store = BinanceStore(symbols_to_subscribe=[s for _, s in config.markets])
+
+    stopped = threading.Event()
+    threading.Thread(
+        target=run_ticks,
+        args=(exchange, binance_store, tracker, args.tick_rate, stopped),
+        daemon=True,
+    ).start()
+
+    wallet = PipelinedVegaWallet(
+        VegaWallet(token="", wallet_url=server.http_url, pub_key=PARTY_ID),
+        max_in_flight=args.workers,
+        on_complete=transaction_tracker.on_submission,
+    )
+    wallet.start()
+    scheduler, block_clock = _scheduler(args, server, wallet)
+    runner = MultiMarketRunner(
+        _strategies(
+            args,
+            config,
+            store,
+            binance_store,
+            scheduler if scheduler is not None else wallet,
+            transaction_tracker,
+        ),
+        max_workers=args.workers,
+    )
+    runner.run()
+
+    rel.timeout(args.duration, rel.abort)
+    rel.dispatch()
+
+    stopped.set()
+    runner.stop()
+    if scheduler is not None:
+        scheduler.stop()
+        block_clock.stop()
+    wallet.stop()
+
+
+async def _run_async(
+    args: argparse.Namespace,
+    exchange: SimulatedExchange,
+    server: SimulatorServer,
+    config: Config,
+    tracker: LatencyTracker,
+    transaction_tracker: TransactionTracker,
+) -> None:
+    store = VegaStore(config, ws_client_class=AsyncVegaWebSocketClient)
+    store.start(market_ids=[m for m, _ in config.markets], party_id=PARTY_ID)
+    binance_store = BinanceStore(symbols_to_subscribe=[s for _, s in config.markets])
+
+    wallet = AsyncVegaWallet(
+        VegaWallet(token="", wallet_url=server.http_url, pub_key=PARTY_ID),
+        max_in_flight=args.workers,
+        on_complete=transaction_tracker.on_submission,
+    )
+    wallet.start()
+    scheduler, block_clock = _scheduler(args, server, wallet)
+    runner = AsyncStrategyRunner(
+        _strategies(
+            args,
+            config,
+            store,
+            binance_store,
+            scheduler if scheduler is not None else wallet,
+            transaction_tracker,
+        )
+    )
+    runner.run()
+
+    # Ticks are driven on the loop, as the Binance feed would deliver them
+    interval = 1 / args.tick_rate
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        for market in exchange.markets.values():
+            tracker.on_tick(market.market_id)
+            binance_store.on_tick(
+                {
+                    "data": {
+                        "s": market.code,
+                        "b": str(market.best_bid),
+                        "a": str(market.best_offer),
+                    }
+                }
+            )
+        await asyncio.sleep(interval)
+
+    runner.stop()
+    store.stop()
+    if scheduler is not None:
+        scheduler.stop()
+        block_clock.stop()
+    await wallet.stop()
+
+
+def _run_processes(
+    args: argparse.Namespace,
+    exchange: SimulatedExchange,
+    config: Config,
+    tracker: LatencyTracker,
+) -> None:
+    # The Binance feed process is replaced by ticks published from here, the
+    # Vega feed and strategy workers run as they would in production. Workers
+    # track their own transactions, so no outcomes are reported
+    require_ordered_stores()
+    config = dataclasses.replace(
+        config,
+        requote_threshold_bps=args.requote_threshold_bps,
+        min_requote_interval_seconds=args.min_requote_interval,
+        wallet_max_in_flight=args.workers,
+        strategy_workers=args.workers,
+        submission_rate_per_second=args.submission_rate,
+        submission_burst=args.submission_burst,
+        max_batch_size=args.max_batch_size,
+    )
+    layout = RingLayout.for_markets(
+        config.markets, processes=args.processes, capacity=config.ring_capacity
+    )
+    rings = layout.create_all()
+    binance_store = BinanceStore(symbols_to_subscribe=[s for _, s in config.markets])
+    publisher = ReferencePricePublisher(layout)
+    for symbol in publisher.symbols:
+        binance_store.add_tick_listener(symbol, publisher.publish)
+
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    log_level = logging.getLogger().level
+    processes = [
+        context.Process(
+            target=run_vega_feed, args=(config, layout, stop_event, log_level)
+        )
+    ] + [
+        context.Process(
+            target=run_strategy_worker,
+            args=(config, layout, shard, stop_event, log_level),
+        )
+        for shard in range(len(layout.shards))
+    ]
+    for process in processes:
+        process.start()
+
+    stopped = threading.Event()
+    threading.Thread(
+        target=run_ticks,
+        args=(exchange, binance_store, tracker, args.tick_rate, stopped),
+        daemon=True,
+    ).start()
+    time.sleep(args.duration)
+
+    stopped.set()
+    stop_event.set()
+    for process in processes:
+        process.join(timeout=10)
+    for ring in rings:
+        ring.close()
+        ring.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--markets", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--tick-rate", type=float, default=20)
+    parser.add_argument("--market-data-rate", type=float, default=10)
+    parser.add_argument("--stream-latency", type=float, default=0)
+    parser.add_argument("--wallet-latency", type=float, default=0)
+    parser.add_argument("--requote-threshold-bps", type=float, default=1)
+    parser.add_argument("--min-requote-interval", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--submission-rate",
+        type=float,
+        help="Rate limit transactions through a SubmissionScheduler",
+    )
+    parser.add_argument("--submission-burst", type=int, default=1)
+    parser.add_argument("--max-batch-size", type=int, default=30)
+    parser.add_argument(
+        "--drop-streams-at",
+        type=float,
+        help="Seconds into the run to drop every websocket, to test reconnects",
+    )
+    parser.add_argument(
+        "--runtime",
+        choices=("threads", "asyncio", "multiprocess"),
+        default="threads",
+        help="Run the bot on threads, on one event loop with market_maker.aio, or "
+        "as feed and strategy processes with market_maker.shm",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=2,
+        help="Strategy worker processes with --runtime multiprocess",
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="Print per-stage latency histograms"
+    )
+    args = parser.parse_args()
+    if args.metrics:
+        latency_metrics.enable()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(message)s")
+
+    exchange = build_exchange(args.markets, seed=args.seed)
+    tracker = LatencyTracker()
+    server = SimulatorServer(
+        exchange,
+        SimulatorConfig(
+            market_data_rate_hz=args.market_data_rate,
+            stream_latency_seconds=args.stream_latency,
+            wallet_latency_seconds=args.wallet_latency,
+        ),
+        on_transaction=tracker.on_transaction,
+    )
+    server.start()
+
+    markets = [(m.market_id, m.code) for m in exchange.markets.values()]
+    config = Config(
+        node_url=f"{server.http_url}/api/v2",
+        tendermint_url=server.http_url,
+        ws_url=f"{server.ws_url}/api/v2",
+        wallet_url=server.http_url,
+        wallet_token="",
+        market_id=markets[0][0],
+        party_id=PARTY_ID,
+        binance_market=markets[0][1],
+        binance_ws_url="",
+        markets=markets,
+    )
+
+    transaction_tracker = TransactionTracker(server.http_url)
+    transaction_tracker.start()
+    if args.drop_streams_at is not None:
+        threading.Timer(args.drop_streams_at, server.disconnect_streams).start()
+
+    start = time.monotonic()
+    if args.runtime == "asyncio":
+        asyncio.run(
+            _run_async(args, exchange, server, config, tracker, transaction_tracker)
+        )
+    elif args.runtime == "multiprocess":
+        _run_processes(args, exchange, config, tracker)
+    else:
+        _run_threads(args, exchange, server, config, tracker, transaction_tracker)
+    elapsed = time.monotonic() - start
+
+    transaction_tracker.stop()
+    server.stop()
+
+    markets = config.markets
+    latencies = sorted(l for ls in tracker.latencies.values() for l in ls)
+    print(
+        f"{server.transactions_received} transactions "
+        f"({server.transactions_received / elapsed:.1f}/s), "
+        f"{server.instructions_received} instructions "
+        f"({server.instructions_received / elapsed:.1f}/s) over {elapsed:.1f}s"
+    )
+    if latencies:
+        print(
+            "Tick to order latency (ms): "
+            f"p50={statistics.median(latencies) * 1e3:.2f} "
+            f"p99={latencies[int(len(latencies) * 0.99)] * 1e3:.2f} "
+            f"max={latencies[-1] * 1e3:.2f}"
+        )
+    outcomes = [o for m, _ in markets for o in transaction_tracker.outcomes(m)]
+    if outcomes:
+        confirmation = sorted(o.confirmation_seconds for o in outcomes)
+        print(
+            f"{len(outcomes)} transactions confirmed, "
+            f"{sum(o.rejected for o in outcomes) / len(outcomes):.1%} rejected, "
+            f"confirmation p50={statistics.median(confirmation) * 1e3:.2f}ms"
+        )
+    if args.metrics:
+        print(latency_metrics.render_text())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Local HTTP and websocket server standing in for a Vega data node, the Vega
+wallet service and Tendermint, backed by a `SimulatedExchange`.
+
+All services share one port, so pointing the bot at a running simulator means
+setting `NODE_URL=http://<host>:<port>/api/v2`, `WS_URL=ws://<host>:<port>/api/v2`
+and `WALLET_URL`/`TENDERMINT_URL` to `http://<host>:<port>`.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import queue
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from market_maker.simulator.exchange import SimulatedExchange
+
+logger = logging.getLogger(__name__)
+
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+_REST_COLLECTIONS = {
+    "/api/v2/assets": ("assets", SimulatedExchange.asset_nodes),
+    "/api/v2/markets": ("markets", SimulatedExchange.market_nodes),
+    "/api/v2/accounts": ("accounts", SimulatedExchange.account_nodes),
+    "/api/v2/orders": ("orders", lambda exchange: list(exchange.orders.values())),
+    "/api/v2/positions": ("positions", SimulatedExchange.position_nodes),
+}
+
+_STREAMS = {
+    "/api/v2/stream/markets/data": "market_data",
+    "/api/v2/stream/orders": "orders",
+    "/api/v2/stream/positions": "positions",
+    "/api/v2/stream/accounts": "accounts",
+}
+
+# REST filters as sent by `vega_api_client`, mapped onto stream filter names
+_REST_FILTERS = {"filter.partyIds": "partyId", "partyId": "partyId"}
+
+
+@dataclass
+class SimulatorConfig:
+    host: str = "127.0.0.1"
+    port: int = 0
+    # Rate at which prices move and market data is published per market
+    market_data_rate_hz: float = 10
+    # Delays added before each stream message and wallet response
+    stream_latency_seconds: float = 0
+    wallet_latency_seconds: float = 0
+
+
+class SimulatorServer:
+    def __init__(
+        self,
+        exchange: SimulatedExchange,
+        config: Optional[SimulatorConfig] = None,
+        on_transaction: Optional[Callable[[str, dict], Any]] = None,
+    ):
+        """Serves a `SimulatedExchange` over the data node REST and stream
+        endpoints used by the bot, alongside the wallet service's
+        `client.send_transaction`, and Tendermint's `status` and `tx`
+        lookups, singly or batched. Each market data step counts as a block.
+
+        Start serving by calling `start`.
+
+        Args:
+            exchange:
+                SimulatedExchange, state to serve and apply transactions to
+            config:
+                Optional[SimulatorConfig], feed rate, injected latency and
+                address to listen on. An unused port is picked by default
+            on_transaction:
+                Optional[Callable], called with the party ID and transaction
+                as each transaction is received, before any injected latency
+        """
+        self.exchange = exchange
+        self.config = config if config is not None else SimulatorConfig()
+        self._on_transaction = on_transaction
+
+        self._stopped = threading.Event()
+        self._httpd = ThreadingHTTPServer(
+            (self.config.host, self.config.port), _make_handler(self)
+        )
+        self._httpd.daemon_threads = True
+
+        self.transactions_received = 0
+        self.instructions_received = 0
+        # Each market data step stands in for a block
+        self.block_height = 0
+        # Bumped to drop every open stream, see `disconnect_streams`
+        self._stream_epoch = 0
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    @property
+    def http_url(self) -> str:
+        return f"http://{self.config.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.config.host}:{self.port}"
+
+    def start(self) -> None:
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        if self.config.market_data_rate_hz > 0:
+            threading.Thread(target=self._run_market_data, daemon=True).start()
+        logger.info(f"Simulator listening on {self.http_url}")
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def disconnect_streams(self) -> None:
+        """Drops every open websocket, as a data node restart would, to
+        exercise client reconnection.
+        """
+        self._stream_epoch += 1
+
+    def _run_market_data(self) -> None:
+        interval = 1 / self.config.market_data_rate_hz
+        next_step = time.monotonic()
+        while not self._stopped.is_set():
+            self.exchange.step()
+            self.block_height += 1
+            next_step += interval
+            self._stopped.wait(max(next_step - time.monotonic(), 0))
+
+    def send_transaction(self, params: dict) -> dict:
+        transaction = params["transaction"]
+        party_id = params["publicKey"]
+        if self._on_transaction is not None:
+            self._on_transaction(party_id, transaction)
+
+        batch = transaction.get("batchMarketInstructions", {})
+        self.transactions_received += 1
+        self.instructions_received += sum(len(v) for v in batch.values())
+
+        if self.config.wallet_latency_seconds:
+            time.sleep(self.config.wallet_latency_seconds)
+        tx_hash = self.exchange.apply_batch(party_id, batch)
+        return {
+            "receivedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "transactionHash": tx_hash,
+            "transaction": transaction,
+        }
+
+
+def _make_handler(server: SimulatorServer) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(format % args)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+
+            if (
+                url.path in _STREAMS
+                and "websocket" in self.headers.get("Upgrade", "").lower()
+            ):
+                self._stream(_STREAMS[url.path], _stream_filters(query))
+            elif url.path in _REST_COLLECTIONS:
+                key, fetch = _REST_COLLECTIONS[url.path]
+                filters = {
+                    _REST_FILTERS[name]: values[0]
+                    for name, values in query.items()
+                    if name in _REST_FILTERS
+                }
+                with server.exchange._lock:
+                    nodes = [
+                        n for n in fetch(server.exchange) if _rest_match(n, filters)
+                    ]
+                self._send_json(_paginate(key, nodes, query))
+            elif url.path == "/status":
+                self._send_json(
+                    {
+                        "result": {
+                            "sync_info": {
+                                "latest_block_height": str(server.block_height)
+                            }
+                        }
+                    }
+                )
+            elif url.path == "/tx":
+                # Every transaction applied by the simulator is accepted
+                tx_hash = query.get("hash", [""])[0]
+                self._send_json(
+                    {"result": {"hash": tx_hash, "tx_result": {"code": 0, "info": ""}}}
+                )
+            else:
+                self._send_json({"error": f"Unknown path {url.path}"}, status=404)
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if urlparse(self.path).path == "/" and isinstance(request, list):
+                # Batched Tendermint JSON-RPC `tx` lookups, every transaction
+                # applied by the simulator is accepted
+                self._send_json(
+                    [
+                        {
+                            "jsonrpc": "2.0",
+                            "id": call.get("id"),
+                            "result": {
+                                "hash": base64.b64decode(call["params"]["hash"])
+                                .hex()
+                                .upper(),
+                                "tx_result": {"code": 0, "info": ""},
+                            },
+                        }
+                        for call in request
+                    ]
+                )
+            elif urlparse(self.path).path != "/api/v2/requests":
+                self._send_json({"error": "Unknown path"}, status=404)
+            elif request.get("method") != "client.send_transaction":
+                self._send_json(
+                    {
+                        "jsonrpc": "2.0",
+                        "id": request.get("id"),
+                        "error": {"code": -32601, "message": "Method not found"},
+                    }
+                )
+            else:
+                result = server.send_transaction(request["params"])
+                self._send_json(
+                    {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+                )
+
+        def _send_json(self, body: Any, status: int = 200) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, channel: str, filters: dict) -> None:
+            accept = base64.b64encode(
+                hashlib.sha1(
+                    (self.headers["Sec-WebSocket-Key"] + _WEBSOCKET_GUID).encode()
+                ).digest()
+            ).decode()
+            self.send_response(101, "Switching Protocols")
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+
+            messages: queue.SimpleQueue = queue.SimpleQueue()
+            unsubscribe = server.exchange.subscribe(
+                channel, filters, lambda result: messages.put(result)
+            )
+            self.connection.settimeout(None)
+            epoch = server._stream_epoch
+            try:
+                while not server._stopped.is_set() and epoch == server._stream_epoch:
+                    try:
+                        result = messages.get(timeout=1)
+                    except queue.Empty:
+                        continue
+                    if server.config.stream_latency_seconds:
+                        time.sleep(server.config.stream_latency_seconds)
+                    self.wfile.write(_text_frame(json.dumps({"result": result})))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, socket.timeout):
+                pass
+            finally:
+                unsubscribe()
+                self.close_connection = True
+
+    return Handler
+
+
+def _text_frame(text: str) -> bytes:
+    payload = text.encode()
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x81, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x81, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x81, 127, length)
+    return header + payload
+
+
+def _stream_filters(query: dict[str, list[str]]) -> dict:
+    filters = {}
+    if "marketIds" in query:
+        filters["marketIds"] = set(query["marketIds"])
+    for name in ("marketId", "partyId"):
+        if name in query:
+            filters[name] = query[name][0]
+    return filters
+
+
+def _rest_match(node: dict, filters: dict) -> bool:
+    party_id = filters.get("partyId")
+    return not party_id or node.get("partyId", node.get("owner")) == party_id
+
+
+def _paginate(key: str, nodes: list[dict], query: dict[str, list[str]]) -> dict:
+    start = int(query.get("pagination.after", ["0"])[0] or 0)
+    page_size = int(query.get("pagination.first", [len(nodes) or 1])[0])
+    end = start + page_size
+    return {
+        key: {
+            "edges": [
+                {"node": node, "cursor": str(i)}
+                for i, node in enumerate(nodes[start:end], start=start)
+            ],
+            "pageInfo": {"hasNextPage": end < len(nodes), "endCursor": str(end)},
+        }
+    }
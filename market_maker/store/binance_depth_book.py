@@ -0,0 +1,189 @@
+"""
+Local copy of a Binance spot order book, maintained with Binance's diff depth
+protocol, along with fair prices derived from it.
+
+Diff events are buffered until a REST snapshot has been applied. Events
+wholly older than the snapshot's `lastUpdateId` are dropped. The first one
+applied must span `lastUpdateId + 1`, and each after that must start at the
+previous event's final update ID plus one. Any break in that chain marks the
+book unsynced until a fresh snapshot is applied.
+
+See https://binance-docs.github.io/apidocs/spot/en/#how-to-manage-a-local-order-book-correctly
+"""
+
+import logging
+from bisect import bisect_left, insort
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Diff events held while waiting for a snapshot
+MAX_BUFFERED_EVENTS = 10_000
+
+
+class BinanceDepthBook:
+    def __init__(self, symbol: str, levels: int = 10, vwap_notional: float = 10_000):
+        """Sorted price levels for one symbol plus fair prices recomputed on
+        each applied event.
+
+        Only the websocket thread updates a book, and the derived prices are
+        published to readers through the `ReferencePrice` built from them.
+
+        Args:
+            symbol:
+                str, Binance symbol of the book
+            levels:
+                int, number of levels each side used for the weighted mid
+            vwap_notional:
+                float, quote currency notional to walk each side of the book
+                for the VWAP mid
+        """
+        self.symbol = symbol
+        self.synced = False
+        self.last_update_id = 0
+
+        self._levels = levels
+        self._vwap_notional = vwap_notional
+
+        # Prices on each side sorted ascending, alongside their quantities
+        self._bid_prices: list[float] = []
+        self._ask_prices: list[float] = []
+        self._bids: dict[float, float] = {}
+        self._asks: dict[float, float] = {}
+        self._buffered: list[dict] = []
+
+        self.microprice: Optional[float] = None
+        self.weighted_mid: Optional[float] = None
+        self.vwap_mid: Optional[float] = None
+
+    @property
+    def best_bid(self) -> Optional[tuple[float, float]]:
+        if not self._bid_prices:
+            return None
+        price = self._bid_prices[-1]
+        return price, self._bids[price]
+
+    @property
+    def best_ask(self) -> Optional[tuple[float, float]]:
+        if not self._ask_prices:
+            return None
+        price = self._ask_prices[0]
+        return price, self._asks[price]
+
+    def apply_snapshot(self, snapshot: dict) -> bool:
+        """Replaces the book with a REST depth snapshot and applies any diffs
+        buffered in the meantime. Returns whether the book is synced after.
+        """
+        self._bids = {float(p): float(q) for p, q in snapshot["bids"] if float(q)}
+        self._asks = {float(p): float(q) for p, q in snapshot["asks"] if float(q)}
+        self._bid_prices = sorted(self._bids)
+        self._ask_prices = sorted(self._asks)
+        self.last_update_id = int(snapshot["lastUpdateId"])
+        self.synced = True
+
+        buffered, self._buffered = self._buffered, []
+        for event in buffered:
+            self._apply(event)
+        if self.synced:
+            self._recompute()
+        return self.synced
+
+    def apply_diff(self, event: dict) -> bool:
+        """Applies a `depthUpdate` event.
+
+        Returns False if the event revealed a gap, meaning a new snapshot is
+        needed. Events received while unsynced are buffered.
+        """
+        was_synced = self.synced
+        applied = self._apply(event)
+        if applied:
+            self._recompute()
+        return self.synced or not was_synced
+
+    def _apply(self, event: dict) -> bool:
+        if not self.synced:
+            if len(self._buffered) < MAX_BUFFERED_EVENTS:
+                self._buffered.append(event)
+            return False
+
+        first_id = int(event["U"])
+        final_id = int(event["u"])
+        if final_id <= self.last_update_id:
+            return False
+        if first_id > self.last_update_id + 1:
+            logger.warning(
+                f"Gap in {self.symbol} depth diffs, expected update "
+                f"{self.last_update_id + 1}, got {first_id}"
+            )
+            self.synced = False
+            self._buffered = [event]
+            return False
+
+        _apply_levels(self._bid_prices, self._bids, event["b"])
+        _apply_levels(self._ask_prices, self._asks, event["a"])
+        self.last_update_id = final_id
+        return True
+
+    def _recompute(self) -> None:
+        best_bid = self.best_bid
+        best_ask = self.best_ask
+        if best_bid is None or best_ask is None:
+            self.microprice = self.weighted_mid = self.vwap_mid = None
+            return
+
+        # Touch prices weighted towards the side with less size, which is the
+        # side more likely to be traded through next
+        (bid, bid_qty), (ask, ask_qty) = best_bid, best_ask
+        self.microprice = (bid * ask_qty + ask * bid_qty) / (bid_qty + ask_qty)
+
+        bid_vwap, bid_qty = self._top_levels_vwap(
+            reversed(self._bid_prices[-self._levels :]), self._bids
+        )
+        ask_vwap, ask_qty = self._top_levels_vwap(
+            self._ask_prices[: self._levels], self._asks
+        )
+        self.weighted_mid = (bid_vwap * ask_qty + ask_vwap * bid_qty) / (
+            bid_qty + ask_qty
+        )
+
+        self.vwap_mid = (
+            self._notional_vwap(reversed(self._bid_prices), self._bids)
+            + self._notional_vwap(self._ask_prices, self._asks)
+        ) / 2
+
+    @staticmethod
+    def _top_levels_vwap(prices, quantities: dict[float, float]) -> tuple[float, float]:
+        notional = total = 0.0
+        for price in prices:
+            quantity = quantities[price]
+            notional += price * quantity
+            total += quantity
+        return notional / total, total
+
+    def _notional_vwap(self, prices, quantities: dict[float, float]) -> float:
+        # Average price paid to trade `vwap_notional` against one side, or
+        # against the whole side if it is shallower than that
+        remaining = self._vwap_notional
+        notional = total = 0.0
+        for price in prices:
+            quantity = min(quantities[price], remaining / price)
+            notional += price * quantity
+            total += quantity
+            remaining -= price * quantity
+            if remaining <= 0:
+                break
+        return notional / total
+
+
+def _apply_levels(
+    prices: list[float], quantities: dict[float, float], levels: list[list[str]]
+) -> None:
+    for price, quantity in levels:
+        price = float(price)
+        quantity = float(quantity)
+        if quantity:
+            if price not in quantities:
+                insort(prices, price)
+            quantities[price] = quantity
+        elif quantities.pop(price, None) is not None:
+            del prices[bisect_left(prices, price)]
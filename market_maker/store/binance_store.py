@@ -1,15 +1,43 @@
+import logging
+import threading
+import time
+from collections import defaultdict
 from threading import Lock
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from binance import ThreadedWebsocketManager
 from binance.client import Client
 
 from market_maker.config import Config
+from market_maker.metrics import latency_metrics
 from market_maker.models import ReferencePrice
+from market_maker.replay.recorder import StreamRecorder
+from market_maker.store.binance_depth_book import BinanceDepthBook
+from market_maker.store.composite_prices import CompositePrice
+
+logger = logging.getLogger(__name__)
+
+# Delay before refetching a depth snapshot, growing with each failed attempt
+# up to the maximum
+RESYNC_DELAY_SECONDS = 0.5
+MAX_RESYNC_DELAY_SECONDS = 5.0
+
+
+def resync_delay(attempt: int) -> float:
+    """Seconds to wait after the given failed attempt to sync a depth book."""
+    return min(RESYNC_DELAY_SECONDS * (attempt + 1), MAX_RESYNC_DELAY_SECONDS)
 
 
 class BinanceStore:
-    def __init__(self, symbols_to_subscribe: list[str]):
+    def __init__(
+        self,
+        symbols_to_subscribe: list[str],
+        recorder: Optional[StreamRecorder] = None,
+        depth: bool = False,
+        depth_levels: int = 10,
+        vwap_notional: float = 10_000,
+        composites: Optional[dict[str, str]] = None,
+    ):
         """Runs a websocket client listening to a list of binance tickers
         and storing their latest best bid/ask prices to be consumed later.
 
@@ -18,48 +46,257 @@ class BinanceStore:
         Args:
             symbols_to_subscribe:
                 list[str], list of binance symbols to which to listen
+            recorder:
+                Optional[StreamRecorder], if set every raw tick is recorded
+            depth:
+                bool, if set a local order book is kept for each symbol from
+                the diff depth stream in place of the best bid/ask stream, and
+                reference prices also carry the microprice, weighted mid and
+                VWAP mid
+            depth_levels:
+                int, levels each side used for the weighted mid in depth mode
+            vwap_notional:
+                float, quote notional walked each side for the VWAP mid in
+                depth mode
+            composites:
+                Optional[dict[str, str]], names of derived reference prices
+                mapped to their expressions over Binance symbols, see
+                `composite_prices`. Their inputs are subscribed to as well,
+                and each is recomputed only when one of its inputs ticks
         """
         self._ws_client = ThreadedWebsocketManager()
-        self._client = Client()
+        # Created on start, as the REST client contacts Binance on creation
+        self._client: Optional[Client] = None
+        self._recorder = recorder
+
+        self._composites = [
+            CompositePrice(name, expression)
+            for name, expression in (composites or {}).items()
+        ]
+        self._composites_by_name = {c.name: c for c in self._composites}
+        # Maps each symbol to the composites built from it
+        self._dependents: dict[str, list[CompositePrice]] = defaultdict(list)
+        for composite in self._composites:
+            for symbol in composite.inputs:
+                self._dependents[symbol].append(composite)
 
-        self._symbols = symbols_to_subscribe
+        self._symbols = list(
+            dict.fromkeys(
+                symbols_to_subscribe + [s for c in self._composites for s in c.inputs]
+            )
+        )
         self._lock = Lock()
 
         # Elements in a list to allow atomic updates and avoid locks
         self._reference_prices = {}
+        self._tick_listeners: dict[str, list[Callable[[ReferencePrice], Any]]] = (
+            defaultdict(list)
+        )
+
+        self._depth = depth
+        self._depth_books = {
+            symbol: BinanceDepthBook(
+                symbol, levels=depth_levels, vwap_notional=vwap_notional
+            )
+            for symbol in (self._symbols if depth else [])
+        }
+        self._resyncing: set[str] = set()
+        self._resync_handler: Optional[Callable[[BinanceDepthBook], Any]] = None
+        self._stopped = threading.Event()
+
+    @property
+    def symbols(self) -> list[str]:
+        """Binance symbols followed, including the inputs of composites."""
+        return list(self._symbols)
+
+    @property
+    def depth(self) -> bool:
+        """Whether depth books are kept, fed by `on_depth`, rather than the
+        best bid/ask fed by `on_tick`.
+        """
+        return self._depth
+
+    def is_synced(self, symbol: str) -> bool:
+        """Whether the depth books behind a symbol or composite are all
+        synced. Always True when depth books are not kept.
+        """
+        composite = self._composites_by_name.get(symbol)
+        for input_symbol in composite.inputs if composite else (symbol,):
+            book = self._depth_books.get(input_symbol)
+            if book is not None and not book.synced:
+                return False
+        return True
+
+    def set_resync_handler(self, handler: Callable[[BinanceDepthBook], Any]) -> None:
+        """Replaces the thread which fetches a REST snapshot to resync a depth
+        book, for runtimes driving the streams themselves. The handler must
+        apply the snapshot with `apply_depth_snapshot` and then call
+        `resync_finished`.
+        """
+        self._resync_handler = handler
+
+    def resync_depth_books(self) -> None:
+        """Resyncs every depth book from a REST snapshot, once the depth
+        stream is running.
+        """
+        for book in self._depth_books.values():
+            self._resync(book)
 
     def start(self) -> None:
         """Start the websocket client, listening to passed symbols
         and storing their market data on each tick to be read on demand
         by trader.
         """
+        self._client = Client()
         for symb in self._symbols:
             ticker = self._client.get_orderbook_ticker(symbol=symb)
-            self._reference_prices[ticker["symbol"]] = ReferencePrice(
-                symbol=ticker["symbol"],
-                bid_price=float(ticker["bidPrice"]),
-                ask_price=float(ticker["askPrice"]),
+            self.publish(
+                ReferencePrice(
+                    symbol=ticker["symbol"],
+                    bid_price=float(ticker["bidPrice"]),
+                    ask_price=float(ticker["askPrice"]),
+                    received_at=time.perf_counter_ns(),
+                )
             )
 
         self._ws_client.start()
+        if not self._depth:
+            self._ws_client.start_multiplex_socket(
+                callback=self.on_tick,
+                streams=[f"{symb.lower()}@bookTicker" for symb in self._symbols],
+            )
+            return
+
+        # Diffs are buffered by the books until their snapshots arrive, so the
+        # stream is started first to not miss any between the two
         self._ws_client.start_multiplex_socket(
-            callback=self._on_tick,
-            streams=[f"{symb.lower()}@bookTicker" for symb in self._symbols],
+            callback=self.on_depth,
+            streams=[f"{symb.lower()}@depth@100ms" for symb in self._symbols],
         )
+        self.resync_depth_books()
 
     def stop(self) -> None:
         """Stops the websocket client"""
+        self._stopped.set()
         self._ws_client.stop()
 
-    def _on_tick(self, tick: dict[str, Any]) -> None:
+    def on_tick(self, tick: dict[str, Any]) -> None:
+        """Handles a `@bookTicker` stream message."""
+        received_at = time.perf_counter_ns()
+        if self._recorder is not None:
+            self._recorder.record("binance", "bookTicker", tick)
+
         tick_data = tick["data"]
-        ref_price = ReferencePrice(
-            symbol=tick_data["s"],
-            bid_price=float(tick_data["b"]),
-            ask_price=float(tick_data["a"]),
+        self.publish(
+            ReferencePrice(
+                symbol=tick_data["s"],
+                bid_price=float(tick_data["b"]),
+                ask_price=float(tick_data["a"]),
+                received_at=received_at,
+            )
         )
+
+    def on_depth(self, tick: dict[str, Any]) -> None:
+        """Handles a `@depth` stream message, resyncing the book on a gap or
+        whenever it is unsynced with no resync running.
+        """
+        received_at = time.perf_counter_ns()
+        if self._recorder is not None:
+            self._recorder.record("binance", "depth", tick)
+
+        event = tick["data"]
+        book = self._depth_books.get(event["s"])
+        if book is None:
+            return
+        with self._lock:
+            in_sync = book.apply_diff(event) and book.synced
+            ref_price = _book_reference_price(book, received_at)
+        if not in_sync:
+            self._resync(book)
+        elif ref_price is not None:
+            self.publish(ref_price)
+
+    def _resync(self, book: BinanceDepthBook) -> None:
+        with self._lock:
+            if book.symbol in self._resyncing:
+                return
+            self._resyncing.add(book.symbol)
+        if self._resync_handler is not None:
+            self._resync_handler(book)
+            return
+        threading.Thread(target=self._fetch_snapshot, args=(book,), daemon=True).start()
+
+    def resync_finished(self, symbol: str) -> None:
+        """Allows the book to be resynced again after a gap."""
+        with self._lock:
+            self._resyncing.discard(symbol)
+
+    def _fetch_snapshot(self, book: BinanceDepthBook) -> None:
+        # A snapshot older than the buffered diffs leaves the book unsynced, in
+        # which case a later one is needed. Strategies do not quote off the
+        # book until then, so attempts continue until it syncs.
+        attempt = 0
+        try:
+            while not self._stopped.is_set():
+                try:
+                    snapshot = self._client.get_order_book(
+                        symbol=book.symbol, limit=1000
+                    )
+                    if self.apply_depth_snapshot(
+                        {"s": book.symbol, "snapshot": snapshot}
+                    ):
+                        return
+                    logger.warning(f"Snapshot of {book.symbol} depth book is stale")
+                except Exception:
+                    logger.exception(f"Failed to fetch {book.symbol} depth snapshot")
+                self._stopped.wait(resync_delay(attempt))
+                attempt += 1
+        finally:
+            self.resync_finished(book.symbol)
+
+    def apply_depth_snapshot(self, message: dict[str, Any]) -> bool:
+        """Applies a REST depth snapshot, returning whether the book is synced."""
+        received_at = time.perf_counter_ns()
+        if self._recorder is not None:
+            # Recorded so that depth books can be rebuilt on replay
+            self._recorder.record("binance", "depth_snapshot", message)
+
+        book = self._depth_books.get(message["s"])
+        if book is None:
+            return False
+        with self._lock:
+            synced = book.apply_snapshot(message["snapshot"])
+            ref_price = _book_reference_price(book, received_at)
+        if ref_price is not None:
+            self.publish(ref_price)
+        return synced
+
+    def publish(self, ref_price: ReferencePrice) -> None:
+        """Stores a reference price, updates the composites built from it and
+        runs the tick listeners.
+        """
+        updated = [ref_price]
         with self._lock:
             self._reference_prices[ref_price.symbol] = ref_price
+            for composite in self._dependents.get(ref_price.symbol, ()):
+                composite_price = composite.update(ref_price)
+                if composite_price is not None:
+                    self._reference_prices[composite.name] = composite_price
+                    updated.append(composite_price)
+
+        for price in updated:
+            for listener in self._tick_listeners.get(price.symbol, ()):
+                listener(price)
+        latency_metrics.record_since("tick_handling", ref_price.received_at)
+
+    def add_tick_listener(
+        self, symbol: str, callback: Callable[[ReferencePrice], Any]
+    ) -> None:
+        """Registers a callback to be run on the websocket thread with each
+        new reference price for the given symbol. Callbacks should be cheap
+        and hand off any real work to another thread.
+        """
+        self._tick_listeners[symbol].append(callback)
 
     def get_reference_prices(self) -> list[ReferencePrice]:
         with self._lock:
@@ -68,3 +305,21 @@ class BinanceStore:
     def get_reference_price_by_symbol(self, symbol: str) -> Optional[ReferencePrice]:
         with self._lock:
             return self._reference_prices[symbol]
+
+
+def _book_reference_price(
+    book: BinanceDepthBook, received_at: int
+) -> Optional[ReferencePrice]:
+    best_bid = book.best_bid
+    best_ask = book.best_ask
+    if not book.synced or best_bid is None or best_ask is None:
+        return None
+    return ReferencePrice(
+        symbol=book.symbol,
+        bid_price=best_bid[0],
+        ask_price=best_ask[0],
+        received_at=received_at,
+        microprice=book.microprice,
+        weighted_mid=book.weighted_mid,
+        vwap_mid=book.vwap_mid,
+    )
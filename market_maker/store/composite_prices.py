@@ -0,0 +1,103 @@
+"""
+Reference prices derived from several Binance symbols, for Vega markets with
+no directly matching Binance symbol.
+
+A composite is defined by an expression which is a sum of terms, each a
+product of numeric weights and symbols joined by `*` and `/`, for example
+`ETHUSDT/BTCUSDT` for a cross rate, `BTCUSDT*EURUSDT` for a product, or
+`0.6*BTCUSDT+0.4*ETHUSDT` for a weighted basket.
+
+Bids and asks are combined conservatively: the composite bid is what the
+composite could be sold for by trading each input, so a symbol divided by is
+taken at its ask, and a negatively weighted term swaps its bid and ask.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from market_maker.models import ReferencePrice
+
+_OPERATORS = re.compile(r"([*/])")
+
+
+@dataclass(frozen=True)
+class Term:
+    weight: float
+    # (symbol, 1 to multiply or -1 to divide)
+    factors: tuple[tuple[str, int], ...]
+
+
+def parse_expression(expression: str) -> list[Term]:
+    terms = []
+    for term_text in expression.split("+"):
+        weight = 1.0
+        factors = []
+        operator = "*"
+        for token in _OPERATORS.split(term_text):
+            token = token.strip()
+            if token in ("*", "/"):
+                operator = token
+                continue
+            if not token:
+                raise ValueError(f"Malformed reference price expression {expression}")
+            try:
+                value = float(token)
+            except ValueError:
+                factors.append((token, 1 if operator == "*" else -1))
+            else:
+                weight = weight * value if operator == "*" else weight / value
+        if not factors:
+            raise ValueError(f"Term without a symbol in {expression}")
+        terms.append(Term(weight=weight, factors=tuple(factors)))
+    return terms
+
+
+class CompositePrice:
+    def __init__(self, name: str, expression: str):
+        """A reference price computed from the latest prices of its inputs.
+
+        Args:
+            name:
+                str, symbol the composite is published under
+            expression:
+                str, definition in terms of Binance symbols, see module docs
+        """
+        self.name = name
+        self.terms = parse_expression(expression)
+        self.inputs = sorted({s for term in self.terms for s, _ in term.factors})
+        self._latest: dict[str, ReferencePrice] = {}
+
+    def update(self, reference_price: ReferencePrice) -> Optional[ReferencePrice]:
+        """Records a new price for one input and returns the recomputed
+        composite, or None until every input has been seen.
+        """
+        self._latest[reference_price.symbol] = reference_price
+        if len(self._latest) < len(self.inputs):
+            return None
+
+        bid = ask = 0.0
+        for term in self.terms:
+            term_bid = term_ask = term.weight
+            for symbol, exponent in term.factors:
+                price = self._latest[symbol]
+                if exponent > 0:
+                    term_bid *= price.bid_price
+                    term_ask *= price.ask_price
+                else:
+                    term_bid /= price.ask_price
+                    term_ask /= price.bid_price
+            if term.weight < 0:
+                term_bid, term_ask = term_ask, term_bid
+            bid += term_bid
+            ask += term_ask
+
+        return ReferencePrice(
+            symbol=self.name,
+            bid_price=bid,
+            ask_price=ask,
+            received_at=reference_price.received_at,
+            inputs_received_at={
+                symbol: price.received_at for symbol, price in self._latest.items()
+            },
+        )
@@ -0,0 +1,95 @@
+"""
+Secondary indexes over the store's orders and accounts, maintained as updates
+are applied rather than recomputed by every reader.
+
+The indexes live inside the store's immutable state, so updates never modify
+a published index. They are held in the persistent collections from
+`persistent`, and the functions here return updated indexes which share all
+but the changed path with the originals, so each update is O(log n) in the
+orders or accounts held. Orders in each book are kept sorted by price.
+"""
+
+from typing import Iterable, Optional
+
+from market_maker.models import Account, Order
+from market_maker.store.persistent import PersistentMap, PersistentSortedList
+
+# (market ID, side)
+BookKey = tuple[str, str]
+# (party ID, asset ID)
+BalanceKey = tuple[str, str]
+
+
+def _sort_key(order: Order) -> tuple[int, str]:
+    # Order ID breaks ties so each order has exactly one position
+    return order.price, order.order_id
+
+
+def index_orders(
+    orders: Iterable[Order],
+) -> tuple[PersistentMap, PersistentMap]:
+    """Builds the orders by (market, side) as `PersistentSortedList`s sorted
+    by price, and the total remaining size resting on each (market, side).
+    """
+    books: dict[BookKey, list[Order]] = {}
+    volumes: dict[BookKey, int] = {}
+    for order in orders:
+        key = (order.market_id, order.side)
+        books.setdefault(key, []).append(order)
+        volumes[key] = volumes.get(key, 0) + order.remaining_size
+    return PersistentMap(
+        (key, PersistentSortedList(book, key=_sort_key)) for key, book in books.items()
+    ), PersistentMap(volumes)
+
+
+def update_order(
+    books: PersistentMap,
+    volumes: PersistentMap,
+    previous: Optional[Order],
+    order: Optional[Order],
+) -> tuple[PersistentMap, PersistentMap]:
+    """Returns the indexes with `previous` replaced by `order`. Either may be
+    None for orders which are new or no longer live.
+    """
+    if previous is not None:
+        key = (previous.market_id, previous.side)
+        book = books.get(key)
+        if book is not None:
+            remaining = book.remove(previous)
+            if remaining is not book:
+                if len(remaining) == 0:
+                    books = books.delete(key)
+                    volumes = volumes.delete(key)
+                else:
+                    books = books.set(key, remaining)
+                    volumes = volumes.set(key, volumes[key] - previous.remaining_size)
+
+    if order is not None:
+        key = (order.market_id, order.side)
+        book = books.get(key)
+        if book is None:
+            book = PersistentSortedList(key=_sort_key)
+        books = books.set(key, book.insert(order))
+        volumes = volumes.set(key, volumes.get(key, 0) + order.remaining_size)
+    return books, volumes
+
+
+def index_balances(accounts: Iterable[Account]) -> PersistentMap:
+    """Sums the balance of every account held by each party in each asset."""
+    balances: dict[BalanceKey, int] = {}
+    for account in accounts:
+        key = (account.owner, account.asset_id)
+        balances[key] = balances.get(key, 0) + account.balance
+    return PersistentMap(balances)
+
+
+def update_account(
+    balances: PersistentMap, previous: Optional[Account], account: Account
+) -> PersistentMap:
+    key = (account.owner, account.asset_id)
+    return balances.set(
+        key,
+        balances.get(key, 0)
+        + account.balance
+        - (previous.balance if previous is not None else 0),
+    )
@@ -0,0 +1,159 @@
+"""
+Price level order book for a Vega market, built from the data node's market
+depth snapshot and update streams.
+
+Every update carries its own and the previous sequence number. Updates are
+applied only when they follow on from the book's current sequence number, so
+a missed update is detected as a gap. The book then stops serving updates and
+buffers them until a newer snapshot arrives, after which any buffered updates
+which follow on from the snapshot are applied.
+"""
+
+import logging
+from bisect import bisect_left, bisect_right, insort
+from threading import Lock
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+BUY = "SIDE_BUY"
+SELL = "SIDE_SELL"
+
+# Updates held while waiting for a snapshot after a gap
+MAX_BUFFERED_UPDATES = 10_000
+
+
+class OrderBook:
+    def __init__(self, market_id: str):
+        """Aggregated volume at each price level on both sides of a market, in
+        the market's native price and position units.
+
+        The book is updated from the websocket thread and queried from
+        strategy threads, so every method takes the book's lock briefly.
+        """
+        self.market_id = market_id
+        self.sequence_number = 0
+        # False until the first snapshot and after a gap, until resynced
+        self.synced = False
+
+        self._lock = Lock()
+        # Prices on each side are kept sorted ascending alongside their volumes
+        self._prices: dict[str, list[int]] = {BUY: [], SELL: []}
+        self._volumes: dict[str, dict[int, int]] = {BUY: {}, SELL: {}}
+        self._buffered: list[dict] = []
+
+    def apply_snapshot(self, depth: dict) -> bool:
+        """Replaces the book with a full depth snapshot, unless the book is
+        already synced past it, then applies any updates buffered since a gap.
+
+        Returns whether the book is synced afterwards.
+        """
+        sequence_number = int(depth["sequenceNumber"])
+        with self._lock:
+            if self.synced and sequence_number <= self.sequence_number:
+                return True
+
+            for side, levels in ((BUY, depth.get("buy")), (SELL, depth.get("sell"))):
+                volumes = {
+                    int(level["price"]): int(level["volume"])
+                    for level in levels or []
+                    if int(level["volume"])
+                }
+                self._volumes[side] = volumes
+                self._prices[side] = sorted(volumes)
+            self.sequence_number = sequence_number
+            self.synced = True
+
+            buffered, self._buffered = self._buffered, []
+            for update in buffered:
+                self._apply_update(update)
+            return self.synced
+
+    def apply_update(self, update: dict) -> bool:
+        """Applies an incremental depth update.
+
+        Returns False if the update revealed a gap in the sequence, in which
+        case the book needs a new snapshot before it is usable again.
+        """
+        with self._lock:
+            was_synced = self.synced
+            self._apply_update(update)
+            return self.synced or not was_synced
+
+    def _apply_update(self, update: dict) -> None:
+        if not self.synced:
+            if len(self._buffered) < MAX_BUFFERED_UPDATES:
+                self._buffered.append(update)
+            return
+
+        sequence_number = int(update["sequenceNumber"])
+        if sequence_number <= self.sequence_number:
+            # Already reflected in the snapshot
+            return
+        if int(update["previousSequenceNumber"]) != self.sequence_number:
+            logger.warning(
+                f"Gap in depth updates for {self.market_id}, expected previous "
+                f"sequence {self.sequence_number}, got "
+                f"{update['previousSequenceNumber']}"
+            )
+            self.synced = False
+            self._buffered = [update]
+            return
+
+        for side, levels in ((BUY, update.get("buy")), (SELL, update.get("sell"))):
+            prices = self._prices[side]
+            volumes = self._volumes[side]
+            for level in levels or []:
+                price = int(level["price"])
+                volume = int(level["volume"])
+                if volume:
+                    if price not in volumes:
+                        insort(prices, price)
+                    volumes[price] = volume
+                elif volumes.pop(price, None) is not None:
+                    del prices[bisect_left(prices, price)]
+        self.sequence_number = sequence_number
+
+    def best(self, side: str) -> Optional[tuple[int, int]]:
+        """Returns the best `(price, volume)` on a side, None if it is empty."""
+        with self._lock:
+            prices = self._prices[side]
+            if not prices:
+                return None
+            price = prices[-1] if side == BUY else prices[0]
+            return price, self._volumes[side][price]
+
+    def levels(self, side: str, depth: Optional[int] = None) -> list[tuple[int, int]]:
+        """Returns `(price, volume)` levels on a side, best first."""
+        with self._lock:
+            prices = self._prices[side]
+            volumes = self._volumes[side]
+            if side == BUY:
+                selected = prices[::-1] if depth is None else prices[: -depth - 1 : -1]
+            else:
+                selected = prices if depth is None else prices[:depth]
+            return [(price, volumes[price]) for price in selected]
+
+    def volume_at(self, side: str, price: int) -> int:
+        with self._lock:
+            return self._volumes[side].get(price, 0)
+
+    def cumulative_volume(self, side: str, price: int) -> int:
+        """Total volume on a side from the best price up to and including
+        `price`, which is the volume ahead of a new order at that price.
+        """
+        with self._lock:
+            prices = self._prices[side]
+            volumes = self._volumes[side]
+            if side == BUY:
+                selected = prices[bisect_left(prices, price) :]
+            else:
+                selected = prices[: bisect_right(prices, price)]
+            return sum(volumes[p] for p in selected)
+
+    def share_of_level(self, side: str, price: int, own_volume: int) -> float:
+        """Fraction of the volume at a price level made up by `own_volume`."""
+        level_volume = self.volume_at(side, price)
+        if level_volume == 0:
+            return 0
+        return min(own_volume / level_volume, 1)
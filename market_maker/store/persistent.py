@@ -0,0 +1,370 @@
+"""
+Persistent collections for the store's published state.
+
+Updating one returns a new collection and leaves the original untouched,
+sharing everything but the path to the changed entry, so an update costs
+O(log n) rather than the O(n) of copying a dict or tuple. Readers of an old
+state keep seeing it exactly as it was.
+
+`PersistentMap` is a hash array mapped trie, with a dict of up to 32
+children at each level keyed by the next five bits of the key's hash.
+`PersistentSortedList` is a treap, a binary search tree kept balanced in
+expectation by random priorities, with nodes copied along the update path.
+"""
+
+import random
+from collections.abc import Mapping
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_MASK = (1 << 64) - 1
+
+# Returned when a key to delete is not present, so nothing is copied
+_MISSING = object()
+
+
+class _Collision:
+    """Entries whose keys have the same full hash."""
+
+    __slots__ = ("hash", "entries")
+
+    def __init__(self, hash_: int, entries: dict):
+        self.hash = hash_
+        self.entries = entries
+
+
+# A trie node is a dict of child index to either another node, an entry
+# tuple of (hash, key, value) or a `_Collision`
+
+
+def _hash(key: Any) -> int:
+    return hash(key) & _HASH_MASK
+
+
+def _child_hash(child) -> int:
+    return child.hash if type(child) is _Collision else child[0]
+
+
+def _pair(shift: int, first, second) -> dict:
+    # Two children with different hashes which fell into the same slot
+    first_idx = (_child_hash(first) >> shift) & _MASK
+    second_idx = (_child_hash(second) >> shift) & _MASK
+    if first_idx != second_idx:
+        return {first_idx: first, second_idx: second}
+    return {first_idx: _pair(shift + _BITS, first, second)}
+
+
+def _set(node: dict, shift: int, hash_: int, key, value) -> tuple[dict, bool]:
+    idx = (hash_ >> shift) & _MASK
+    child = node.get(idx)
+    new = dict(node)
+    if child is None:
+        new[idx] = (hash_, key, value)
+        return new, True
+    child_type = type(child)
+    if child_type is tuple:
+        if child[0] == hash_ and child[1] == key:
+            new[idx] = (hash_, key, value)
+            return new, False
+        if child[0] == hash_:
+            new[idx] = _Collision(hash_, {child[1]: child[2], key: value})
+        else:
+            new[idx] = _pair(shift + _BITS, child, (hash_, key, value))
+        return new, True
+    if child_type is _Collision:
+        if child.hash == hash_:
+            added = key not in child.entries
+            new[idx] = _Collision(hash_, {**child.entries, key: value})
+            return new, added
+        new[idx] = _pair(shift + _BITS, child, (hash_, key, value))
+        return new, True
+    new[idx], added = _set(child, shift + _BITS, hash_, key, value)
+    return new, added
+
+
+def _delete(node: dict, shift: int, hash_: int, key, root: bool):
+    idx = (hash_ >> shift) & _MASK
+    child = node.get(idx)
+    if child is None:
+        return _MISSING
+    child_type = type(child)
+    if child_type is tuple:
+        if child[0] != hash_ or child[1] != key:
+            return _MISSING
+        replacement = None
+    elif child_type is _Collision:
+        if child.hash != hash_ or key not in child.entries:
+            return _MISSING
+        entries = {k: v for k, v in child.entries.items() if k != key}
+        replacement = (
+            _Collision(hash_, entries)
+            if len(entries) > 1
+            else (hash_, *next(iter(entries.items())))
+        )
+    else:
+        replacement = _delete(child, shift + _BITS, hash_, key, root=False)
+        if replacement is _MISSING:
+            return _MISSING
+
+    new = dict(node)
+    if replacement is None:
+        del new[idx]
+    else:
+        new[idx] = replacement
+    if not root:
+        # A node left holding a single entry is replaced by the entry
+        if not new:
+            return None
+        if len(new) == 1:
+            (only,) = new.values()
+            if type(only) is not dict:
+                return only
+    return new
+
+
+def _iter_entries(node: dict) -> Iterator[tuple[Any, Any]]:
+    for child in node.values():
+        child_type = type(child)
+        if child_type is tuple:
+            yield child[1], child[2]
+        elif child_type is _Collision:
+            yield from child.entries.items()
+        else:
+            yield from _iter_entries(child)
+
+
+class PersistentMap(Mapping):
+    """An immutable mapping whose `set` and `delete` return updated copies in
+    O(log n), sharing structure with the original.
+    """
+
+    __slots__ = ("_root", "_len")
+
+    def __init__(self, items: Optional[Any] = None):
+        self._root: dict = {}
+        self._len = 0
+        if items:
+            pairs = items.items() if isinstance(items, Mapping) else items
+            for key, value in pairs:
+                self._root, added = _set(self._root, 0, _hash(key), key, value)
+                self._len += added
+
+    @classmethod
+    def _from(cls, root: dict, length: int) -> "PersistentMap":
+        new = cls.__new__(cls)
+        new._root = root
+        new._len = length
+        return new
+
+    def set(self, key, value) -> "PersistentMap":
+        root, added = _set(self._root, 0, _hash(key), key, value)
+        return PersistentMap._from(root, self._len + added)
+
+    def delete(self, key) -> "PersistentMap":
+        """A copy without `key`, or this map if it does not hold it."""
+        root = _delete(self._root, 0, _hash(key), key, root=True)
+        if root is _MISSING:
+            return self
+        return PersistentMap._from(root, self._len - 1)
+
+    def __getitem__(self, key):
+        hash_ = _hash(key)
+        node = self._root
+        shift = 0
+        while True:
+            child = node.get((hash_ >> shift) & _MASK)
+            child_type = type(child)
+            if child_type is dict:
+                node = child
+                shift += _BITS
+            elif child_type is tuple:
+                if child[0] == hash_ and child[1] == key:
+                    return child[2]
+                raise KeyError(key)
+            elif child_type is _Collision and child.hash == hash_:
+                return child.entries[key]
+            else:
+                raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator:
+        return (key for key, _ in _iter_entries(self._root))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def items(self):
+        return list(_iter_entries(self._root))
+
+    def values(self):
+        return [value for _, value in _iter_entries(self._root)]
+
+    def __repr__(self) -> str:
+        return f"PersistentMap({dict(_iter_entries(self._root))!r})"
+
+
+class _Node:
+    __slots__ = ("key", "item", "priority", "left", "right", "size")
+
+    def __init__(self, key, item, priority, left, right):
+        self.key = key
+        self.item = item
+        self.priority = priority
+        self.left = left
+        self.right = right
+        self.size = 1 + _size(left) + _size(right)
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node is not None else 0
+
+
+def _split(node: Optional[_Node], key) -> tuple[Optional[_Node], Optional[_Node]]:
+    # Nodes with keys below `key`, and the rest, copying only the path
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        return _Node(node.key, node.item, node.priority, node.left, left), right
+    left, right = _split(node.left, key)
+    return left, _Node(node.key, node.item, node.priority, right, node.right)
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    # Every key in `left` is below every key in `right`
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        return _Node(
+            left.key, left.item, left.priority, left.left, _merge(left.right, right)
+        )
+    return _Node(
+        right.key, right.item, right.priority, _merge(left, right.left), right.right
+    )
+
+
+def _insert(node: Optional[_Node], key, item, priority: float) -> _Node:
+    if node is None or priority > node.priority:
+        left, right = _split(node, key)
+        return _Node(key, item, priority, left, right)
+    if key < node.key:
+        return _Node(
+            node.key,
+            node.item,
+            node.priority,
+            _insert(node.left, key, item, priority),
+            node.right,
+        )
+    return _Node(
+        node.key,
+        node.item,
+        node.priority,
+        node.left,
+        _insert(node.right, key, item, priority),
+    )
+
+
+def _remove(node: Optional[_Node], key):
+    if node is None:
+        return _MISSING
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        left = _remove(node.left, key)
+        if left is _MISSING:
+            return _MISSING
+        return _Node(node.key, node.item, node.priority, left, node.right)
+    right = _remove(node.right, key)
+    if right is _MISSING:
+        return _MISSING
+    return _Node(node.key, node.item, node.priority, node.left, right)
+
+
+class PersistentSortedList:
+    """An immutable sequence of items sorted by `key`, whose `insert` and
+    `remove` return updated copies in O(log n), sharing structure with the
+    original. Keys must be unique.
+    """
+
+    __slots__ = ("_root", "_key")
+
+    def __init__(self, items: Iterable = (), key: Callable[[Any], Any] = None):
+        self._key = key if key is not None else _identity
+        self._root: Optional[_Node] = None
+        for item in items:
+            self._root = _insert(self._root, self._key(item), item, random.random())
+
+    def _with_root(self, root: Optional[_Node]) -> "PersistentSortedList":
+        new = PersistentSortedList.__new__(PersistentSortedList)
+        new._root = root
+        new._key = self._key
+        return new
+
+    def insert(self, item) -> "PersistentSortedList":
+        return self._with_root(
+            _insert(self._root, self._key(item), item, random.random())
+        )
+
+    def remove(self, item) -> "PersistentSortedList":
+        """A copy without `item`, or this list if it does not hold it."""
+        root = _remove(self._root, self._key(item))
+        if root is _MISSING:
+            return self
+        return self._with_root(root)
+
+    def irange(self, minimum, maximum) -> Iterator:
+        """Items with keys from `minimum` up to but excluding `maximum`, in
+        order.
+        """
+        stack = []
+        node = self._root
+        while stack or node is not None:
+            if node is not None:
+                if node.key < minimum:
+                    node = node.right
+                    continue
+                stack.append(node)
+                node = node.left
+                continue
+            node = stack.pop()
+            if not node.key < maximum:
+                return
+            yield node.item
+            node = node.right
+
+    def __iter__(self) -> Iterator:
+        stack = []
+        node = self._root
+        while stack or node is not None:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+                continue
+            node = stack.pop()
+            yield node.item
+            node = node.right
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def __repr__(self) -> str:
+        return f"PersistentSortedList({list(self)!r})"
+
+
+def _identity(item):
+    return item
@@ -0,0 +1,94 @@
+"""
+Compact on-disk snapshots of store state, used to warm start after a restart.
+
+Models are stored as plain tuples of their field values alongside each model's
+field names, so a snapshot written by an older version of a model is detected
+and discarded rather than loaded into the wrong fields.
+"""
+
+import dataclasses
+import logging
+import os
+import pickle
+import tempfile
+import zlib
+from typing import Any, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+
+def _field_names(model: Type) -> tuple[str, ...]:
+    return tuple(f.name for f in dataclasses.fields(model) if f.init)
+
+
+def save_snapshot(path: str, collections: dict[str, tuple[Type, list[Any]]]) -> None:
+    """Atomically writes a snapshot of the given collections to `path`.
+
+    Args:
+        path:
+            str, file to write. A temporary file in the same directory is
+            written first and renamed over it, so readers never see a
+            partially written snapshot
+        collections:
+            dict, maps a collection name to its model class and items
+    """
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "collections": {
+            name: (
+                _field_names(model),
+                [
+                    tuple(getattr(item, field) for field in _field_names(model))
+                    for item in items
+                ],
+            )
+            for name, (model, items) in collections.items()
+        },
+    }
+    data = zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(path: str, models: dict[str, Type]) -> Optional[dict[str, list[Any]]]:
+    """Loads a snapshot written by `save_snapshot`.
+
+    Returns None if there is no snapshot, or it cannot be read or was written
+    for a different version of any of the models.
+    """
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.exception(f"Failed to read snapshot at {path}")
+        return None
+
+    if payload.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring snapshot at {path} with unknown version")
+        return None
+
+    collections = {}
+    for name, model in models.items():
+        if name not in payload["collections"]:
+            logger.warning(f"Ignoring snapshot at {path} missing {name}")
+            return None
+        field_names, rows = payload["collections"][name]
+        if tuple(field_names) != _field_names(model):
+            logger.warning(f"Ignoring snapshot at {path} with outdated {name}")
+            return None
+        collections[name] = [model(*row) for row in rows]
+    return collections
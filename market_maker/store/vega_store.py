@@ -1,222 +1,726 @@
+import dataclasses
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from threading import Lock
-from typing import Optional
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping, Optional
 
 import market_maker.client.api.parsers as parsers
 import market_maker.client.api.vega_api_client as api
+import market_maker.store.indexes as indexes
+import market_maker.store.snapshot as snapshot
 from market_maker.client.ws.vega_web_socket_client import VegaWebSocketClient
 from market_maker.config import Config
-from market_maker.models import Account, Asset, Market, Order, Position
-from market_maker.utils.decimal_utils import convert_to_decimals
+from market_maker.metrics import latency_metrics
+from market_maker.models import Account, Asset, Market, MarketData, Order, Position
+from market_maker.store.order_book import OrderBook
+from market_maker.store.persistent import PersistentMap
+from market_maker.replay.recorder import StreamRecorder
+
+logger = logging.getLogger(__name__)
+
+# Store section fed by each stream. Market data is resent every block, so that
+# section is fresh again on the first message after reconnecting, while the
+# party's orders, positions and accounts only stream changes and are reloaded
+# over REST. Order books detect their own gaps by sequence number.
+_STREAM_SECTIONS = {
+    "market_data": "markets",
+    "orders": "orders",
+    "positions": "positions",
+    "accounts": "accounts",
+}
+
+
+@dataclass(frozen=True)
+class StoreState:
+    """A consistent view of everything held by a `VegaStore` at one point.
+
+    States are never modified once published. Each update publishes a new
+    state with a higher `sequence`, so a reader holding a state can use it
+    without locking, and can tell whether anything has changed since by
+    comparing sequence numbers. The party's collections and their indexes are
+    `PersistentMap`s, updated in O(log n) without copying, and the rest are
+    read-only `MappingProxyType` views, so a reader cannot change a published
+    state by accident.
+    """
+
+    sequence: int = 0
+    markets: Mapping[str, Market] = field(default_factory=dict)
+    assets: Mapping[str, Asset] = field(default_factory=dict)
+    accounts: Mapping[tuple[str, str, str, str], Account] = field(
+        default_factory=PersistentMap
+    )
+    orders: Mapping[str, Order] = field(default_factory=PersistentMap)
+    # Keyed by market ID
+    positions: Mapping[str, Position] = field(default_factory=PersistentMap)
+
+    # Indexes maintained alongside the collections above, see `indexes`
+    # Live orders by (market ID, side), as `PersistentSortedList`s by price
+    orders_by_side: Mapping[tuple[str, str], Iterable[Order]] = field(
+        default_factory=PersistentMap
+    )
+    # Total remaining size of live orders by (market ID, side)
+    resting_volume: Mapping[tuple[str, str], int] = field(default_factory=PersistentMap)
+    # Total balance across all accounts by (party ID, asset ID)
+    balances: Mapping[tuple[str, str], int] = field(default_factory=PersistentMap)
+
+    def __post_init__(self):
+        for name in _COLLECTIONS:
+            collection = getattr(self, name)
+            if name in _PERSISTENT_COLLECTIONS:
+                if not isinstance(collection, PersistentMap):
+                    object.__setattr__(self, name, PersistentMap(collection))
+            elif not isinstance(collection, MappingProxyType):
+                object.__setattr__(self, name, MappingProxyType(collection))
+
+
+_COLLECTIONS = tuple(
+    f.name for f in dataclasses.fields(StoreState) if f.name != "sequence"
+)
+# Updated an entry at a time by the party's streams
+_PERSISTENT_COLLECTIONS = frozenset(
+    ("accounts", "orders", "positions", "orders_by_side", "resting_volume", "balances")
+)
 
 
 class VegaStore:
-    def __init__(self, config: Config):
-        self._accounts: dict[str, Account] = {}
-        self._orders: dict[str, Order] = {}
-        self._assets: dict[str, Asset] = {}
-        self._positions: dict[str, Position] = {}
-        self._markets: dict[str, Market] = {}
-
-        self._accounts_lock = Lock()
-        self._orders_lock = Lock()
-        self._positions_lock = Lock()
-        self._markets_lock = Lock()
+    def __init__(
+        self,
+        config: Config,
+        recorder: Optional[StreamRecorder] = None,
+        ws_client_class: type[VegaWebSocketClient] = VegaWebSocketClient,
+    ):
+        self._state = StoreState()
+        # Serialises writers only, readers never lock
+        self._write_lock = Lock()
 
         self._config = config
-        self._ws_client = VegaWebSocketClient(data_node_url=config.ws_url)
-
-    def start(self, market_id: str, party_id: str) -> None:
-        self.load_data(party_id=party_id)
-
-        self._ws_client.subscribe_market_data(
-            market_id=market_id, callback=self._update_market_data
+        self._ws_client = ws_client_class(
+            data_node_url=config.ws_url,
+            recorder=recorder,
+            on_disconnect=self._on_stream_disconnect,
+            on_reconnect=self._on_stream_reconnect,
+        )
+        self._party_id: Optional[str] = None
+        self._market_ids: list[str] = []
+
+        # Sections missing updates from a dropped stream, by when they were
+        # marked stale, and for sections being reloaded the keys updated by
+        # their stream since the reload began, which the reload must not undo
+        self._stale: dict[str, float] = {}
+        self._touched: dict[str, set] = {}
+        self._stale_lock = Lock()
+
+        # Price level books, mutated in place under their own locks rather
+        # than published with the state, as they change on every trade
+        self._order_books: dict[str, OrderBook] = {}
+        self._resyncing: set[str] = set()
+        self._resync_lock = Lock()
+
+        self._snapshot_path = config.snapshot_path
+        self._snapshot_interval_seconds = config.snapshot_interval_seconds
+        self._stopped = threading.Event()
+
+    def start(
+        self,
+        party_id: str,
+        market_id: Optional[str] = None,
+        market_ids: Optional[list[str]] = None,
+    ) -> None:
+        """Loads initial state then streams updates for one or more markets.
+
+        Only the given markets are kept in the store's state.
+
+        Market data for every market is streamed over a single websocket, and
+        when quoting more than one market the order, position and account
+        streams follow the party across all markets, so the number of sockets
+        does not grow with the number of markets.
+
+        If a snapshot path is configured and a snapshot exists, state is
+        restored from it immediately and reconciled against the data node in
+        the background, rather than waiting on a full load before streaming.
+        """
+        market_ids = list(market_ids or []) + ([market_id] if market_id else [])
+        self._party_id = party_id
+        self._market_ids = market_ids
+        # A single market keeps the tighter server-side market filter
+        stream_market_id = market_ids[0] if len(market_ids) == 1 else None
+
+        if self._snapshot_path is not None and self.restore_snapshot(
+            self._snapshot_path
+        ):
+            threading.Thread(
+                target=self._reconcile, kwargs={"party_id": party_id}, daemon=True
+            ).start()
+        else:
+            self.load_data(party_id=party_id)
+
+        self._ws_client.subscribe_markets_data(
+            market_ids=market_ids, callback=self._update_market_data
         )
 
+        if self._config.track_order_book:
+            self._order_books = {m: OrderBook(m) for m in market_ids}
+            self._ws_client.subscribe_markets_depth(
+                market_ids=market_ids, callback=self._update_market_depth
+            )
+            self._ws_client.subscribe_markets_depth_updates(
+                market_ids=market_ids, callback=self._update_market_depth_updates
+            )
+
         self._ws_client.subscribe_accounts(
-            party_id=party_id, market_id=market_id, callback=self._update_accounts
+            party_id=party_id,
+            market_id=stream_market_id,
+            callback=self._update_accounts,
         )
 
         self._ws_client.subscribe_orders(
-            market_id=market_id, party_id=party_id, callback=self._update_order
+            market_id=stream_market_id, party_id=party_id, callback=self._update_order
         )
 
         self._ws_client.subscribe_positions(
-            market_id=market_id, party_id=party_id, callback=self._update_position
+            market_id=stream_market_id,
+            party_id=party_id,
+            callback=self._update_position,
         )
 
+        if self._snapshot_path is not None:
+            threading.Thread(target=self._snapshot_periodically, daemon=True).start()
+
+    @property
+    def stale_sections(self) -> frozenset[str]:
+        """Store sections which may have missed updates while their stream
+        was disconnected, and have not been resynced since.
+        """
+        return frozenset(self._stale)
+
+    def is_market_stale(self, market_id: str) -> bool:
+        """Whether any data for a quoted market may be out of date. Every
+        stream covers all quoted markets, so this is any stale section.
+        """
+        return market_id in self._market_ids and bool(self._stale)
+
+    @property
+    def ws_client(self) -> VegaWebSocketClient:
+        """The websocket client feeding the store, of `ws_client_class`."""
+        return self._ws_client
+
+    @property
+    def state(self) -> StoreState:
+        """The latest published state. Read it once and use that state
+        throughout for a consistent view across collections.
+        """
+        return self._state
+
     def stop(self):
+        self._stopped.set()
         self._ws_client.stop()
+        if self._snapshot_path is not None:
+            self.save_snapshot(self._snapshot_path)
+
+    ###########################################################
+    #                      Snapshots                          #
+    ###########################################################
+
+    def save_snapshot(self, path: str) -> None:
+        start = time.monotonic()
+        state = self._state
+        snapshot.save_snapshot(
+            path,
+            {
+                "assets": (Asset, list(state.assets.values())),
+                "markets": (Market, list(state.markets.values())),
+                "accounts": (Account, list(state.accounts.values())),
+                "orders": (Order, list(state.orders.values())),
+                "positions": (Position, list(state.positions.values())),
+            },
+        )
+        logger.debug(f"Saved snapshot in {time.monotonic() - start:.3f}s")
+
+    def restore_snapshot(self, path: str) -> bool:
+        """Replaces the store's state with a snapshot, returning whether one
+        was found and loaded.
+        """
+        start = time.monotonic()
+        collections = snapshot.load_snapshot(
+            path,
+            {
+                "assets": Asset,
+                "markets": Market,
+                "accounts": Account,
+                "orders": Order,
+                "positions": Position,
+            },
+        )
+        if collections is None:
+            return False
+
+        with self._write_lock:
+            self._publish(
+                assets={a.asset_id: a for a in collections["assets"]},
+                markets=self._quoted_markets(
+                    {m.market_id: m for m in collections["markets"]}
+                ),
+                positions={p.market_id: p for p in collections["positions"]},
+                **_with_account_indexes(
+                    {a.get_id(): a for a in collections["accounts"]}
+                ),
+                **_with_order_indexes({o.order_id: o for o in collections["orders"]}),
+            )
+
+        logger.info(f"Restored snapshot in {time.monotonic() - start:.3f}s")
+        return True
+
+    def _reconcile(self, party_id: str) -> None:
+        try:
+            self.load_data(party_id=party_id)
+        except Exception:
+            logger.exception("Failed to reconcile snapshot with data node")
+
+    def _snapshot_periodically(self) -> None:
+        while not self._stopped.wait(self._snapshot_interval_seconds):
+            try:
+                self.save_snapshot(self._snapshot_path)
+            except Exception:
+                logger.exception(f"Failed to save snapshot to {self._snapshot_path}")
+
+    ###########################################################
+    #                  Stream reconnection                    #
+    ###########################################################
+
+    def _on_stream_disconnect(self, msg_type: str) -> None:
+        section = _STREAM_SECTIONS.get(msg_type)
+        if section is not None:
+            with self._stale_lock:
+                self._stale.setdefault(section, time.monotonic())
+
+    def _on_stream_reconnect(self, msg_type: str, outage_seconds: float) -> None:
+        section = _STREAM_SECTIONS.get(msg_type)
+        if section in ("orders", "positions", "accounts"):
+            threading.Thread(
+                target=self._resync_section, args=(section,), daemon=True
+            ).start()
+        elif msg_type in ("market_depth", "market_depth_updates"):
+            for book in self._order_books.values():
+                self._resync_order_book(book)
+
+    def _mark_fresh(self, section: str) -> None:
+        with self._stale_lock:
+            stale_at = self._stale.pop(section, None)
+        if stale_at is not None:
+            seconds = time.monotonic() - stale_at
+            latency_metrics.record("stale_data", int(seconds * 1e9))
+            logger.info(f"Store {section} fresh again after {seconds:.3f}s")
+
+    def _touch(self, section: str, keys) -> None:
+        # Callers hold the write lock
+        touched = self._touched.get(section)
+        if touched is not None:
+            touched.update(keys)
+
+    def _resync_section(self, section: str) -> None:
+        """Reloads one of the party's collections over REST after its stream
+        reconnected, rather than reloading everything.
+
+        Updates keep streaming during the reload. Anything they change after
+        the reload begins is newer than the REST response may be, so is kept
+        over it.
+        """
+        start = time.monotonic()
+        start_ns = time.perf_counter_ns()
+        stream = self._ws_client.streams[section]
+        epoch = stream.epoch
+        with self._write_lock:
+            self._touched[section] = set()
+        try:
+            if section == "orders":
+                nodes = api.get_open_orders(
+                    party_id=self._party_id, config=self._config
+                )
+                fetched = {o["id"]: parsers.parse_order(o) for o in nodes}
+            elif section == "positions":
+                nodes = api.get_positions(party_id=self._party_id, config=self._config)
+                fetched = {p["marketId"]: parsers.parse_position(p) for p in nodes}
+            else:
+                nodes = api.get_accounts(party_id=self._party_id, config=self._config)
+                fetched = {
+                    account.get_id(): account
+                    for account in map(parsers.parse_account, nodes)
+                }
+
+            with self._write_lock:
+                current = getattr(self._state, section)
+                touched = self._touched.pop(section)
+                merged = {k: v for k, v in fetched.items() if k not in touched}
+                merged.update((k, current[k]) for k in touched if k in current)
+                if section == "orders":
+                    self._publish(**_with_order_indexes(merged))
+                elif section == "positions":
+                    self._publish(positions=merged)
+                else:
+                    self._publish(**_with_account_indexes(merged))
+        except Exception:
+            logger.exception(f"Failed to resync {section}, reloading everything")
+            with self._write_lock:
+                self._touched.pop(section, None)
+            self._resync_all()
+            return
+
+        latency_metrics.record_since("stream_resync", start_ns)
+        logger.info(f"Resynced {section} in {time.monotonic() - start:.3f}s")
+        # If the stream dropped again meanwhile, its next reconnect resyncs
+        if stream.connected and stream.epoch == epoch:
+            self._mark_fresh(section)
+
+    def _resync_all(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.load_data(party_id=self._party_id)
+            except Exception:
+                logger.exception("Failed to reload store state")
+                self._stopped.wait(5)
+                continue
+            for section in ("orders", "positions", "accounts"):
+                self._mark_fresh(section)
+            return
 
     ###########################################################
     #                   All item loaders                      #
     ###########################################################
 
     def get_markets(self) -> list[Market]:
-        with self._markets_lock:
-            return list(self._markets.values())
+        return list(self._state.markets.values())
 
     def get_accounts(self) -> list[Account]:
-        with self._accounts_lock:
-            return list(self._accounts.values())
+        return list(self._state.accounts.values())
 
     def get_assets(self) -> list[Asset]:
-        return list(self._assets.values())
+        return list(self._state.assets.values())
 
     def get_positions(self) -> list[Position]:
-        with self._positions_lock:
-            return list(self._positions.values())
+        return list(self._state.positions.values())
 
     def get_orders(self) -> list[Order]:
-        with self._orders_lock:
-            return list(self._orders.values())
+        return list(self._state.orders.values())
 
     ###########################################################
     #               Individual item loaders                   #
     ###########################################################
 
     def get_market_by_id(self, market_id: str) -> Optional[Market]:
-        return self._markets.get(market_id)
+        return self._state.markets.get(market_id)
 
     def get_order_by_id(self, order_id: str) -> Optional[Order]:
-        return self._orders.get(order_id)
+        return self._state.orders.get(order_id)
 
     def get_position_by_market_id(self, market_id: str) -> Optional[Position]:
-        return self._positions.get(market_id)
+        return self._state.positions.get(market_id)
 
     def get_asset_by_id(self, asset_id: str) -> Optional[Asset]:
-        return self._assets.get(asset_id)
+        return self._state.assets.get(asset_id)
+
+    def get_order_book(self, market_id: str) -> Optional[OrderBook]:
+        """The price level book for a market, if order books are tracked.
+        Check `OrderBook.synced` before relying on it.
+        """
+        return self._order_books.get(market_id)
+
+    def get_own_share(self, market_id: str, side: str, price: int) -> float:
+        """Fraction of a price level's volume made up by the party's own
+        resting orders, zero if the book is not tracked or not synced.
+        """
+        book = self._order_books.get(market_id)
+        if book is None or not book.synced:
+            return 0
+        orders = self._state.orders_by_side.get((market_id, side))
+        if orders is None:
+            return 0
+        own_volume = sum(
+            order.remaining_size for order in orders.irange((price,), (price + 1,))
+        )
+        return book.share_of_level(side, price, own_volume)
+
+    ###########################################################
+    #                   Index lookups                         #
+    ###########################################################
+
+    def get_balance(self, party_id: str, asset_id: str) -> int:
+        """Total balance of a party's accounts in an asset, in asset units."""
+        return self._state.balances.get((party_id, asset_id), 0)
+
+    def get_orders_by_side(self, market_id: str, side: str) -> tuple[Order, ...]:
+        """Live orders on one side of a market, sorted by ascending price."""
+        return tuple(self._state.orders_by_side.get((market_id, side), ()))
+
+    def get_resting_volume(self, market_id: str, side: str) -> int:
+        """Total remaining size of live orders on one side of a market."""
+        return self._state.resting_volume.get((market_id, side), 0)
 
     ###########################################################
     #                   Update functions                      #
     ###########################################################
 
+    def _publish(self, **collections: Mapping) -> None:
+        # Callers hold the write lock. Swapping the reference is atomic, so
+        # readers see either the old state or the new one, never a mix
+        self._state = dataclasses.replace(
+            self._state, sequence=self._state.sequence + 1, **collections
+        )
+
     def _update_market_data(self, market_dict: dict) -> None:
-        market_data = market_dict["marketData"][0]
-        with self._markets_lock:
-            market = self._markets[market_data["market"]]
-            market.mark_price = convert_to_decimals(
-                market.decimal_places, float(market_data["markPrice"])
-            )
-            market.best_bid_price = convert_to_decimals(
-                market.decimal_places,
-                float(market_data["bestBidPrice"]),
-            )
-            market.best_offer_price = convert_to_decimals(
-                market.decimal_places,
-                float(market_data["bestOfferPrice"]),
-            )
-            market.best_bid_volume = convert_to_decimals(
-                market.decimal_places,
-                float(market_data["bestBidVolume"]),
-            )
-            market.best_offer_volume = convert_to_decimals(
-                market.decimal_places,
-                float(market_data["bestOfferVolume"]),
-            )
-            market.open_interest = convert_to_decimals(
-                market.decimal_places,
-                float(market_data["openInterest"]),
-            )
-            market.trading_mode = market_data["marketTradingMode"]
-            market.state = market_data["marketState"]
+        self.apply_market_data(
+            [
+                parsers.parse_market_data(market_data)
+                for market_data in market_dict["marketData"]
+            ]
+        )
 
     def _update_order(self, order_dict: dict) -> None:
-        orders = [
-            parsers.parse_order(
-                order,
-                position_decimal_places=self.get_market_by_id(
-                    order["marketId"]
-                ).position_decimal_places,
-                price_decimal_places=self.get_market_by_id(
-                    order["marketId"]
-                ).decimal_places,
-            )
-            for order in order_dict.get("snapshot", order_dict.get("updates"))["orders"]
-        ]
-        with self._orders_lock:
-            for order in orders:
-                if order.status != "STATUS_ACTIVE":
-                    self._orders.pop(order.order_id, None)
-                else:
-                    self._orders[order.order_id] = order
+        self.apply_orders(
+            [
+                parsers.parse_order(order)
+                for order in order_dict.get("snapshot", order_dict.get("updates"))[
+                    "orders"
+                ]
+            ]
+        )
 
     def _update_position(self, position_dict: dict) -> None:
-        position_dict = position_dict.get("snapshot", position_dict.get("updates"))[
-            "positions"
-        ][0]
-
-        market = self.get_market_by_id(position_dict["marketId"])
-        asset = self.get_asset_by_id(market.settlement_asset_id)
-        position = parsers.parse_position(
-            position_dict,
-            position_decimal_places=market.position_decimal_places,
-            price_decimal_places=market.decimal_places,
-            asset_decimal_places=asset.decimal_places,
+        self.apply_positions(
+            [
+                parsers.parse_position(position)
+                for position in position_dict.get(
+                    "snapshot", position_dict.get("updates")
+                )["positions"]
+            ]
         )
-        with self._positions_lock:
-            self._positions[position.market_id] = position
 
     def _update_accounts(self, account_dict: dict) -> None:
         account_dict = account_dict.get("snapshot", account_dict.get("updates"))
-        if not account_dict.get("accounts"):
-            return
-        account_dict = account_dict["accounts"][0]
-        asset = self.get_asset_by_id(account_dict["asset"])
-        account = parsers.parse_account(
-            account_dict,
-            asset_decimal_places=asset.decimal_places,
+        self.apply_accounts(
+            [
+                parsers.parse_account(account)
+                for account in account_dict.get("accounts") or []
+            ]
         )
-        with self._accounts_lock:
-            self._accounts[account.get_id()] = account
+
+    # The `apply_` methods take updates already parsed from a stream, by this
+    # store's own handlers above or by a feed in another process, see
+    # `market_maker.shm`
+
+    def apply_market_data(self, updates: list[MarketData]) -> None:
+        with self._write_lock:
+            markets = dict(self._state.markets)
+            for market_data in updates:
+                market = markets.get(market_data.market_id)
+                if market is None:
+                    continue
+                markets[market.market_id] = dataclasses.replace(
+                    market,
+                    mark_price=market_data.mark_price,
+                    best_bid_price=market_data.best_bid_price,
+                    best_offer_price=market_data.best_offer_price,
+                    best_bid_volume=market_data.best_bid_volume,
+                    best_offer_volume=market_data.best_offer_volume,
+                    open_interest=market_data.open_interest,
+                    trading_mode=market_data.trading_mode,
+                    state=market_data.state,
+                )
+            self._publish(markets=markets)
+        if "markets" in self._stale:
+            self._mark_fresh("markets")
+
+    def apply_orders(self, orders: list[Order]) -> None:
+        with self._write_lock:
+            state = self._state
+            live_orders = state.orders
+            orders_by_side = state.orders_by_side
+            resting_volume = state.resting_volume
+            for order in orders:
+                previous = live_orders.get(order.order_id)
+                if order.status != "STATUS_ACTIVE":
+                    live_orders = live_orders.delete(order.order_id)
+                    order = None
+                else:
+                    live_orders = live_orders.set(order.order_id, order)
+                orders_by_side, resting_volume = indexes.update_order(
+                    orders_by_side, resting_volume, previous, order
+                )
+            self._touch("orders", (order.order_id for order in orders))
+            self._publish(
+                orders=live_orders,
+                orders_by_side=orders_by_side,
+                resting_volume=resting_volume,
+            )
+
+    def apply_positions(self, positions: list[Position]) -> None:
+        with self._write_lock:
+            posns = self._state.positions
+            for position in positions:
+                posns = posns.set(position.market_id, position)
+            self._touch("positions", (position.market_id for position in positions))
+            self._publish(positions=posns)
+
+    def apply_accounts(self, accounts: list[Account]) -> None:
+        with self._write_lock:
+            accts = self._state.accounts
+            balances = self._state.balances
+            for account in accounts:
+                previous = accts.get(account.get_id())
+                accts = accts.set(account.get_id(), account)
+                balances = indexes.update_account(balances, previous, account)
+            self._touch("accounts", (account.get_id() for account in accounts))
+            self._publish(accounts=accts, balances=balances)
+
+    def _update_market_depth(self, depth_dict: dict) -> None:
+        for depth in depth_dict.get("marketDepth") or []:
+            book = self._order_books.get(depth["marketId"])
+            if book is not None and not book.apply_snapshot(depth):
+                self._resync_order_book(book)
+
+    def _update_market_depth_updates(self, update_dict: dict) -> None:
+        for update in update_dict.get("update") or []:
+            book = self._order_books.get(update["marketId"])
+            if book is not None and not book.apply_update(update):
+                self._resync_order_book(book)
+
+    def _resync_order_book(self, book: OrderBook) -> None:
+        with self._resync_lock:
+            if book.market_id in self._resyncing:
+                return
+            self._resyncing.add(book.market_id)
+        threading.Thread(
+            target=self._fetch_order_book, args=(book,), daemon=True
+        ).start()
+
+    def _fetch_order_book(self, book: OrderBook) -> None:
+        start = time.monotonic()
+        try:
+            # Updates buffered since the gap may be newer than the snapshot,
+            # in which case they still do not follow on and a later snapshot
+            # is needed
+            for attempt in range(5):
+                depth = api.get_market_depth(book.market_id, config=self._config)
+                if book.apply_snapshot(depth):
+                    logger.info(
+                        f"Resynced order book for {book.market_id} in "
+                        f"{time.monotonic() - start:.3f}s"
+                    )
+                    return
+                time.sleep(0.5 * (attempt + 1))
+            logger.error(f"Failed to resync order book for {book.market_id}")
+        except Exception:
+            logger.exception(f"Failed to resync order book for {book.market_id}")
+        finally:
+            with self._resync_lock:
+                self._resyncing.discard(book.market_id)
 
     def load_data(self, party_id: str) -> None:
-        self._assets = {
-            a["id"]: parsers.parse_asset(a) for a in api.get_assets(config=self._config)
+        """Loads assets, the markets being quoted and the party's accounts,
+        orders and positions.
+
+        All collections are fetched concurrently over pooled connections, and
+        each is parsed as soon as it arrives. Values are kept in native units,
+        so no collection needs another to be parsed.
+        """
+        start = time.monotonic()
+        fetchers = {
+            "assets": lambda: api.get_assets(config=self._config),
+            "markets": lambda: api.get_markets(config=self._config),
+            "accounts": lambda: api.get_accounts(
+                party_id=party_id, config=self._config
+            ),
+            "orders": lambda: api.get_open_orders(
+                party_id=party_id, config=self._config
+            ),
+            "positions": lambda: api.get_positions(
+                party_id=party_id, config=self._config
+            ),
         }
-
-        markets = {
-            m["id"]: parsers.parse_market(m)
-            for m in api.get_markets(config=self._config)
+        loaders = {
+            "assets": self._load_assets,
+            "markets": self._load_markets,
+            "accounts": self._load_accounts,
+            "orders": self._load_orders,
+            "positions": self._load_positions,
+        }
+        with ThreadPoolExecutor(
+            max_workers=len(fetchers), thread_name_prefix="load_data"
+        ) as executor:
+            futures = {
+                executor.submit(_timed, f"Fetched {name}", fetcher): name
+                for name, fetcher in fetchers.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                _timed(f"Parsed {name}", loaders[name], future.result())
+
+        logger.info(f"Loaded initial state in {time.monotonic() - start:.3f}s")
+
+    def _load_assets(self, assets: list[dict]) -> None:
+        assets = {a["id"]: parsers.parse_asset(a) for a in assets}
+        with self._write_lock:
+            self._publish(assets=assets)
+
+    def _load_markets(self, markets: list[dict]) -> None:
+        markets = self._quoted_markets(
+            {m["id"]: parsers.parse_market(m) for m in markets}
+        )
+        with self._write_lock:
+            self._publish(markets=markets)
+
+    def _quoted_markets(self, markets: dict[str, Market]) -> dict[str, Market]:
+        # Only the markets passed to `start` are kept, as every market data
+        # update copies the dict, rather than every market on the network
+        if not self._market_ids:
+            return markets
+        return {
+            market_id: markets[market_id]
+            for market_id in self._market_ids
+            if market_id in markets
         }
-        with self._markets_lock:
-            self._markets = markets
 
+    def _load_accounts(self, accounts: list[dict]) -> None:
         new_accts = {}
-        for acct in api.get_accounts(config=self._config, party_id=party_id):
-            acct = parsers.parse_account(
-                acct,
-                asset_decimal_places=self.get_asset_by_id(acct["asset"]).decimal_places,
-            )
+        for acct in accounts:
+            acct = parsers.parse_account(acct)
             new_accts[acct.get_id()] = acct
 
-        with self._accounts_lock:
-            self._accounts = new_accts
+        with self._write_lock:
+            self._publish(**_with_account_indexes(new_accts))
 
-        orders = {
-            o["id"]: parsers.parse_order(
-                o,
-                self.get_market_by_id(o["marketId"]).decimal_places,
-                self.get_market_by_id(o["marketId"]).position_decimal_places,
-            )
-            for o in api.get_open_orders(party_id=party_id, config=self._config)
-        }
-        with self._orders_lock:
-            self._orders = orders
-
-        posns = {
-            p["marketId"]: parsers.parse_position(
-                p,
-                position_decimal_places=self.get_market_by_id(
-                    p["marketId"]
-                ).position_decimal_places,
-                price_decimal_places=self.get_market_by_id(
-                    p["marketId"]
-                ).decimal_places,
-                asset_decimal_places=self.get_asset_by_id(
-                    self.get_market_by_id(p["marketId"]).settlement_asset_id
-                ).decimal_places,
-            )
-            for p in api.get_positions(party_id=party_id, config=self._config)
-        }
-        with self._positions_lock:
-            self._positions = posns
+    def _load_orders(self, orders: list[dict]) -> None:
+        orders = {o["id"]: parsers.parse_order(o) for o in orders}
+        with self._write_lock:
+            self._publish(**_with_order_indexes(orders))
+
+    def _load_positions(self, positions: list[dict]) -> None:
+        posns = {p["marketId"]: parsers.parse_position(p) for p in positions}
+        with self._write_lock:
+            self._publish(positions=posns)
+
+
+def _with_order_indexes(orders: dict[str, Order]) -> dict[str, Any]:
+    orders_by_side, resting_volume = indexes.index_orders(orders.values())
+    return {
+        "orders": orders,
+        "orders_by_side": orders_by_side,
+        "resting_volume": resting_volume,
+    }
+
+
+def _with_account_indexes(accounts: dict[Any, Account]) -> dict[str, Any]:
+    return {
+        "accounts": accounts,
+        "balances": indexes.index_balances(accounts.values()),
+    }
+
+
+def _timed(description: str, fn: Callable[..., Any], *args: Any) -> Any:
+    start = time.monotonic()
+    result = fn(*args)
+    logger.info(f"{description} in {time.monotonic() - start:.3f}s")
+    return result
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from market_maker.strategy.simple_market_maker import (
+    SimpleMarketMaker,
+    requote_together,
+)
+
+
+class MultiMarketRunner:
+    def __init__(self, strategies: list[SimpleMarketMaker], max_workers: int = 4):
+        """Runs one strategy instance per market on a shared pool of worker
+        threads, instead of a dedicated thread per market.
+
+        Each strategy runs at most once at a time. Strategies due at the same
+        time are requoted together on one worker, with their ladders built in
+        a single pass, in order of how long each has waited since its last
+        requote so that a busy market cannot starve the others.
+
+        Start the scheduler by calling `run`.
+
+        Args:
+            strategies:
+                list[SimpleMarketMaker], one strategy per market to quote
+            max_workers:
+                int, number of strategies which may requote concurrently
+        """
+        self._strategies = strategies
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="strategy"
+        )
+
+        self._wake = threading.Event()
+        self._running_lock = threading.Lock()
+        self._running: set[int] = set()
+        self._stopped = False
+
+        for strategy in strategies:
+            strategy.set_requote_callback(self._wake.set)
+
+    def run(self) -> None:
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            # Clear before scanning so that a wake-up during the scan is kept
+            self._wake.clear()
+            now = time.monotonic()
+
+            due = []
+            next_due = float("inf")
+            with self._running_lock:
+                for idx, strategy in enumerate(self._strategies):
+                    if idx in self._running:
+                        continue
+                    delay = strategy.seconds_until_due(now)
+                    if delay == 0:
+                        due.append(idx)
+                    else:
+                        next_due = min(next_due, delay)
+                self._running.update(due)
+
+            due.sort(key=lambda idx: self._strategies[idx].last_execute_time)
+            if self._stopped:
+                return
+            if due:
+                self._executor.submit(self._requote, due)
+
+            self._wake.wait(timeout=None if next_due == float("inf") else next_due)
+
+    def _requote(self, due: list[int]) -> None:
+        try:
+            requote_together([self._strategies[idx] for idx in due])
+        except Exception:
+            logging.exception("Strategy requote failed")
+        finally:
+            with self._running_lock:
+                self._running.difference_update(due)
+            self._wake.set()
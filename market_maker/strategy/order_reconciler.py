@@ -0,0 +1,124 @@
+from typing import Optional
+
+from market_maker.models import Order
+from market_maker.submission import (
+    BatchMarketInstruction,
+    OrderAmendment,
+    OrderCancellation,
+    OrderSubmission,
+)
+
+
+class OrderReconciler:
+    def __init__(
+        self,
+        price_tolerance_bps: float = 2,
+        size_tolerance: float = 0.05,
+        amend_tolerance_bps: float = 50,
+    ):
+        """Works out the smallest batch of instructions which moves a set of
+        live orders onto a desired ladder.
+
+        Desired and live prices and sizes are compared in the market's
+        native integer units.
+
+        Each desired order is paired with the closest live order on the same
+        side. Pairs already within tolerance are left alone to keep their
+        queue priority, pairs which are close are amended, and anything left
+        unpaired is cancelled or newly submitted.
+
+        Args:
+            price_tolerance_bps:
+                float, price distance in basis points within which a live order
+                is considered to already be at the desired price
+            size_tolerance:
+                float, fraction of the desired size within which a live order's
+                remaining size is considered correct
+            amend_tolerance_bps:
+                float, maximum price distance in basis points at which a live
+                order is amended rather than cancelled and replaced
+        """
+        self._price_tolerance_bps = price_tolerance_bps
+        self._size_tolerance = size_tolerance
+        self._amend_tolerance_bps = max(amend_tolerance_bps, price_tolerance_bps)
+
+    def reconcile(
+        self, desired: list[OrderSubmission], live: list[Order]
+    ) -> BatchMarketInstruction:
+        submissions = []
+        amendments = []
+        cancellations = []
+
+        for side in sorted({s.side for s in desired} | {o.side for o in live}):
+            side_desired = [s for s in desired if s.side == side]
+            side_live = [o for o in live if o.side == side]
+            pairs = self._pair(side_desired, side_live)
+
+            for desired_idx, live_idx in pairs.items():
+                amendment = self._amendment(
+                    side_desired[desired_idx], side_live[live_idx]
+                )
+                if amendment is not None:
+                    amendments.append(amendment)
+
+            paired_live = set(pairs.values())
+            cancellations.extend(
+                OrderCancellation(order.order_id, order.market_id)
+                for i, order in enumerate(side_live)
+                if i not in paired_live
+            )
+            submissions.extend(
+                submission
+                for i, submission in enumerate(side_desired)
+                if i not in pairs
+            )
+
+        return BatchMarketInstruction(
+            submissions=submissions, cancellations=cancellations, amendments=amendments
+        )
+
+    def _pair(
+        self, desired: list[OrderSubmission], live: list[Order]
+    ) -> dict[int, int]:
+        # Ladders are small, so score every candidate pair within amending
+        # distance and greedily take the closest ones first
+        candidates = []
+        for desired_idx, submission in enumerate(desired):
+            for live_idx, order in enumerate(live):
+                distance = self._distance_bps(submission.price, order.price)
+                if distance <= self._amend_tolerance_bps:
+                    candidates.append((distance, desired_idx, live_idx))
+        candidates.sort()
+
+        pairs = {}
+        paired_live = set()
+        for _, desired_idx, live_idx in candidates:
+            if desired_idx in pairs or live_idx in paired_live:
+                continue
+            pairs[desired_idx] = live_idx
+            paired_live.add(live_idx)
+        return pairs
+
+    def _amendment(
+        self, desired: OrderSubmission, live: Order
+    ) -> Optional[OrderAmendment]:
+        price_ok = (
+            self._distance_bps(desired.price, live.price) <= self._price_tolerance_bps
+        )
+        size_ok = abs(desired.size - live.remaining_size) <= (
+            self._size_tolerance * desired.size
+        )
+        if price_ok and size_ok:
+            return None
+        return OrderAmendment(
+            order_id=live.order_id,
+            market_id=live.market_id,
+            size_delta=0 if size_ok else desired.size - live.remaining_size,
+            price=None if price_ok else desired.price,
+        )
+
+    @staticmethod
+    def _distance_bps(price: int, reference: int) -> float:
+        if reference == 0:
+            return float("inf")
+        return abs(price - reference) / reference * 10_000
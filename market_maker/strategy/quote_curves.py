@@ -0,0 +1,257 @@
+"""
+Builds the bid and ask ladders quoted by the strategies, for any number of
+markets at once.
+
+A ladder has `levels` orders a side. Level `i` (from 0) sits at a fractional
+offset from the reference price set by the spacing profile:
+
+- `linear`: `first + spacing * i`;
+- `geometric`: each gap `spacing_factor` times the one before it,
+  `first + spacing * (1 + f + ... + f^(i-1))`;
+- `exponential`: `first * exp(spacing_factor * i)`.
+
+Each side's target volume is split between levels by the size profile:
+
+- `equal`;
+- `geometric`: level `i` weighted `size_factor^i`;
+- `exponential`: weighted `exp(size_factor * (offset_i - first) / first)`,
+  so by distance from the reference rather than by level number.
+
+With `inventory_skew_bps` set, both sides move against the position, by that
+much at a notional exposure equal to half the balance. A long position lowers
+the quotes so that selling is more likely than buying, and vice versa.
+
+Prices are rounded away from the reference onto the market's tick and sizes
+down to its position decimals, and levels left with no size are dropped.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from market_maker.config import Config
+from market_maker.models import Market
+from market_maker.submission import OrderSubmission
+
+SPACING_PROFILES = ("linear", "geometric", "exponential")
+SIZE_PROFILES = ("equal", "geometric", "exponential")
+
+_SIDE_SIGNS = np.array([1.0, -1.0])[:, None, None]
+
+
+@dataclass(frozen=True)
+class QuoteCurveProfile:
+    levels: int = 5
+    # Offset of the first level and gap between levels, in basis points
+    first_offset_bps: float = 20
+    spacing_bps: float = 20
+    spacing_profile: str = "linear"
+    spacing_factor: float = 1.5
+    size_profile: str = "equal"
+    size_factor: float = 1
+    inventory_skew_bps: float = 0
+
+    def __post_init__(self):
+        if self.levels < 1:
+            raise ValueError(
+                f"A quote curve needs at least one level, not {self.levels}"
+            )
+        if self.first_offset_bps <= 0:
+            raise ValueError("The first quote level must be offset from the reference")
+        if self.spacing_profile not in SPACING_PROFILES:
+            raise ValueError(f"Unknown quote spacing profile {self.spacing_profile}")
+        if self.size_profile not in SIZE_PROFILES:
+            raise ValueError(f"Unknown quote size profile {self.size_profile}")
+
+    @classmethod
+    def from_config(cls, config: Config) -> "QuoteCurveProfile":
+        return cls(
+            levels=config.quote_levels,
+            first_offset_bps=config.quote_first_offset_bps,
+            spacing_bps=config.quote_spacing_bps,
+            spacing_profile=config.quote_spacing_profile,
+            spacing_factor=config.quote_spacing_factor,
+            size_profile=config.quote_size_profile,
+            size_factor=config.quote_size_factor,
+            inventory_skew_bps=config.inventory_skew_bps,
+        )
+
+
+@dataclass
+class QuoteCurves:
+    """Ladders for a batch of markets, one row per market and one column per
+    level from the reference outwards, in each market's native units. Levels
+    dropped for having no size hold zero.
+    """
+
+    bid_prices: np.ndarray
+    bid_sizes: np.ndarray
+    ask_prices: np.ndarray
+    ask_sizes: np.ndarray
+
+    def submissions(self, row: int, market_id: str) -> list[OrderSubmission]:
+        """A market's ladder as orders, asks first then bids, each from the
+        reference outwards.
+        """
+        return _side_submissions(
+            market_id, self.ask_prices[row], self.ask_sizes[row], "SIDE_SELL"
+        ) + _side_submissions(
+            market_id, self.bid_prices[row], self.bid_sizes[row], "SIDE_BUY"
+        )
+
+
+def _side_submissions(
+    market_id: str, prices: np.ndarray, sizes: np.ndarray, side: str
+) -> list[OrderSubmission]:
+    return [
+        OrderSubmission(market_id, size, price, "TIME_IN_FORCE_GTC", "TYPE_LIMIT", side)
+        for price, size in zip(prices.tolist(), sizes.tolist())
+        if size > 0
+    ]
+
+
+class QuoteCurveGenerator:
+    def __init__(self, profile: Optional[QuoteCurveProfile] = None):
+        """Builds ladders with one profile for batches of markets, working on
+        arrays of all the markets' inputs at once. Level offsets and size
+        weights are computed once, up front.
+        """
+        self.profile = profile if profile is not None else QuoteCurveProfile()
+        self.offsets = _offsets(self.profile)
+        self.weights = _weights(self.profile, self.offsets)
+        # Multipliers of the reference price for each (side, level), bids first
+        self._side_offsets = np.stack((1 - self.offsets, 1 + self.offsets))[:, None, :]
+
+    @classmethod
+    def from_config(cls, config: Config) -> "QuoteCurveGenerator":
+        return cls(QuoteCurveProfile.from_config(config))
+
+    def build(
+        self,
+        bid_prices: np.ndarray,
+        ask_prices: np.ndarray,
+        bid_volumes: np.ndarray,
+        ask_volumes: np.ndarray,
+        inventory: np.ndarray,
+        price_factors: np.ndarray,
+        tick_sizes: np.ndarray,
+        position_factors: np.ndarray,
+    ) -> QuoteCurves:
+        """Ladders for a batch of markets, given per market arrays of:
+
+        Args:
+            bid_prices:
+                np.ndarray, reference prices the bids are offset below
+            ask_prices:
+                np.ndarray, reference prices the asks are offset above
+            bid_volumes:
+                np.ndarray, quote notional to spread over the bids
+            ask_volumes:
+                np.ndarray, quote notional to spread over the asks
+            inventory:
+                np.ndarray, notional exposure as a fraction of half the
+                balance, positive when long, clipped to [-1, 1]
+            price_factors:
+                np.ndarray, `Market.price_factor`
+            tick_sizes:
+                np.ndarray, `Market.tick_size`, in market price units
+            position_factors:
+                np.ndarray, `Market.position_factor`
+        """
+        return self._build(
+            np.array(
+                [
+                    bid_prices,
+                    ask_prices,
+                    bid_volumes,
+                    ask_volumes,
+                    inventory,
+                    price_factors,
+                    tick_sizes,
+                    position_factors,
+                ],
+                dtype=np.float64,
+            )
+        )
+
+    def build_for_markets(
+        self,
+        markets: list[Market],
+        bid_prices: list[float],
+        ask_prices: list[float],
+        bid_volumes: list[float],
+        ask_volumes: list[float],
+        inventory: list[float],
+    ) -> QuoteCurves:
+        """`build` with each market's factors and tick size looked up."""
+        inputs = np.array(
+            [
+                bid_prices,
+                ask_prices,
+                bid_volumes,
+                ask_volumes,
+                inventory,
+                [m.price_factor for m in markets],
+                [m.tick_size for m in markets],
+                [m.position_factor for m in markets],
+            ],
+            dtype=np.float64,
+        )
+        return self._build(inputs)
+
+    def _build(self, inputs: np.ndarray) -> QuoteCurves:
+        # The inputs come as one (input, market) array, bids before asks, so
+        # both sides are sliced out as (side, market, level) arrays without
+        # copying. The cost is mostly per NumPy call rather than per element
+        inputs = inputs[:, :, None]
+        references, volumes = inputs[0:2], inputs[2:4]
+        inventory, price_factors, ticks, position_factors = inputs[4:8]
+        multipliers = self._side_offsets
+        skew_bps = self.profile.inventory_skew_bps
+        if skew_bps:
+            skew = np.minimum(np.maximum(inventory, -1), 1) * (-skew_bps / 10_000)
+            multipliers = multipliers + skew
+        prices = references * multipliers
+        # Rounded away from the reference, so never quoting inside the curve.
+        # Asks are negated so that flooring rounds them up
+        signed_ticks = ticks * _SIDE_SIGNS
+        units = np.floor(prices * (price_factors / signed_ticks)) * signed_ticks
+        # Levels pushed to or below zero, deep bids or a missing reference,
+        # divide by infinity for no size rather than by zero
+        sizes = np.floor(
+            volumes
+            * (self.weights * position_factors)
+            / np.where(units > 0, prices, np.inf)
+        )
+        units = units.astype(np.int64)
+        sizes = sizes.astype(np.int64)
+        return QuoteCurves(
+            bid_prices=units[0],
+            bid_sizes=sizes[0],
+            ask_prices=units[1],
+            ask_sizes=sizes[1],
+        )
+
+
+def _offsets(profile: QuoteCurveProfile) -> np.ndarray:
+    levels = np.arange(profile.levels, dtype=np.float64)
+    first = profile.first_offset_bps / 10_000
+    spacing = profile.spacing_bps / 10_000
+    factor = profile.spacing_factor
+    if profile.spacing_profile == "exponential":
+        return first * np.exp(factor * levels)
+    if profile.spacing_profile == "geometric" and not math.isclose(factor, 1):
+        return first + spacing * (factor**levels - 1) / (factor - 1)
+    return first + spacing * levels
+
+
+def _weights(profile: QuoteCurveProfile, offsets: np.ndarray) -> np.ndarray:
+    if profile.size_profile == "geometric":
+        weights = profile.size_factor ** np.arange(profile.levels, dtype=np.float64)
+    elif profile.size_profile == "exponential":
+        weights = np.exp(profile.size_factor * (offsets - offsets[0]) / offsets[0])
+    else:
+        weights = np.ones(profile.levels)
+    return weights / weights.sum()
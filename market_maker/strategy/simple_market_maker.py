@@ -1,21 +1,43 @@
-from market_maker.store.vega_store import VegaStore
+from market_maker.store.vega_store import StoreState, VegaStore
 from market_maker.store.binance_store import BinanceStore
 
 from market_maker.config import Config
-from market_maker.models import Market
+from market_maker.metrics import latency_metrics
+from market_maker.models import Market, Order, ReferencePrice
 from market_maker.submission import (
+    BatchMarketInstruction,
+    InstructionSerializer,
     OrderCancellation,
     OrderSubmission,
-    BatchMarketInstruction,
-    instruction_to_json,
 )
-from market_maker.wallet import VegaWallet
+from market_maker.submission_scheduler import SubmissionScheduler
+from market_maker.transaction_tracker import TransactionTracker
+from market_maker.wallet import PipelinedVegaWallet, VegaWallet
 from market_maker.strategy.base import BaseStrategy
+from market_maker.strategy.order_reconciler import OrderReconciler
+from market_maker.strategy.quote_curves import QuoteCurveGenerator
 
 import dataclasses
 import logging
 import threading
 import time
+from collections import defaultdict
+from typing import Any, Callable, Optional, Union
+
+
+@dataclasses.dataclass
+class _QuoteInputs:
+    market: Market
+    reference_price: ReferencePrice
+    # Prices the bid and ask curves are offset from
+    bid_price: float
+    ask_price: float
+    bid_volume: float
+    offer_volume: float
+    # Notional exposure as a fraction of half the balance
+    inventory: float
+    # What the requote was built from, see `SimpleMarketMaker._last_inputs`
+    key: tuple
 
 
 class SimpleMarketMaker(BaseStrategy):
@@ -24,25 +46,173 @@ class SimpleMarketMaker(BaseStrategy):
         binance_store: BinanceStore,
         vega_store: VegaStore,
         config: Config,
-        wallet: VegaWallet,
-        update_freq_seconds: int = 30,
+        wallet: Union[VegaWallet, PipelinedVegaWallet, SubmissionScheduler],
+        update_freq_seconds: float = 30,
+        requote_threshold_bps: Optional[float] = None,
+        min_requote_interval_seconds: float = 1,
+        reconciler: Optional[OrderReconciler] = None,
+        market_id: Optional[str] = None,
+        binance_market: Optional[str] = None,
+        reference_price_type: str = "touch",
+        max_reference_age_seconds: Optional[float] = None,
+        transaction_tracker: Optional[TransactionTracker] = None,
+        max_rejection_rate: Optional[float] = None,
+        quote_curves: Optional[QuoteCurveGenerator] = None,
+        balance_market_ids: Optional[list[str]] = None,
     ):
+        """Quotes a ladder of orders either side of a Binance reference price.
+
+        By default quotes are refreshed every `update_freq_seconds`. When
+        `requote_threshold_bps` is set, reference price ticks wake the strategy
+        as soon as the mid has moved that far from the last quoted mid, with
+        the timer only acting as a heartbeat. Bursts of ticks are coalesced
+        so that each requote uses the latest price, and requotes are at least
+        `min_requote_interval_seconds` apart.
+
+        Each requote is diffed against the live orders by `reconciler` so that
+        only orders which have moved are amended, cancelled or replaced.
+
+        The Vega market and Binance symbol default to those in `config`, and
+        can be overridden to run one instance per market in a single process.
+
+        The party's balance is split evenly between the markets quoted with
+        it, so that quoting several markets never commits more than the
+        balance. `balance_market_ids` lists every market the bot quotes, by
+        default those in `config`, and the balance in each settlement asset is
+        shared by the markets among them settling in it.
+
+        With a `reference_price_type` other than `touch`, the Binance bid and
+        ask are shifted together so that their mid sits on the chosen fair
+        price from the Binance book, keeping the ladder's spread. Requotes are
+        skipped while any depth book behind the reference is unsynced.
+
+        `binance_market` may also name a composite price. If
+        `max_reference_age_seconds` is set, requotes are skipped while any
+        Binance price behind the reference is older than that.
+
+        With a `transaction_tracker` following the wallet's submissions, the
+        rejection rate of recent transactions on the market is logged on each
+        requote. While it is above `max_rejection_rate`, if set, requotes only
+        cancel the market's live orders.
+
+        Requotes are also skipped while the Vega store reports the market's
+        data as stale after a dropped stream, until it has been resynced.
+
+        Passing a `SubmissionScheduler` as the wallet hands each batch over
+        unencoded, to be rate limited and split there.
+
+        Ladders are built by `quote_curves`, by default from the curve
+        settings in `config`. Strategies requoted together with
+        `requote_together` build all their ladders in one pass.
+        """
         super().__init__(config=config)
         self._binance_store = binance_store
         self._vega_store = vega_store
         self._wallet = wallet
         self._update_freq_seconds = update_freq_seconds
+        self._requote_threshold_bps = requote_threshold_bps
+        self._min_requote_interval_seconds = min_requote_interval_seconds
+        self._reconciler = reconciler if reconciler is not None else OrderReconciler()
+        self._curves = (
+            quote_curves
+            if quote_curves is not None
+            else QuoteCurveGenerator.from_config(config)
+        )
+        self._reference_price_type = reference_price_type
+        self._serializer = InstructionSerializer()
+        self._transaction_tracker = transaction_tracker
+        self._max_rejection_rate = max_rejection_rate
+        self._max_reference_age_ns = (
+            None
+            if max_reference_age_seconds is None
+            else int(max_reference_age_seconds * 1e9)
+        )
+        self.market_id = market_id if market_id is not None else config.market_id
+        self.binance_market = (
+            binance_market if binance_market is not None else config.binance_market
+        )
+        self._balance_market_ids = list(
+            dict.fromkeys(
+                [
+                    self.market_id,
+                    *(
+                        balance_market_ids
+                        if balance_market_ids is not None
+                        else [market_id for market_id, _ in config.markets]
+                    ),
+                ]
+            )
+        )
+        # Known once every market sharing the balance has been loaded
+        self._balance_share: Optional[float] = None
 
-    def get_total_balance(self, settlement_asset_id: str) -> float:
-        balance = 0
-        accounts = self._vega_store.get_accounts()
-        for account in accounts:
-            if (
-                account.owner == self.config.party_id
-                and account.asset_id == settlement_asset_id
-            ):
-                balance += account.balance
-        return balance
+        self._requote_event = threading.Event()
+        self._on_requote: Optional[Callable[[], Any]] = None
+        self._last_quoted_mid: Optional[float] = None
+        # Store sequence, reference prices and fair price behind the last
+        # requote handed to the wallet, to skip requotes when none has
+        # changed since
+        self._last_inputs: Optional[tuple[int, float, float, float]] = None
+        self.last_execute_time = float("-inf")
+        # `received_at` of the tick which requested the pending requote
+        self._triggered_by = 0
+        # Whether quoting is paused on the rejection rate, and the IDs of the
+        # orders already cancelled since the pause began
+        self._paused = False
+        self._cancelled_while_paused: set[str] = set()
+
+        if requote_threshold_bps is not None:
+            self._binance_store.add_tick_listener(
+                self.binance_market, self._on_reference_price
+            )
+
+    def set_requote_callback(self, callback: Callable[[], Any]) -> None:
+        """Registers a callback run whenever a reference move requests a
+        requote, so that an external scheduler can wake up.
+        """
+        self._on_requote = callback
+
+    def _on_reference_price(self, reference_price: ReferencePrice) -> None:
+        # Runs on the websocket thread, so only flag that a requote is needed.
+        # The strategy thread reads the latest price itself when it wakes up.
+        if self._requote_event.is_set():
+            return
+        mid = reference_price.fair_price(self._reference_price_type)
+        last_mid = self._last_quoted_mid
+        if (
+            last_mid is None
+            or abs(mid - last_mid) * 10_000 >= self._requote_threshold_bps * last_mid
+        ):
+            self._triggered_by = reference_price.received_at
+            self._requote_event.set()
+            if self._on_requote is not None:
+                self._on_requote()
+
+    def get_total_balance(
+        self, settlement_asset_id: str, state: Optional[StoreState] = None
+    ) -> float:
+        state = state if state is not None else self._vega_store.state
+        balance = state.balances.get((self.config.party_id, settlement_asset_id), 0)
+        asset = state.assets.get(settlement_asset_id)
+        return asset.to_float(balance) if asset else 0
+
+    def balance_share(self, market: Market, state: StoreState) -> float:
+        """Fraction of the settlement asset balance this market quotes with,
+        split evenly between the quoted markets settling in the same asset.
+        Markets not loaded yet are assumed to share it.
+        """
+        if self._balance_share is not None:
+            return self._balance_share
+        markets = [
+            state.markets.get(market_id) for market_id in self._balance_market_ids
+        ]
+        share = 1 / sum(
+            other is None or other.settlement_asset_id == market.settlement_asset_id
+            for other in markets
+        )
+        if all(other is not None for other in markets):
+            self._balance_share = share
+        return share
 
     def build_order_submissions(
         self,
@@ -51,102 +221,305 @@ class SimpleMarketMaker(BaseStrategy):
         market: Market,
         target_volume: float,
     ) -> list[OrderSubmission]:
-        """Generates a curve of five orders on a given side of
-        the book with equal sizes.
+        """Generates the strategy's curve of orders on one side of the book,
+        in the market's native units, with no inventory skew.
         """
-        submissions = []
-        size = target_volume / 5
-        for i in range(5):
-            offset = (i + 1) * 0.002
-            price = (
-                reference_price * (1 - offset)
-                if side == "BUY"
-                else reference_price * (1 + offset)
-            )
-            submissions.append(
-                OrderSubmission(
-                    market.market_id,
-                    size / price,
-                    price,
-                    "TIME_IN_FORCE_GTC",
-                    "TYPE_LIMIT",
-                    f"SIDE_{side}",
-                )
-            )
-        return submissions
+        curves = self._curves.build_for_markets(
+            [market],
+            bid_prices=[reference_price],
+            ask_prices=[reference_price],
+            bid_volumes=[target_volume if side == "BUY" else 0],
+            ask_volumes=[target_volume if side == "SELL" else 0],
+            inventory=[0],
+        )
+        return [
+            submission
+            for submission in curves.submissions(0, market.market_id)
+            if submission.side == f"SIDE_{side}"
+        ]
 
     def execute(self) -> None:
+        execute_together([self])
+
+    def _prepare(self, state: StoreState) -> Optional[_QuoteInputs]:
+        """Checks whether to requote and gathers what the ladder is built
+        from, returning None if the market should not be requoted now.
+        """
         logging.info("Executing trading strategy...")
-        market = self._vega_store.get_market_by_id(self.config.market_id)
-        if market:
-            logging.info(f"Updating quotes for {market.name}")
-            reference_price = self._binance_store.get_reference_price_by_symbol(
-                self.config.binance_market
+        market = state.markets.get(self.market_id)
+        if not market:
+            return None
+        if self._vega_store.is_market_stale(market.market_id):
+            logging.warning(
+                f"Data for {market.name} is stale "
+                f"({', '.join(sorted(self._vega_store.stale_sections))}), "
+                "not requoting"
             )
-            if reference_price:
-                # First load current position for info
-                position = self._vega_store.get_position_by_market_id(market.market_id)
-                open_volume = position.open_volume if position else 0
-                average_entry_price = position.average_entry_price if position else 0
-
-                # Then current balance to correctly size orders
-                balance = self.get_total_balance(market.settlement_asset_id)
-                bid_volume = max(
-                    (balance * 0.5) - (open_volume * average_entry_price), 0
-                )
-                offer_volume = max(
-                    (balance * 0.5) + (open_volume * average_entry_price), 0
-                )
+            return None
+        logging.info(f"Updating quotes for {market.name}")
+        reference_price = self._binance_store.get_reference_price_by_symbol(
+            self.binance_market
+        )
+        if not reference_price:
+            return None
+        if not self._binance_store.is_synced(self.binance_market):
+            logging.warning(
+                f"Depth book for {self.binance_market} is unsynced, not requoting"
+            )
+            return None
+        if (
+            self._max_reference_age_ns is not None
+            and time.perf_counter_ns() - reference_price.oldest_input_at
+            > self._max_reference_age_ns
+        ):
+            logging.warning(
+                f"Reference price for {self.binance_market} is stale, not requoting"
+            )
+            return None
+        if self._transaction_tracker is not None:
+            rejection_rate = self._transaction_tracker.rejection_rate(market.market_id)
+            if rejection_rate is not None:
+                logging.info(f"Rejection rate = {rejection_rate:.2%}")
+                if (
+                    self._max_rejection_rate is not None
+                    and rejection_rate > self._max_rejection_rate
+                ):
+                    if not self._paused:
+                        logging.warning(
+                            f"Rejection rate on {market.name} is "
+                            f"{rejection_rate:.2%}, cancelling orders"
+                        )
+                        self._paused = True
+                        # Quote afresh once resumed
+                        self._last_inputs = None
+                    self._cancel_orders(state, market)
+                    return None
+        if self._paused:
+            logging.info(f"Resuming quoting on {market.name}")
+            self._paused = False
+            self._cancelled_while_paused.clear()
+        fair_price = reference_price.fair_price(self._reference_price_type)
+        # The fair price moves with the book's sizes and depth, and not only
+        # with the touch prices
+        inputs = (
+            state.sequence,
+            reference_price.bid_price,
+            reference_price.ask_price,
+            fair_price,
+        )
+        if inputs == self._last_inputs:
+            logging.info("Nothing changed since the last requote")
+            return None
+        self._last_quoted_mid = fair_price
+        shift = fair_price - (
+            (reference_price.bid_price + reference_price.ask_price) / 2
+        )
 
-                logging.info(
-                    f"Open volume = {open_volume}; "
-                    f"Entry price = {average_entry_price}; "
-                    f"Notional exposure = {abs(open_volume * average_entry_price)}"
-                )
-                logging.info(
-                    f"Bid volume = {bid_volume}; Offer volume = {offer_volume}"
-                )
+        # First load current position for info
+        position = state.positions.get(market.market_id)
+        open_volume = market.size_to_float(position.open_volume) if position else 0
+        average_entry_price = (
+            market.price_to_float(position.average_entry_price) if position else 0
+        )
+        exposure = open_volume * average_entry_price
 
-                # Now generate orders, first cancelling any which exist
-                # then placing the new shape
-                orders = self._vega_store.get_orders()
-                cancellations = []
+        # Then this market's share of the balance to correctly size orders
+        balance = self.get_total_balance(
+            market.settlement_asset_id, state
+        ) * self.balance_share(market, state)
+        bid_volume = max((balance * 0.5) - exposure, 0)
+        offer_volume = max((balance * 0.5) + exposure, 0)
 
-                # Simple setup, we will cancel all existing orders,
-                # then replace new ones at the new levels we want.
-                for order in orders:
-                    cancellations.append(
-                        OrderCancellation(order.order_id, order.market_id)
-                    )
+        logging.info(
+            f"Open volume = {open_volume}; "
+            f"Entry price = {average_entry_price}; "
+            f"Notional exposure = {abs(exposure)}"
+        )
+        logging.info(f"Bid volume = {bid_volume}; Offer volume = {offer_volume}")
 
-                buy_submissions = self.build_order_submissions(
-                    reference_price.bid_price, "BUY", market, bid_volume
-                )
-                sell_submissions = self.build_order_submissions(
-                    reference_price.ask_price, "SELL", market, offer_volume
-                )
-                submissions = sell_submissions + buy_submissions
-                logging.info(
-                    f"Cancellations = {len(cancellations)}; Amendments = 0; Submissions"
-                    f" = {len(submissions)}"
-                )
-                batch_instruction = BatchMarketInstruction(
-                    submissions=submissions, cancellations=cancellations, amendments=[]
-                )
+        return _QuoteInputs(
+            market=market,
+            reference_price=reference_price,
+            bid_price=reference_price.bid_price + shift,
+            ask_price=reference_price.ask_price + shift,
+            bid_volume=bid_volume,
+            offer_volume=offer_volume,
+            inventory=exposure / (balance * 0.5) if balance > 0 else 0,
+            key=inputs,
+        )
 
-                self._wallet.submit_transaction(
-                    instruction_to_json(
-                        batch_instruction,
-                        price_decimals=market.decimal_places,
-                        position_decimals=market.position_decimal_places,
-                    )
-                )
+    def _send(
+        self,
+        state: StoreState,
+        quote: _QuoteInputs,
+        desired: list[OrderSubmission],
+        build_start: int,
+    ) -> None:
+        market = quote.market
+        # Diff the desired ladder against our live orders on this market
+        # so that orders already in place keep their queue priority
+        batch_instruction = self._reconciler.reconcile(
+            desired=desired, live=self._live_orders(state, market)
+        )
+        latency_metrics.record_since("ladder_build", build_start)
+        logging.info(
+            f"Cancellations = {len(batch_instruction.cancellations)}; "
+            f"Amendments = {len(batch_instruction.amendments)}; "
+            f"Submissions = {len(batch_instruction.submissions)}"
+        )
+        if not (
+            batch_instruction.submissions
+            or batch_instruction.amendments
+            or batch_instruction.cancellations
+        ):
+            return
+        self._submit(
+            market, batch_instruction, origin_ns=quote.reference_price.received_at
+        )
+
+    def _cancel_orders(self, state: StoreState, market: Market) -> None:
+        """Cancels our live orders on a market, rather than leaving them on
+        the book while quoting is paused. Each order is cancelled once per
+        pause, and skipped while its cancellation is pending.
+        """
+        live_orders = self._live_orders(state, market)
+        # Orders which have gone no longer need remembering
+        self._cancelled_while_paused.intersection_update(
+            order.order_id for order in live_orders
+        )
+        cancellations = [
+            OrderCancellation(order.order_id, order.market_id)
+            for order in live_orders
+            if order.order_id not in self._cancelled_while_paused
+        ]
+        if cancellations:
+            self._cancelled_while_paused.update(c.order_id for c in cancellations)
+            self._submit(
+                market,
+                BatchMarketInstruction(
+                    submissions=[], cancellations=cancellations, amendments=[]
+                ),
+            )
+
+    def _live_orders(self, state: StoreState, market: Market) -> list[Order]:
+        return [
+            order
+            for side in ("SIDE_BUY", "SIDE_SELL")
+            for order in state.orders_by_side.get((market.market_id, side), ())
+            if order.party_id == self.config.party_id
+        ]
+
+    def _submit(
+        self,
+        market: Market,
+        batch_instruction: BatchMarketInstruction,
+        origin_ns: Optional[int] = None,
+    ) -> None:
+        if isinstance(self._wallet, SubmissionScheduler):
+            self._wallet.submit_batch(
+                market.market_id, batch_instruction, origin_ns=origin_ns
+            )
+            return
+
+        serialize_start = time.perf_counter_ns()
+        transaction = self._serializer.encode(batch_instruction)
+        latency_metrics.record_since("serialize", serialize_start)
+
+        self._wallet.submit_transaction(transaction, origin_ns=origin_ns)
+
+    def seconds_until_due(self, now: float) -> float:
+        """Returns how long until the strategy next wants to requote, zero if
+        a requote is due now.
+        """
+        until_heartbeat = self.last_execute_time + self._update_freq_seconds - now
+        if self._requote_event.is_set():
+            until_allowed = (
+                self.last_execute_time + self._min_requote_interval_seconds - now
+            )
+            return max(min(until_heartbeat, until_allowed), 0)
+        return max(until_heartbeat, 0)
+
+    def requote(self) -> None:
+        requote_together([self])
 
     def _run(self):
         while True:
-            self.execute()
-            time.sleep(self._update_freq_seconds)
+            delay = self.seconds_until_due(time.monotonic())
+            if delay == 0:
+                self.requote()
+            elif self._requote_event.is_set():
+                # Requote wanted but rate limited, ticks meanwhile are coalesced
+                time.sleep(delay)
+            else:
+                # Wait for either a large enough reference move or the heartbeat
+                self._requote_event.wait(timeout=delay)
 
     def run(self):
         self.thread = threading.Thread(target=self._run, daemon=True)
         self.thread.start()
+
+
+def requote_together(strategies: list[SimpleMarketMaker]) -> None:
+    """Requotes several strategies at once, see `execute_together`."""
+    now = time.monotonic()
+    woken_at = time.perf_counter_ns()
+    for strategy in strategies:
+        if not strategy._requote_event.is_set():
+            # A heartbeat requotes even if nothing has changed, retrying a
+            # ladder whose submission failed or was rejected
+            strategy._last_inputs = None
+        elif strategy._triggered_by:
+            # Measured from the tick which woke the strategy, not whichever
+            # is latest by the time the reference price is read
+            latency_metrics.record("tick_to_wakeup", woken_at - strategy._triggered_by)
+        # Any ticks arriving from here on are picked up by the next requote
+        strategy._requote_event.clear()
+        strategy.last_execute_time = now
+    execute_together(strategies)
+
+
+def execute_together(strategies: list[SimpleMarketMaker]) -> None:
+    """Runs several strategies, building the ladders of all those requoting
+    in one NumPy pass per curve profile rather than one per market.
+    """
+    prepared = defaultdict(list)
+    for strategy in strategies:
+        # One state is used throughout so that orders, positions and
+        # balances are all from the same point in time
+        state = strategy._vega_store.state
+        try:
+            quote = strategy._prepare(state)
+        except Exception:
+            logging.exception(
+                f"Failed to execute trading strategy on {strategy.market_id}"
+            )
+            continue
+        if quote is not None:
+            prepared[strategy._curves.profile].append((strategy, state, quote))
+
+    for group in prepared.values():
+        build_start = time.perf_counter_ns()
+        quotes = [quote for _, _, quote in group]
+        curves = group[0][0]._curves.build_for_markets(
+            [quote.market for quote in quotes],
+            bid_prices=[quote.bid_price for quote in quotes],
+            ask_prices=[quote.ask_price for quote in quotes],
+            bid_volumes=[quote.bid_volume for quote in quotes],
+            ask_volumes=[quote.offer_volume for quote in quotes],
+            inventory=[quote.inventory for quote in quotes],
+        )
+        for row, (strategy, state, quote) in enumerate(group):
+            try:
+                strategy._send(
+                    state,
+                    quote,
+                    curves.submissions(row, quote.market.market_id),
+                    build_start,
+                )
+                # Only once handed over, so a failed requote is not skipped
+                # as unchanged next time
+                strategy._last_inputs = quote.key
+            except Exception:
+                logging.exception(
+                    f"Failed to execute trading strategy on {strategy.market_id}"
+                )
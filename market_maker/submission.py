@@ -1,12 +1,25 @@
+import json
 from dataclasses import dataclass
-from market_maker.utils.decimal_utils import convert_from_decimals
+from typing import Callable, Optional
+
+try:
+    import orjson
+
+    _default_dumps = orjson.dumps
+except ImportError:  # pragma: no cover - optional dependency
+    _default_dumps = None
+
+# Prices and sizes are integers in the market's native decimal units, see
+# `Market.price_to_units` and `Market.size_to_units`
 
 
 @dataclass
 class OrderAmendment:
     order_id: str
-    size_delta: float
-    price: float
+    market_id: str
+    size_delta: int = 0
+    # None leaves the price of the order unchanged
+    price: Optional[int] = None
 
 
 @dataclass
@@ -18,8 +31,8 @@ class OrderCancellation:
 @dataclass
 class OrderSubmission:
     market_id: str
-    size: float
-    price: float
+    size: int
+    price: int
     time_in_force: str
     type: str
     side: str
@@ -32,16 +45,14 @@ class BatchMarketInstruction:
     amendments: list[OrderAmendment]
 
 
-def _submission_to_json(
-    submission: OrderSubmission, price_decimals: int, position_decimals: int
-) -> dict[str, str]:
+def _submission_to_json(submission: OrderSubmission) -> dict[str, str]:
     return {
         "marketId": submission.market_id,
         "timeInForce": submission.time_in_force,
         "type": submission.type,
         "side": submission.side,
-        "size": str(convert_from_decimals(position_decimals, submission.size)),
-        "price": str(convert_from_decimals(price_decimals, submission.price)),
+        "size": str(submission.size),
+        "price": str(submission.price),
     }
 
 
@@ -49,41 +60,125 @@ def _cancellation_to_json(cancellation: OrderCancellation) -> dict[str, str]:
     return {"marketId": cancellation.market_id, "orderId": cancellation.order_id}
 
 
-def _amendment_to_json(
-    amendment: OrderAmendment, price_decimals: int, position_decimals: int
-) -> dict[str, str]:
-    return {
+def _amendment_to_json(amendment: OrderAmendment) -> dict[str, str]:
+    amendment_json = {
         "orderId": amendment.order_id,
-        "size_delta": str(
-            convert_from_decimals(position_decimals, amendment.size_delta)
-        ),
-        "price": str(convert_from_decimals(price_decimals, amendment.price)),
+        "marketId": amendment.market_id,
     }
+    if amendment.size_delta:
+        amendment_json["sizeDelta"] = str(amendment.size_delta)
+    if amendment.price is not None:
+        amendment_json["price"] = str(amendment.price)
+    return amendment_json
 
 
-def instruction_to_json(
-    instruction: BatchMarketInstruction, price_decimals: int, position_decimals: int
-) -> dict:
+def instruction_to_json(instruction: BatchMarketInstruction) -> dict:
     return {
         "batchMarketInstructions": {
-            "submissions": [
-                _submission_to_json(
-                    s,
-                    price_decimals=price_decimals,
-                    position_decimals=position_decimals,
-                )
-                for s in instruction.submissions
-            ],
-            "amendments": [
-                _amendment_to_json(
-                    s,
-                    price_decimals=price_decimals,
-                    position_decimals=position_decimals,
-                )
-                for s in instruction.amendments
-            ],
+            "submissions": [_submission_to_json(s) for s in instruction.submissions],
+            "amendments": [_amendment_to_json(s) for s in instruction.amendments],
             "cancellations": [
                 _cancellation_to_json(s) for s in instruction.cancellations
             ],
         }
     }
+
+
+def _stdlib_dumps(value: str) -> bytes:
+    return json.dumps(value).encode()
+
+
+class InstructionSerializer:
+    def __init__(self, dumps: Optional[Callable[[str], bytes]] = None):
+        """Writes batch market instructions straight to JSON bytes, producing
+        the same document as `instruction_to_json` without building it as
+        dicts first.
+
+        Everything an instruction shares with others on the same market, such
+        as the market ID, side, type and time in force, is encoded once and
+        cached, leaving only order IDs, sizes and prices to encode per
+        instruction.
+
+        Args:
+            dumps:
+                Optional[Callable], encodes a string as JSON bytes. Defaults to
+                `orjson` where installed, falling back to the standard library
+        """
+        if dumps is None:
+            dumps = _default_dumps if _default_dumps is not None else _stdlib_dumps
+        self._dumps = dumps
+        self._submission_prefixes: dict[tuple[str, str, str, str], bytes] = {}
+        self._market_suffixes: dict[str, bytes] = {}
+        self._cancellation_prefixes: dict[str, bytes] = {}
+
+    def _submission_prefix(self, submission: OrderSubmission) -> bytes:
+        key = (
+            submission.market_id,
+            submission.time_in_force,
+            submission.type,
+            submission.side,
+        )
+        prefix = self._submission_prefixes.get(key)
+        if prefix is None:
+            dumps = self._dumps
+            prefix = self._submission_prefixes[key] = (
+                b'{"marketId":'
+                + dumps(submission.market_id)
+                + b',"timeInForce":'
+                + dumps(submission.time_in_force)
+                + b',"type":'
+                + dumps(submission.type)
+                + b',"side":'
+                + dumps(submission.side)
+                + b',"size":"'
+            )
+        return prefix
+
+    def _market_suffix(self, market_id: str) -> bytes:
+        suffix = self._market_suffixes.get(market_id)
+        if suffix is None:
+            suffix = self._market_suffixes[market_id] = b',"marketId":' + self._dumps(
+                market_id
+            )
+        return suffix
+
+    def _cancellation_prefix(self, market_id: str) -> bytes:
+        # Same key order as `_cancellation_to_json`
+        prefix = self._cancellation_prefixes.get(market_id)
+        if prefix is None:
+            prefix = self._cancellation_prefixes[market_id] = (
+                b'{"marketId":' + self._dumps(market_id) + b',"orderId":'
+            )
+        return prefix
+
+    def encode(self, instruction: BatchMarketInstruction) -> bytes:
+        dumps = self._dumps
+        parts = [b'{"batchMarketInstructions":{"submissions":[']
+        for i, submission in enumerate(instruction.submissions):
+            if i:
+                parts.append(b",")
+            parts.append(self._submission_prefix(submission))
+            parts.append(b'%d","price":"%d"}' % (submission.size, submission.price))
+
+        parts.append(b'],"amendments":[')
+        for i, amendment in enumerate(instruction.amendments):
+            if i:
+                parts.append(b",")
+            parts.append(b'{"orderId":')
+            parts.append(dumps(amendment.order_id))
+            parts.append(self._market_suffix(amendment.market_id))
+            if amendment.size_delta:
+                parts.append(b',"sizeDelta":"%d"' % amendment.size_delta)
+            if amendment.price is not None:
+                parts.append(b',"price":"%d"' % amendment.price)
+            parts.append(b"}")
+
+        parts.append(b'],"cancellations":[')
+        for i, cancellation in enumerate(instruction.cancellations):
+            if i:
+                parts.append(b",")
+            parts.append(self._cancellation_prefix(cancellation.market_id))
+            parts.append(dumps(cancellation.order_id))
+            parts.append(b"}")
+        parts.append(b"]}}")
+        return b"".join(parts)
@@ -0,0 +1,267 @@
+"""
+Rate limiting of transactions between the strategies and the wallet, so that
+requoting quickly does not trip Vega's per key spam protection.
+
+Transactions are sent in windows aligned to the chain's block cadence, at most
+one per market per window, with each taking a token from a shared bucket.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+import requests
+
+from market_maker.submission import BatchMarketInstruction, InstructionSerializer
+from market_maker.wallet import PipelinedVegaWallet
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: int):
+        """Allows `burst` transactions at once, refilled at
+        `rate_per_second`. Not thread safe, callers hold their own lock.
+        """
+        self._rate_per_second = rate_per_second
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self._tokens + (now - self._updated_at) * self._rate_per_second,
+            self._burst,
+        )
+        self._updated_at = now
+
+    def try_take(self, now: float) -> bool:
+        self._refill(now)
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class BlockClock:
+    def __init__(
+        self,
+        tendermint_url: str,
+        poll_interval_seconds: float = 0.1,
+        smoothing: float = 0.2,
+    ):
+        """Estimates when blocks are produced by polling Tendermint's
+        `status` for the latest height.
+
+        The block interval is an exponentially weighted average of the time
+        between observed height changes, so it is only as precise as the poll
+        interval, which is plenty for placing sends clear of block boundaries.
+
+        Start polling by calling `start`.
+        """
+        self._tendermint_url = tendermint_url
+        self._poll_interval_seconds = poll_interval_seconds
+        self._smoothing = smoothing
+        self._session = requests.Session()
+        self._stopped = threading.Event()
+
+        self._height: Optional[int] = None
+        self._observed_at = 0.0
+        self.block_interval_seconds: Optional[float] = None
+        self.last_block_at: Optional[float] = None
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def observe(self, height: int, now: float) -> None:
+        if self._height is not None and height > self._height:
+            interval = (now - self._observed_at) / (height - self._height)
+            self.block_interval_seconds = (
+                interval
+                if self.block_interval_seconds is None
+                else self._smoothing * interval
+                + (1 - self._smoothing) * self.block_interval_seconds
+            )
+            self.last_block_at = now
+        if self._height is None or height > self._height:
+            self._height = height
+            self._observed_at = now
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                response = self._session.get(f"{self._tendermint_url}/status")
+                response.raise_for_status()
+                height = response.json()["result"]["sync_info"]["latest_block_height"]
+                self.observe(int(height), time.monotonic())
+            except Exception:
+                logger.exception("Failed to poll block height")
+                self._stopped.wait(1)
+            self._stopped.wait(self._poll_interval_seconds)
+
+
+def split_batch(
+    batch: BatchMarketInstruction, max_batch_size: int
+) -> list[BatchMarketInstruction]:
+    """Splits a batch into batches of at most `max_batch_size` instructions.
+
+    Vega applies cancellations, then amendments, then submissions, so the
+    instructions are taken in that order to free up margin before new orders
+    need it.
+    """
+    instructions = (
+        [("cancellations", c) for c in batch.cancellations]
+        + [("amendments", a) for a in batch.amendments]
+        + [("submissions", s) for s in batch.submissions]
+    )
+    if len(instructions) <= max_batch_size:
+        return [batch]
+
+    batches = []
+    for start in range(0, len(instructions), max_batch_size):
+        chunk = BatchMarketInstruction(submissions=[], cancellations=[], amendments=[])
+        for kind, instruction in instructions[start : start + max_batch_size]:
+            getattr(chunk, kind).append(instruction)
+        batches.append(chunk)
+    return batches
+
+
+class SubmissionScheduler:
+    def __init__(
+        self,
+        wallet: PipelinedVegaWallet,
+        rate_per_second: float,
+        burst: int = 1,
+        max_batch_size: int = 30,
+        window_seconds: float = 1,
+        block_clock: Optional[BlockClock] = None,
+        block_offset: float = 0.1,
+    ):
+        """Sits between the strategies and the wallet, limiting how often
+        transactions are sent.
+
+        Batches are handed over per market with `submit_batch`. Every batch
+        is a diff against the market's live orders, so a newer batch replaces
+        any older one for the same market which has not been sent yet, and
+        each window sends the one batch left for each market.
+
+        Windows start `block_offset` of a block interval after each block
+        estimated by `block_clock`, so that transactions reach the mempool
+        early for the next block, or every `window_seconds` until a block
+        interval is known. Each transaction takes a token from a bucket
+        refilled at `rate_per_second` holding up to `burst`. Markets out of
+        tokens wait for a later window, longest waiting first.
+
+        Batches with more than `max_batch_size` instructions are split, with
+        one part sent per window. The remainder is dropped if a newer batch
+        for the market arrives, as that batch is diffed against the live
+        orders and so covers whatever the remainder still had to do.
+
+        Start scheduling by calling `start`.
+
+        Args:
+            wallet:
+                PipelinedVegaWallet, wallet transactions are sent through,
+                keyed by market
+            rate_per_second:
+                float, sustained transactions per second allowed
+            burst:
+                int, transactions which may be sent at once after a quiet spell
+            max_batch_size:
+                int, maximum instructions per transaction, matching the
+                network's `spam.protection.max.batchSize`
+            window_seconds:
+                float, time between windows when the block interval is unknown
+            block_clock:
+                Optional[BlockClock], source of the block cadence
+            block_offset:
+                float, fraction of a block interval after a block to send at
+        """
+        self._wallet = wallet
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._max_batch_size = max_batch_size
+        self._window_seconds = window_seconds
+        self._block_clock = block_clock
+        self._block_offset = block_offset
+        self._serializer = InstructionSerializer()
+
+        self._condition = threading.Condition()
+        # Insertion ordered by when each market's oldest unsent batch arrived,
+        # holding the parts still to send and the origin of the newest batch
+        self._pending: dict[str, tuple[list[BatchMarketInstruction], Optional[int]]] = (
+            {}
+        )
+        self._running = False
+        self.transactions_sent = 0
+
+    @property
+    def pub_key(self) -> str:
+        return self._wallet.pub_key
+
+    def start(self) -> None:
+        self._running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def submit_batch(
+        self,
+        market_id: str,
+        batch: BatchMarketInstruction,
+        origin_ns: Optional[int] = None,
+    ) -> None:
+        parts = split_batch(batch, self._max_batch_size)
+        with self._condition:
+            # Assigning to an existing key keeps the market's place in line
+            self._pending[market_id] = (parts, origin_ns)
+            self._condition.notify()
+
+    def next_window_at(self, now: float) -> float:
+        clock = self._block_clock
+        if clock is None or clock.block_interval_seconds is None:
+            return now + self._window_seconds
+        interval = clock.block_interval_seconds
+        window_at = clock.last_block_at + self._block_offset * interval
+        if window_at <= now:
+            window_at += ((now - window_at) // interval + 1) * interval
+        return window_at
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+            time.sleep(max(self.next_window_at(time.monotonic()) - time.monotonic(), 0))
+            self._send_window()
+
+    def _send_window(self) -> None:
+        now = time.monotonic()
+        to_send = []
+        with self._condition:
+            for market_id in list(self._pending):
+                if self._wallet.is_busy(market_id):
+                    # The previous transaction has not been sent yet, and
+                    # would be replaced by this one
+                    continue
+                if not self._bucket.try_take(now):
+                    break
+                parts, origin_ns = self._pending.pop(market_id)
+                to_send.append((market_id, parts[0], origin_ns))
+                if len(parts) > 1:
+                    # Back of the line for the rest
+                    self._pending[market_id] = (parts[1:], origin_ns)
+
+        for market_id, batch, origin_ns in to_send:
+            self._wallet.submit_transaction(
+                self._serializer.encode(batch), key=market_id, origin_ns=origin_ns
+            )
+            self.transactions_sent += 1
@@ -0,0 +1,242 @@
+"""
+Background tracking of submitted transactions through to their result in a
+block, so that nothing on the quoting path waits on Tendermint.
+"""
+
+import base64
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+from market_maker.metrics import latency_metrics
+from market_maker.wallet import SubmissionResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TransactionOutcome:
+    tx_hash: str
+    key: str
+    # Tendermint result code, 0 when accepted. None if the transaction was
+    # never found before the tracker gave up on it
+    code: Optional[int]
+    info: str
+    # From the transaction being sent to the wallet to its result being seen
+    confirmation_seconds: float
+    # `time.monotonic` when the result was seen
+    completed_at: float
+
+    @property
+    def rejected(self) -> bool:
+        return self.code is None or self.code > 0
+
+
+@dataclass
+class _Pending:
+    key: str
+    sent_at: float
+    attempts: int = 0
+    next_poll_at: float = 0
+
+
+class TransactionTracker:
+    def __init__(
+        self,
+        tendermint_url: str,
+        poll_interval_seconds: float = 0.25,
+        max_backoff_seconds: float = 4,
+        timeout_seconds: float = 60,
+        max_batch_size: int = 50,
+        window: int = 100,
+        window_seconds: float = 60,
+    ):
+        """Polls Tendermint for the results of submitted transactions.
+
+        Hashes are handed over with `track`, or straight from a
+        `PipelinedVegaWallet` by passing `on_submission` as its completion
+        callback. Outstanding hashes are looked up together in JSON-RPC
+        batches over one pooled connection, with each hash not yet in a block
+        retried with exponential backoff until `timeout_seconds` after it was
+        sent.
+
+        Result codes and confirmation latency are kept per key, by default the
+        market, and the rejection rate over the last `window` outcomes can be
+        read at any time without blocking. Only outcomes seen in the last
+        `window_seconds` count towards the rate, so that a key with nothing
+        sent for a while, such as a market paused for its rejection rate,
+        starts afresh.
+
+        Start polling by calling `start`.
+        """
+        self._tendermint_url = tendermint_url
+        self._poll_interval_seconds = poll_interval_seconds
+        self._max_backoff_seconds = max_backoff_seconds
+        self._timeout_seconds = timeout_seconds
+        self._max_batch_size = max_batch_size
+        self._window_seconds = window_seconds
+
+        self._session = requests.Session()
+        self._condition = threading.Condition()
+        self._pending: dict[str, _Pending] = {}
+        self._running = False
+
+        self._outcomes: dict[str, deque[TransactionOutcome]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+
+    def start(self) -> None:
+        self._running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def track(self, tx_hash: str, key: str, sent_at: Optional[float] = None) -> None:
+        """Starts following a transaction, sent at `sent_at` on the
+        `time.monotonic` clock, or now if not given.
+        """
+        sent_at = sent_at if sent_at is not None else time.monotonic()
+        with self._condition:
+            self._pending[tx_hash] = _Pending(
+                key=key,
+                sent_at=sent_at,
+                next_poll_at=sent_at + self._poll_interval_seconds,
+            )
+            self._condition.notify()
+
+    def on_submission(self, submission: SubmissionResult) -> None:
+        if submission.result is None:
+            return
+        tx_hash = submission.result.get("transactionHash")
+        if tx_hash:
+            self.track(
+                tx_hash,
+                key=submission.key,
+                sent_at=time.monotonic()
+                - submission.latency_seconds
+                + submission.queued_seconds,
+            )
+
+    def outcomes(self, key: str) -> list[TransactionOutcome]:
+        return list(self._outcomes.get(key, ()))
+
+    def rejection_rate(self, key: str) -> Optional[float]:
+        """Fraction of recent transactions for a key which were rejected or
+        never confirmed, None if none have completed in the last
+        `window_seconds`.
+        """
+        since = time.monotonic() - self._window_seconds
+        outcomes = [
+            outcome for outcome in self.outcomes(key) if outcome.completed_at >= since
+        ]
+        if not outcomes:
+            return None
+        return sum(outcome.rejected for outcome in outcomes) / len(outcomes)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                now = time.monotonic()
+                due = [
+                    tx_hash
+                    for tx_hash, pending in self._pending.items()
+                    if pending.next_poll_at <= now
+                ][: self._max_batch_size]
+                if not due:
+                    self._condition.wait(
+                        min(p.next_poll_at for p in self._pending.values()) - now
+                    )
+                    continue
+
+            try:
+                results = self._query(due)
+            except Exception:
+                logger.exception("Failed to query transaction results")
+                results = {}
+            self._apply(due, results)
+
+    def _query(self, tx_hashes: list[str]) -> dict[str, dict]:
+        response = self._session.post(
+            self._tendermint_url,
+            json=[
+                {
+                    "jsonrpc": "2.0",
+                    "id": i,
+                    "method": "tx",
+                    "params": {"hash": base64.b64encode(bytes.fromhex(h)).decode()},
+                }
+                for i, h in enumerate(tx_hashes)
+            ],
+        )
+        response.raise_for_status()
+        body = response.json()
+        if isinstance(body, dict):
+            body = [body]
+        return {
+            tx_hashes[item["id"]]: item["result"]
+            for item in body
+            if item.get("result") is not None
+        }
+
+    def _apply(self, tx_hashes: list[str], results: dict[str, dict]) -> None:
+        now = time.monotonic()
+        outcomes = []
+        with self._condition:
+            for tx_hash in tx_hashes:
+                pending = self._pending.get(tx_hash)
+                if pending is None:
+                    continue
+                result = results.get(tx_hash)
+                if result is not None:
+                    tx_result = result["tx_result"]
+                    outcome = TransactionOutcome(
+                        tx_hash=tx_hash,
+                        key=pending.key,
+                        code=int(tx_result.get("code", 0)),
+                        info=tx_result.get("info", ""),
+                        confirmation_seconds=now - pending.sent_at,
+                        completed_at=now,
+                    )
+                elif now - pending.sent_at >= self._timeout_seconds:
+                    outcome = TransactionOutcome(
+                        tx_hash=tx_hash,
+                        key=pending.key,
+                        code=None,
+                        info="Transaction not found",
+                        confirmation_seconds=now - pending.sent_at,
+                        completed_at=now,
+                    )
+                else:
+                    # Not in a block yet, or the query failed
+                    pending.attempts += 1
+                    pending.next_poll_at = now + min(
+                        self._poll_interval_seconds * 2**pending.attempts,
+                        self._max_backoff_seconds,
+                    )
+                    continue
+                del self._pending[tx_hash]
+                outcomes.append(outcome)
+
+        for outcome in outcomes:
+            self._outcomes[outcome.key].append(outcome)
+            if outcome.code is not None:
+                latency_metrics.record(
+                    "confirmation", int(outcome.confirmation_seconds * 1e9)
+                )
+            if outcome.rejected:
+                logger.error(
+                    f"Transaction {outcome.tx_hash} for {outcome.key} failed: "
+                    f"{outcome.info}"
+                )
@@ -1,6 +1,15 @@
-def convert_to_decimals(decimal_places: int, number: float) -> float:
-    return number / (10**decimal_places)
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def scale_factor(decimal_places: int) -> int:
+    return 10**decimal_places
+
+
+def convert_to_decimals(decimal_places: int, number: int) -> float:
+    # Integer true division is correctly rounded, unlike scaling a float
+    return number / scale_factor(decimal_places)
 
 
 def convert_from_decimals(decimal_places: int, number: float) -> int:
-    return int(number * (10**decimal_places))
+    return round(number * scale_factor(decimal_places))
@@ -11,8 +11,19 @@ all transactions to be approved, skipping manual confirmation (otherwise there w
 be a manual confirmation prompt each time the market maker bot sends a transaction.)
 """
 
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Union
+
 import requests
 
+from market_maker.metrics import latency_metrics
+
+logger = logging.getLogger(__name__)
+
 
 class VegaWallet:
     def __init__(self, token: str, wallet_url: str, pub_key: str):
@@ -23,17 +34,205 @@ class VegaWallet:
         self.session = requests.Session()
         self.session.headers = {"Origin": "MMBot", "Authorization": f"VWT {self.token}"}
 
-    def submit_transaction(self, transaction: dict) -> None:
-        self.session.post(
+        # The JSON-RPC request around pre-encoded transactions never changes
+        self._request_prefix = (
+            b'{"jsonrpc":"2.0","method":"client.send_transaction","params":'
+            b'{"publicKey":'
+            + json.dumps(pub_key).encode()
+            + b',"sendingMode":"TYPE_SYNC","transaction":'
+        )
+        self._request_suffix = b'},"id":"request"}'
+
+    def encode_request(self, transaction: Union[dict, bytes]) -> bytes:
+        """The JSON-RPC request body sending a transaction from this wallet's
+        key. Transactions already encoded as JSON bytes are not re-encoded.
+        """
+        if not isinstance(transaction, bytes):
+            transaction = json.dumps(transaction).encode()
+        return self._request_prefix + transaction + self._request_suffix
+
+    def submit_transaction(
+        self, transaction: Union[dict, bytes], origin_ns: Optional[int] = None
+    ) -> dict:
+        """Sends a transaction and waits for the wallet to acknowledge it.
+
+        The transaction is either a dict, or already encoded as JSON bytes,
+        for instance by `InstructionSerializer`, in which case it is sent
+        without being re-encoded.
+
+        `origin_ns` is the `time.perf_counter_ns` timestamp of the event which
+        led to the transaction, used to track end to end latency.
+        """
+        sent_at = time.perf_counter_ns()
+        if origin_ns:
+            latency_metrics.record("tick_to_send", sent_at - origin_ns)
+        response = self.session.post(
             self.wallet_url + "/api/v2/requests",
-            json={
-                "jsonrpc": "2.0",
-                "method": "client.send_transaction",
-                "params": {
-                    "publicKey": self.pub_key,
-                    "sendingMode": "TYPE_SYNC",
-                    "transaction": transaction,
-                },
-                "id": "request",
-            },
-        ).raise_for_status()
+            data=self.encode_request(transaction),
+            headers={"Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+        latency_metrics.record_since("wallet_round_trip", sent_at)
+        if origin_ns:
+            latency_metrics.record_since("tick_to_ack", origin_ns)
+        response_json = response.json()
+        if response_json.get("error") is not None:
+            raise RuntimeError(f"Wallet rejected transaction: {response_json['error']}")
+        return response_json.get("result", {})
+
+
+@dataclass
+class SubmissionResult:
+    key: str
+    # Time from the transaction being handed over to the wallet responding
+    latency_seconds: float
+    # Time spent waiting behind an in-flight transaction before being sent
+    queued_seconds: float
+    result: Optional[dict] = None
+    error: Optional[Exception] = None
+
+
+class PipelinedVegaWallet:
+    def __init__(
+        self,
+        wallet: VegaWallet,
+        max_in_flight: int = 1,
+        on_complete: Optional[Callable[[SubmissionResult], Any]] = None,
+    ):
+        """Submits transactions through a `VegaWallet` on background threads so
+        that callers never block on the wallet service.
+
+        Transactions are keyed, by default on the market of a batch market
+        instruction. At most one transaction per key and `max_in_flight` in
+        total are sent at a time. A transaction submitted while an older one
+        for the same key is still waiting to be sent replaces it, as only the
+        latest desired state is worth sending.
+
+        Start the submission threads by calling `start`.
+
+        Args:
+            wallet:
+                VegaWallet, wallet used to send each transaction
+            max_in_flight:
+                int, maximum number of transactions awaiting a wallet response
+            on_complete:
+                Optional[Callable], called from a submission thread with the
+                latency and outcome of each transaction sent
+        """
+        self._wallet = wallet
+        self._max_in_flight = max_in_flight
+        self._on_complete = on_complete
+
+        self._condition = threading.Condition()
+        # Insertion ordered, so the longest waiting key is sent first
+        self._pending: dict[str, tuple[dict, float, Optional[int]]] = {}
+        self._in_flight: set[str] = set()
+        self._running = False
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def pub_key(self) -> str:
+        return self._wallet.pub_key
+
+    def start(self) -> None:
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True)
+            for _ in range(self._max_in_flight)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def submit_transaction(
+        self,
+        transaction: Union[dict, bytes],
+        key: Optional[str] = None,
+        origin_ns: Optional[int] = None,
+    ) -> None:
+        key = key if key is not None else transaction_key(transaction)
+        with self._condition:
+            if key in self._pending:
+                logger.debug(f"Replacing unsent transaction for {key}")
+            self._pending[key] = (transaction, time.monotonic(), origin_ns)
+            self._condition.notify()
+
+    def is_busy(self, key: str) -> bool:
+        """Whether a transaction for the key is waiting to be sent or
+        awaiting a wallet response.
+        """
+        with self._condition:
+            return key in self._pending or key in self._in_flight
+
+    def _next_pending(self) -> Optional[tuple[str, dict, float, Optional[int]]]:
+        for key in self._pending:
+            if key not in self._in_flight:
+                return (key, *self._pending.pop(key))
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                next_pending = self._next_pending()
+                while next_pending is None and self._running:
+                    self._condition.wait()
+                    next_pending = self._next_pending()
+                if not self._running:
+                    return
+                key, transaction, submitted_at, origin_ns = next_pending
+                self._in_flight.add(key)
+
+            sent_at = time.monotonic()
+            latency_metrics.record("wallet_queue", int((sent_at - submitted_at) * 1e9))
+            result = None
+            error = None
+            try:
+                result = self._wallet.submit_transaction(
+                    transaction, origin_ns=origin_ns
+                )
+            except Exception as e:
+                logger.exception(f"Failed to submit transaction for {key}")
+                error = e
+
+            with self._condition:
+                self._in_flight.discard(key)
+                # Wake another thread in case a newer state for this key arrived
+                self._condition.notify()
+
+            if self._on_complete is not None:
+                try:
+                    self._on_complete(
+                        SubmissionResult(
+                            key=key,
+                            latency_seconds=time.monotonic() - submitted_at,
+                            queued_seconds=sent_at - submitted_at,
+                            result=result,
+                            error=error,
+                        )
+                    )
+                except Exception:
+                    logger.exception("Submission completion callback failed")
+
+
+def transaction_key(transaction: Union[dict, bytes]) -> str:
+    """The market ID a transaction's batch instructions are for, which keys
+    its place in the submission queues, or "default" if it has none.
+    """
+    if isinstance(transaction, bytes):
+        # Every instruction in an encoded batch carries its market ID, so the
+        # first one found identifies the batch's market
+        start = transaction.find(b'"marketId":"')
+        if start < 0:
+            return "default"
+        start += len(b'"marketId":"')
+        return transaction[start : transaction.index(b'"', start)].decode()
+    batch = transaction.get("batchMarketInstructions")
+    if batch:
+        for instructions in batch.values():
+            if instructions:
+                return instructions[0]["marketId"]
+    return "default"
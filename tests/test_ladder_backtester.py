@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from market_maker.backtest.ladder_backtester import BookTickerSeries, run_grid
+from market_maker.replay.recorder import StreamRecorder
+
+
+def _diff(symbol: str, first_id: int, final_id: int, bids, asks) -> dict:
+    return {
+        "stream": f"{symbol.lower()}@depth@100ms",
+        "data": {
+            "e": "depthUpdate",
+            "s": symbol,
+            "U": first_id,
+            "u": final_id,
+            "b": bids,
+            "a": asks,
+        },
+    }
+
+
+def _snapshot(symbol: str, last_update_id: int, bids, asks) -> dict:
+    return {
+        "s": symbol,
+        "snapshot": {"lastUpdateId": last_update_id, "bids": bids, "asks": asks},
+    }
+
+
+def _write_journal(directory, frames) -> None:
+    recorder = StreamRecorder(str(directory))
+    recorder.start()
+    for source, channel, frame in frames:
+        recorder.record(source, channel, frame)
+    recorder.stop()
+
+
+def test_from_journal_rebuilds_touch_from_depth_journal(tmp_path):
+    _write_journal(
+        tmp_path,
+        [
+            # Buffered until the snapshot arrives
+            ("binance", "depth", _diff("BTCUSDT", 9, 11, [["100", "2"]], [])),
+            ("binance", "depth_snapshot", _snapshot("ETHUSDT", 5, [["1", "1"]], [])),
+            (
+                "binance",
+                "depth_snapshot",
+                _snapshot("BTCUSDT", 10, [["99", "1"]], [["101", "1"]]),
+            ),
+            ("binance", "depth", _diff("ETHUSDT", 6, 6, [["2", "1"]], [])),
+            ("binance", "depth", _diff("BTCUSDT", 12, 12, [], [["100.5", "3"]])),
+            ("vega", "market_data", '{"result": {}}'),
+            ("binance", "depth", _diff("BTCUSDT", 13, 13, [["100", "0"]], [])),
+        ],
+    )
+
+    series = BookTickerSeries.from_journal(str(tmp_path), "BTCUSDT")
+
+    np.testing.assert_array_equal(series.bid, [100, 100, 99])
+    np.testing.assert_array_equal(series.ask, [101, 100.5, 100.5])
+    assert np.all(np.diff(series.timestamps) >= 0)
+    result = run_grid(series, [0.002, 0.004], [5], [0.5], balance=10_000)
+    assert len(result.pnl) == 2
+    assert np.all(np.isfinite(result.pnl))
+
+
+def test_from_journal_reads_book_ticker_journal(tmp_path):
+    _write_journal(
+        tmp_path,
+        [
+            (
+                "binance",
+                "bookTicker",
+                {"data": {"s": "BTCUSDT", "b": "99.5", "a": "100.5"}},
+            ),
+            ("binance", "bookTicker", {"data": {"s": "ETHUSDT", "b": "1", "a": "2"}}),
+        ],
+    )
+
+    series = BookTickerSeries.from_journal(str(tmp_path), "BTCUSDT")
+
+    np.testing.assert_array_equal(series.bid, [99.5])
+    np.testing.assert_array_equal(series.ask, [100.5])
+
+
+def test_from_journal_without_ticks_for_symbol(tmp_path):
+    _write_journal(
+        tmp_path,
+        [("binance", "depth", _diff("BTCUSDT", 1, 1, [["100", "1"]], []))],
+    )
+
+    with pytest.raises(ValueError):
+        BookTickerSeries.from_journal(str(tmp_path), "BTCUSDT")